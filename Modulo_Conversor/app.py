@@ -9,13 +9,44 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 import sys
+import time
+import hashlib
+import tempfile
 from datetime import datetime
 from io import BytesIO
 
 # Adicionar diretório de scripts ao path
 sys.path.insert(0, str(Path(__file__).parent / "scripts"))
 
-from conversor_poliron import ConversorPoliron
+from conversor_poliron import (ConversorPoliron, COLUNA_COMBINADA, PREFIXO_FALHA, descrever_regra_tipo,
+                               formatar_explicacao)
+from tarefa_conversao import TarefaConversao, RegistoTarefas
+from cache_conversao import CacheConversao
+from catalogo_poliron import CatalogoPoliron
+from semelhanca_poliron import IndiceSemelhanca, SUGESTOES_PADRAO, colunas_semelhanca, pares_convertidos
+from formatos_tabela import (FORMATOS, TIPOS_MIME, LINHAS_PREVIA, formato_arquivo, extensao_saida, ler_tabela,
+                             ler_previa, gravar_tabela, gravar_excel, ler_folhas, gravar_folhas)
+
+# Colunas acrescentadas por processar_planilha(detalhes=True), usadas só nas estatísticas
+COLUNAS_DETALHE = ['Tipo de Cabo', 'Convertido', 'Motivo da Falha']
+
+# Cache persistente das conversões, partilhado entre sessões
+ARQUIVO_CACHE = Path(__file__).parent / "cache" / "conversoes.sqlite"
+
+# Conversão em segundo plano: intervalo de atualização do progresso (segundos)
+# e linhas mais recentes mostradas enquanto a conversão decorre
+INTERVALO_PROGRESSO = 0.5
+LINHAS_PARCIAIS = 1000
+
+# Explicações das falhas: descrições únicas explicadas no máximo (calculadas só a pedido)
+MAX_EXPLICACOES = 200
+
+# Opções de download: conteúdo (rótulo, sufixo do nome do ficheiro)
+CONTEUDOS_DOWNLOAD = {
+    'completa': ("Tabela completa", ""),
+    'falhas': ("Só as linhas não convertidas", "_Falhas"),
+    'codigos': ("Só descrição e código", "_Codigos"),
+}
 
 # Configuração da página
 st.set_page_config(
@@ -65,12 +96,223 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def converter_df_para_excel(df):
-    """Converte DataFrame para Excel em memória"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Conversão')
-    return output.getvalue()
+def converter_df_para_excel(df, destino):
+    """Grava o DataFrame em Excel linha a linha (sem montar a folha inteira em memória)"""
+    gravar_excel(df, destino, nome_folha='Conversão')
+
+@st.cache_resource
+def obter_conversor():
+    """Conversor partilhado entre reruns e sessões (JSON lidos e regras compiladas uma vez)"""
+    return ConversorPoliron()
+
+@st.cache_data(show_spinner=False)
+def carregar_previa(hash_arquivo, formato, folha, _conteudo):
+    """
+    Cabeçalho e primeiras linhas da planilha (ou da folha), sem ler o resto do ficheiro:
+    chegam para a prévia, a lista de colunas e a deteção da coluna de descrições
+    """
+    return ler_previa(_conteudo, formato, LINHAS_PREVIA, folha)
+
+@st.cache_data(show_spinner=False)
+def carregar_planilha(hash_arquivo, formato, colunas, _conteudo):
+    """
+    Lê a planilha uma única vez por conteúdo e colunas (chave: hash dos bytes do ficheiro);
+    com `colunas`, só essas são lidas, senão a tabela inteira
+    Retorna (DataFrame, segundos de leitura)
+    """
+    inicio = time.perf_counter()
+    df = ler_tabela(_conteudo, formato, list(colunas) if colunas is not None else None)
+    return df, time.perf_counter() - inicio
+
+@st.cache_data(show_spinner=False)
+def nomes_folhas(hash_arquivo, _conteudo):
+    """Nomes das folhas de um livro Excel (sem ler as células)"""
+    with pd.ExcelFile(BytesIO(_conteudo)) as livro:
+        return livro.sheet_names
+
+@st.cache_data(show_spinner=False)
+def carregar_livro(hash_arquivo, _conteudo):
+    """
+    Lê todas as folhas do livro de uma só vez, uma única vez por conteúdo
+    Retorna (folhas, segundos de leitura)
+    """
+    inicio = time.perf_counter()
+    folhas = ler_folhas(_conteudo)
+    return folhas, time.perf_counter() - inicio
+
+@st.cache_resource(show_spinner="A indexar o catálogo...")
+def obter_catalogo(hash_catalogo, nome_catalogo, _conteudo):
+    """
+    Índice do catálogo carregado, gravado junto ao cache de conversões: o mesmo catálogo
+    carregado de novo (noutra sessão ou depois de reiniciar) abre em milissegundos
+    """
+    arquivo_indice = ARQUIVO_CACHE.parent / f"catalogo_{hash_catalogo[:16]}.arrow"
+    if arquivo_indice.exists():
+        return CatalogoPoliron.abrir(arquivo_indice)
+    codigos = CatalogoPoliron.ler_codigos(_conteudo, formato=formato_arquivo(nome_catalogo))
+    return CatalogoPoliron.construir(codigos, arquivo_indice)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def marcar_catalogo(chave_conversao, hash_catalogo, _df_resultado, _catalogo):
+    """Resultado com as colunas do catálogo, calculadas uma única vez por conversão e catálogo"""
+    return _catalogo.marcar_colunas(_df_resultado.copy(deep=False))
+
+@st.cache_resource(show_spinner="A procurar descrições semelhantes...", max_entries=4)
+def sugerir_semelhantes(chave_conversao, coluna_descricao, usar_cache, _df_resultado, _df_falhas):
+    """
+    Falhas com as descrições convertidas mais parecidas (do próprio ficheiro e, com o cache,
+    de todas as conversões anteriores), calculadas uma única vez por conversão
+    Retorna (falhas com as colunas de sugestão, descrições indexadas)
+    """
+    pares = pares_convertidos(_df_resultado, coluna_descricao)
+    if usar_cache:
+        cache = CacheConversao(ARQUIVO_CACHE, obter_conversor().versao_regras)
+        try:
+            pares.extend(cache.listar(excluir_prefixo=PREFIXO_FALHA))
+        finally:
+            cache.fechar()
+    indice = IndiceSemelhanca.construir(pares)
+    return indice.marcar_colunas(_df_falhas.copy(), coluna_descricao, SUGESTOES_PADRAO), len(indice)
+
+def tabela_explicacoes(descricoes):
+    """Uma linha por descrição com o resumo da sua explicação (ConversorPoliron.explicar)"""
+    linhas = []
+    for descricao in descricoes:
+        explicacao = obter_conversor().explicar(descricao)
+        formacao = explicacao['formacao'] or {}
+        linhas.append({
+            'Descrição': descricao,
+            'Motivo da Falha': explicacao['motivo_falha'],
+            'Formação': formacao.get('trecho'),
+            'Padrão': formacao.get('padrao'),
+            'Tipo de Cabo': explicacao['tipo'],
+            'Regra do Tipo': descrever_regra_tipo(explicacao),
+            'Palavras Encontradas': ', '.join(p for atributo in explicacao['atributos'].values()
+                                              for p in atributo['encontradas']),
+        })
+    return pd.DataFrame(linhas)
+
+@st.cache_resource
+def obter_tarefas():
+    """Conversões em segundo plano, partilhadas entre reruns e sessões"""
+    return RegistoTarefas()
+
+def iniciar_conversao(chave_conversao, ler, coluna_descricao, usar_cache, medir_perfil, formato):
+    """
+    Lê e converte a planilha em blocos numa thread própria, uma única vez por ficheiro, coluna
+    e opções de cache e perfil: a sessão continua a responder (e as outras sessões também)
+    `ler()` retorna (DataFrame, segundos de leitura) e só é chamado na thread de uma tarefa
+    nova: a leitura completa do ficheiro fica para o clique em Converter, como fase do progresso
+    """
+    def criar():
+        return TarefaConversao(obter_conversor(), None, coluna_descricao,
+                               arquivo_cache=ARQUIVO_CACHE if usar_cache else None, medir_perfil=medir_perfil,
+                               ler=ler, etapa_leitura=f'leitura_{formato}')
+    
+    return obter_tarefas().iniciar(chave_conversao, criar)
+
+def formatar_duracao(segundos):
+    """Duração curta para o progresso, ex: '45s' ou '2min 05s'"""
+    segundos = int(round(segundos))
+    return f"{segundos // 60}min {segundos % 60:02d}s" if segundos >= 60 else f"{segundos}s"
+
+@st.fragment(run_every=INTERVALO_PROGRESSO)
+def acompanhar_conversao(tarefa):
+    """Progresso da conversão em segundo plano; só este bloco é atualizado a cada intervalo"""
+    if tarefa.estado != 'em_curso':
+        st.rerun()
+    
+    restante = tarefa.segundos_restantes
+    if tarefa.fase == 'leitura':
+        texto = f"📖 A ler a planilha... ({formatar_duracao(tarefa.segundos)})"
+    else:
+        texto = (f"⏳ {tarefa.linhas_feitas:,} de {tarefa.total:,} linhas convertidas · "
+                 f"{tarefa.linhas_por_segundo:,.0f} linhas/s")
+    if restante is not None:
+        texto += f" · faltam ~{formatar_duracao(restante)}"
+    st.progress(tarefa.fracao, text=texto)
+    
+    if tarefa.cancelamento_pedido:
+        st.info("⏹️ A cancelar no fim do bloco em curso...")
+    elif st.button("⏹️ Cancelar conversão"):
+        tarefa.cancelar()
+        st.info("⏹️ A cancelar no fim do bloco em curso...")
+    
+    parcial = tarefa.parcial(ultimas=LINHAS_PARCIAIS)
+    if parcial is not None:
+        st.caption(f"Resultados parciais (últimas {len(parcial):,} linhas já convertidas)")
+        st.dataframe(parcial, use_container_width=True)
+
+def selecionar_saida(df_resultado, coluna_descricao, conteudo):
+    """Linhas e colunas do ficheiro de resultado para a opção de conteúdo escolhida"""
+    if conteudo == 'falhas':
+        return df_resultado[~df_resultado['Convertido']].drop(columns=['Tipo de Cabo', 'Convertido'])
+    if conteudo == 'codigos':
+        return df_resultado[[coluna_descricao, 'Referência YOFC']]
+    return df_resultado.drop(columns=COLUNAS_DETALHE)
+
+def juntar_originais(df_resultado, coluna_descricao, df_original):
+    """
+    Colunas originais da planilha (lidas só para o download) com as colunas de resultado
+    da conversão, que foi feita só sobre a coluna de descrições
+    """
+    resultado = {coluna: df_resultado[coluna] for coluna in df_resultado.columns if coluna != coluna_descricao}
+    return df_original.assign(**resultado)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def gerar_saida(hash_arquivo, hash_catalogo, todas_folhas, coluna_descricao, usar_cache, formato, conteudo,
+                formato_entrada, _df_resultado, _conteudo_entrada, _colunas_folhas=None):
+    """
+    Bytes do ficheiro de resultado, gerados uma única vez por conversão, formato e conteúdo
+    (no clique do botão de download). O ficheiro é gravado num temporário e lido uma vez:
+    fica uma única cópia dos bytes, partilhada (sem ser copiada) pelos downloads seguintes
+    A tabela completa e as falhas levam as colunas originais, lidas aqui da planilha; com as
+    folhas do livro (conversão de todas as folhas), a tabela completa em Excel volta a ter
+    as folhas originais e as outras opções usam a tabela combinada
+    Retorna (bytes, segundos de gravação)
+    """
+    inicio = time.perf_counter()
+    if not todas_folhas and conteudo in ('completa', 'falhas'):
+        df_original, _ = carregar_planilha(hash_arquivo, formato_entrada, None, _conteudo_entrada)
+        _df_resultado = juntar_originais(_df_resultado, coluna_descricao, df_original)
+    df_saida = selecionar_saida(_df_resultado, coluna_descricao, conteudo)
+    with tempfile.TemporaryFile() as temporario:
+        if todas_folhas and formato == 'excel' and conteudo == 'completa':
+            folhas, _ = carregar_livro(hash_arquivo, _conteudo_entrada)
+            gravar_folhas(obter_conversor().separar_folhas(folhas, _colunas_folhas, df_saida), temporario)
+        elif formato == 'excel':
+            converter_df_para_excel(df_saida, temporario)
+        else:
+            gravar_tabela(df_saida, temporario, formato)
+        temporario.seek(0)
+        dados = temporario.read()
+    return dados, time.perf_counter() - inicio
+
+def mostrar_perfil(perfil):
+    """Tempos por etapa e contadores da conversão (opção 'Medir tempos por etapa')"""
+    with st.expander("⏱️ Perfil da Conversão"):
+        st.markdown("**Etapas da planilha**")
+        st.dataframe(pd.DataFrame.from_dict(perfil['etapas'], orient='index'), use_container_width=True)
+        
+        if perfil['etapas_descricao']:
+            st.markdown("**Etapas por descrição**")
+            st.dataframe(pd.DataFrame.from_dict(perfil['etapas_descricao'], orient='index')
+                         .sort_values('segundos', ascending=False), use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**Por tipo de cabo**")
+            st.dataframe(pd.DataFrame.from_dict(perfil['por_tipo'], orient='index'), use_container_width=True)
+        with col2:
+            st.markdown("**Motivos de falha**")
+            st.dataframe(pd.Series(perfil['motivos_falha'], name='descrições', dtype=int),
+                         use_container_width=True)
+        
+        formacao = perfil['formacao']
+        if formacao['por_padrao']:
+            st.caption(f"Formação por padrão: {formacao['por_padrao']} "
+                       f"({formacao['media_padroes_testados']} padrões testados por descrição)")
+        st.json(perfil, expanded=False)
 
 def main():
     """Função principal do aplicativo"""
@@ -102,7 +344,7 @@ def main():
         
         st.header("📖 Como usar")
         st.markdown("""
-        1. Carregue uma planilha Excel (.xlsx)
+        1. Carregue uma planilha Excel (.xlsx), CSV, Parquet ou Arrow
         2. Selecione a coluna com as descrições
         3. Clique em "Converter"
         4. Faça o download do resultado
@@ -117,37 +359,101 @@ def main():
     st.header("📁 Carregar Planilha")
     
     uploaded_file = st.file_uploader(
-        "Selecione o ficheiro Excel com as especificações",
-        type=['xlsx', 'xls'],
-        help="Carregue uma planilha Excel contendo as especificações técnicas dos cabos"
+        "Selecione o ficheiro com as especificações",
+        type=[extensao.lstrip('.') for extensao in FORMATOS],
+        help="Carregue uma planilha (Excel, CSV, Parquet ou Arrow) contendo as especificações técnicas dos cabos; "
+             "o resultado é gerado no mesmo formato"
     )
     
     if uploaded_file is not None:
         try:
-            # Carregar planilha
-            df = pd.read_excel(uploaded_file)
+            # Só o cabeçalho e as primeiras linhas são lidos aqui (memorizados pelo hash do
+            # conteúdo): a leitura completa fica para o clique em Converter, com as colunas precisas
+            conteudo = uploaded_file.getvalue()
+            hash_arquivo = hashlib.sha256(conteudo).hexdigest()
+            formato = formato_arquivo(uploaded_file.name)
             
-            st.success(f"✅ Ficheiro carregado com sucesso! {len(df)} linhas encontradas.")
+            # Livros com várias folhas: opção de converter todas numa única passagem
+            todas_folhas = False
+            if formato == 'excel':
+                folhas_livro = nomes_folhas(hash_arquivo, conteudo)
+                if len(folhas_livro) > 1:
+                    todas_folhas = st.checkbox(
+                        f"📚 Converter todas as {len(folhas_livro)} folhas do livro",
+                        value=False,
+                        help="O livro é lido uma única vez, a coluna de descrições de cada folha é detetada "
+                             "pelo cabeçalho ou pelo conteúdo e o resultado mantém as folhas originais"
+                    )
             
-            # Mostrar prévia
-            st.subheader("📋 Prévia dos Dados")
-            st.dataframe(df.head(10), use_container_width=True)
-            
-            # Selecionar coluna de descrição
-            st.subheader("⚙️ Configuração")
-            colunas = df.columns.tolist()
-            
-            coluna_descricao = st.selectbox(
-                "Selecione a coluna que contém as descrições dos cabos:",
-                colunas,
-                index=0 if len(colunas) > 0 else None,
-                help="Esta coluna deve conter as especificações técnicas completas"
-            )
+            colunas_folhas = None
+            if todas_folhas:
+                # Coluna de descrições de cada folha, detetada na prévia da folha
+                colunas_folhas = {nome: obter_conversor().detectar_coluna_descricao(
+                                      carregar_previa(hash_arquivo, formato, nome, conteudo))
+                                  for nome in folhas_livro}
+                coluna_descricao = COLUNA_COMBINADA
+                
+                def ler_entrada():
+                    folhas, segundos_leitura = carregar_livro(hash_arquivo, conteudo)
+                    return obter_conversor().juntar_folhas(folhas, colunas_folhas), segundos_leitura
+                
+                st.success(f"✅ Ficheiro carregado com sucesso! {len(folhas_livro)} folhas encontradas.")
+                
+                # Coluna detetada em cada folha
+                st.subheader("📋 Folhas do Livro")
+                st.dataframe(pd.DataFrame({
+                    'Folha': folhas_livro,
+                    'Coluna de descrições': [colunas_folhas[nome] or "— (não convertida)" for nome in folhas_livro],
+                }), use_container_width=True, hide_index=True)
+                
+                st.subheader("⚙️ Configuração")
+            else:
+                previa = carregar_previa(hash_arquivo, formato, None, conteudo)
+                
+                st.success(f"✅ Ficheiro carregado com sucesso! {len(previa.columns)} colunas encontradas.")
+                
+                # Mostrar prévia
+                st.subheader("📋 Prévia dos Dados")
+                st.dataframe(previa.head(10), use_container_width=True)
+                
+                # Selecionar coluna de descrição (sugerida pelo cabeçalho ou pelas formações da prévia)
+                st.subheader("⚙️ Configuração")
+                colunas = previa.columns.tolist()
+                detetada = obter_conversor().detectar_coluna_descricao(previa)
+                
+                coluna_descricao = st.selectbox(
+                    "Selecione a coluna que contém as descrições dos cabos:",
+                    colunas,
+                    index=colunas.index(detetada) if detetada is not None else (0 if len(colunas) > 0 else None),
+                    help="Esta coluna deve conter as especificações técnicas completas"
+                )
+                
+                def ler_entrada():
+                    return carregar_planilha(hash_arquivo, formato, (coluna_descricao,), conteudo)
             
             # Opções avançadas
             with st.expander("🔧 Opções Avançadas"):
                 mostrar_detalhes = st.checkbox("Mostrar detalhes da conversão", value=False)
                 incluir_timestamp = st.checkbox("Incluir timestamp no nome do ficheiro", value=True)
+                usar_cache = st.checkbox("Reaproveitar conversões anteriores (cache)", value=True)
+                medir_perfil = st.checkbox("Medir tempos por etapa (perfil)", value=False)
+                sugerir = st.checkbox(
+                    "Sugerir descrições semelhantes para as falhas", value=True,
+                    help="Para cada linha não convertida, mostra as descrições já convertidas mais parecidas "
+                         "(deste ficheiro e, com o cache, das conversões anteriores) e os seus códigos"
+                )
+                arquivo_catalogo = st.file_uploader(
+                    "Catálogo Poliron para validar os códigos (opcional)",
+                    type=[extensao.lstrip('.') for extensao in FORMATOS],
+                    help="Tabela com os códigos do catálogo (coluna 'Código' ou a primeira): cada linha "
+                         "é marcada como código do catálogo ou fora dele, com o código mais próximo"
+                )
+            
+            catalogo, hash_catalogo = None, None
+            if arquivo_catalogo is not None:
+                conteudo_catalogo = arquivo_catalogo.getvalue()
+                hash_catalogo = hashlib.sha256(conteudo_catalogo).hexdigest()
+                catalogo = obter_catalogo(hash_catalogo, arquivo_catalogo.name, conteudo_catalogo)
             
             # Botão de conversão
             st.divider()
@@ -160,22 +466,59 @@ def main():
                     use_container_width=True
                 )
             
+            # A conversão pedida fica na sessão: outros widgets (opções, download)
+            # provocam um rerun que reutiliza o resultado memorizado; só um clique
+            # recomeça uma conversão cancelada ou com erro
+            chave_conversao = (hash_arquivo, todas_folhas, coluna_descricao, usar_cache, medir_perfil)
             if converter_btn:
-                with st.spinner("⏳ Convertendo especificações... Por favor aguarde."):
-                    # Criar conversor
-                    conversor = ConversorPoliron()
-                    
-                    # Processar planilha
-                    df_resultado = conversor.processar_planilha(df, coluna_descricao)
+                st.session_state['conversao'] = chave_conversao
+                iniciar_conversao(chave_conversao, ler_entrada, coluna_descricao, usar_cache, medir_perfil, formato)
+            
+            if st.session_state.get('conversao') == chave_conversao:
+                # Conversão em segundo plano, partilhada com outras sessões com o mesmo ficheiro
+                tarefa = (obter_tarefas().obter(chave_conversao)
+                          or iniciar_conversao(chave_conversao, ler_entrada, coluna_descricao, usar_cache,
+                                               medir_perfil, formato))
+                
+                if tarefa.estado == 'em_curso':
+                    acompanhar_conversao(tarefa)
+                elif tarefa.estado == 'cancelada':
+                    st.warning(f"⏹️ Conversão cancelada após {tarefa.linhas_feitas:,} de {tarefa.total:,} linhas. "
+                               "Clique em Converter para recomeçar.")
+                    parcial = tarefa.parcial()
+                    if parcial is not None:
+                        st.dataframe(parcial, use_container_width=True)
+                elif tarefa.estado == 'erro':
+                    raise tarefa.erro
+                else:
+                    df_resultado = tarefa.resultado()
+                    if catalogo is not None:
+                        df_resultado = marcar_catalogo(chave_conversao, hash_catalogo, df_resultado, catalogo)
+                    dedup = tarefa.estatisticas_dedup
+                    estatisticas_cache = tarefa.estatisticas_cache
+                    perfil = tarefa.estatisticas_perfil
                     
-                    # Estatísticas
+                    # Estatísticas: uma única contagem por (convertido, tipo de cabo)
+                    contagem = df_resultado.groupby(['Convertido', 'Tipo de Cabo'], observed=False).size()
+                    por_tipo = contagem.get(True, pd.Series(dtype=int))
                     total = len(df_resultado)
-                    sucesso = len(df_resultado[~df_resultado['Referência YOFC'].str.contains('Não consegui', na=False)])
+                    sucesso = int(por_tipo.sum())
                     falhas = total - sucesso
                     taxa_sucesso = (sucesso / total * 100) if total > 0 else 0
                     
                     # Mostrar resultados
-                    st.success("✅ Conversão concluída!")
+                    st.success(f"✅ Conversão concluída! {len(df_resultado):,} linhas em {tarefa.segundos:.1f}s "
+                               f"({tarefa.linhas_por_segundo:,.0f} linhas/s)")
+                    st.caption(f"🔁 {dedup['descricoes_unicas']} descrições únicas em {dedup['linhas']} linhas "
+                               f"({dedup['taxa_unicas']:.1%} convertidas)")
+                    if estatisticas_cache is not None:
+                        st.caption(f"🗄️ Cache: {estatisticas_cache['acertos']} descrições reaproveitadas, "
+                                   f"{estatisticas_cache['falhas']} convertidas agora")
+                    if catalogo is not None:
+                        no_catalogo = catalogo.estatisticas(df_resultado)
+                        st.caption(f"📚 Catálogo ({len(catalogo):,} códigos): {no_catalogo.get('EXATO', 0):,} linhas "
+                                   f"com código do catálogo, {no_catalogo.get('FORA_DO_CATALOGO', 0):,} fora dele "
+                                   "(ver 'Sugestão do Catálogo')")
                     
                     # Métricas
                     st.subheader("📊 Estatísticas da Conversão")
@@ -187,21 +530,19 @@ def main():
                         st.metric("Convertidas", sucesso, delta=f"{taxa_sucesso:.1f}%")
                     with col3:
                         st.metric("Falhas", falhas, delta_color="inverse")
+                    # Convertidas por tipo de cabo
+                    vfd_count = int(por_tipo.get('VFD', 0))
+                    inst_count = int(por_tipo.get('INSTRUMENTACAO', 0))
+                    energia_count = int(por_tipo.get('ENERGIA', 0))
+                    controle_count = int(por_tipo.get('CONTROLE', 0))
+                    
                     with col4:
-                        # Contar tipos
-                        vfd = len(df_resultado[df_resultado['Referência YOFC'].str.contains('VFD', na=False)])
-                        inst = len(df_resultado[df_resultado['Referência YOFC'].str.match(r'^\d{3} ', na=False)])
-                        st.metric("VFD + Inst.", vfd + inst)
+                        st.metric("VFD + Inst.", vfd_count + inst_count)
                     
                     # Distribuição por tipo
                     if mostrar_detalhes:
                         st.subheader("📈 Distribuição por Tipo de Cabo")
                         
-                        vfd_count = len(df_resultado[df_resultado['Referência YOFC'].str.contains('VFD', na=False)])
-                        inst_count = len(df_resultado[df_resultado['Referência YOFC'].str.match(r'^\d{3} ', na=False)])
-                        energia_count = len(df_resultado[df_resultado['Referência YOFC'].str.contains('CE ', na=False)])
-                        controle_count = len(df_resultado[df_resultado['Referência YOFC'].str.contains('CM |CA ', na=False, regex=True)])
-                        
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
                             st.metric("⚡ VFD", vfd_count)
@@ -219,35 +560,87 @@ def main():
                     # Mostrar falhas se houver
                     if falhas > 0:
                         st.warning(f"⚠️ {falhas} especificação(ões) não puderam ser convertidas. Verifique os detalhes abaixo:")
-                        df_falhas = df_resultado[df_resultado['Referência YOFC'].str.contains('Não consegui', na=False)]
-                        st.dataframe(df_falhas[[coluna_descricao, 'Referência YOFC']], use_container_width=True)
+                        df_falhas = df_resultado[~df_resultado['Convertido']]
+                        colunas_falhas = [coluna_descricao, 'Referência YOFC', 'Motivo da Falha']
+                        if sugerir:
+                            df_falhas, indexadas = sugerir_semelhantes(chave_conversao, coluna_descricao, usar_cache,
+                                                                       df_resultado, df_falhas)
+                            colunas_falhas += colunas_semelhanca(SUGESTOES_PADRAO)
+                            st.caption(f"💡 Descrições convertidas mais parecidas com cada falha e os seus códigos "
+                                       f"({indexadas:,} descrições indexadas)")
+                        st.dataframe(df_falhas[colunas_falhas], use_container_width=True)
+                        
+                        # Trajeto de decisão só a pedido, para as descrições únicas das falhas
+                        if st.toggle("🔍 Explicar as falhas", value=False,
+                                     help="Formação e padrão encontrados, regra que decidiu o tipo de cabo e "
+                                          "palavras-chave encontradas de cada descrição não convertida"):
+                            unicas_falhas = df_falhas[coluna_descricao].astype(str).drop_duplicates()
+                            st.dataframe(tabela_explicacoes(unicas_falhas.head(MAX_EXPLICACOES)),
+                                         use_container_width=True, hide_index=True)
+                            if len(unicas_falhas) > MAX_EXPLICACOES:
+                                st.caption(f"Explicadas as primeiras {MAX_EXPLICACOES} de {len(unicas_falhas):,} "
+                                           "descrições não convertidas")
+                    
+                    # Trajeto de decisão de uma linha qualquer, calculado só quando é escolhida
+                    with st.expander("🔍 Explicar uma linha"):
+                        linha = st.number_input("Linha do resultado (índice)", min_value=0,
+                                                max_value=max(total - 1, 0), value=None, step=1)
+                        if linha is not None:
+                            explicacao = obter_conversor().explicar(df_resultado[coluna_descricao].iloc[int(linha)])
+                            st.code(formatar_explicacao(explicacao), language=None)
+                            st.json(explicacao, expanded=False)
                     
                     # Preparar download
                     st.divider()
                     st.subheader("💾 Download do Resultado")
                     
-                    # Gerar nome do ficheiro
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        conteudo_saida = st.radio(
+                            "Conteúdo",
+                            options=list(CONTEUDOS_DOWNLOAD),
+                            format_func=lambda opcao: CONTEUDOS_DOWNLOAD[opcao][0],
+                            horizontal=True,
+                        )
+                    with col2:
+                        comprimir = st.checkbox(
+                            "CSV comprimido (.csv.gz)",
+                            value=formato == 'csv_gz',
+                            disabled=formato == 'csv_gz',
+                            help="Ficheiro muito menor e mais rápido de gerar do que o Excel"
+                        )
+                    formato_saida = 'csv_gz' if comprimir else formato
+                    
+                    # Gerar nome do ficheiro (no formato da entrada, ou .csv.gz)
+                    extensao = '.csv.gz' if comprimir else extensao_saida(uploaded_file.name)
+                    sufixo = CONTEUDOS_DOWNLOAD[conteudo_saida][1]
                     if incluir_timestamp:
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        nome_ficheiro = f"Especificacoes_Convertidas_{timestamp}.xlsx"
+                        nome_ficheiro = f"Especificacoes_Convertidas{sufixo}_{timestamp}{extensao}"
                     else:
-                        nome_ficheiro = "Especificacoes_Convertidas.xlsx"
+                        nome_ficheiro = f"Especificacoes_Convertidas{sufixo}{extensao}"
                     
-                    # Converter para Excel
-                    excel_data = converter_df_para_excel(df_resultado)
+                    # O ficheiro de saída só é gerado no clique do botão (data como função: streamlit>=1.52)
+                    def dados_saida():
+                        return gerar_saida(hash_arquivo, hash_catalogo, todas_folhas, coluna_descricao, usar_cache,
+                                           formato_saida, conteudo_saida, formato, df_resultado, conteudo,
+                                           colunas_folhas)[0]
                     
                     col1, col2, col3 = st.columns([1, 2, 1])
                     with col2:
                         st.download_button(
                             label="📥 Download Planilha Convertida",
-                            data=excel_data,
+                            data=dados_saida,
                             file_name=nome_ficheiro,
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            mime=TIPOS_MIME[formato_saida],
                             type="primary",
                             use_container_width=True
                         )
                     
-                    st.success(f"✅ Pronto para download: {nome_ficheiro}")
+                    st.caption(f"💾 {nome_ficheiro} é gerado ao clicar no botão")
+                    
+                    if perfil is not None:
+                        mostrar_perfil(perfil)
         
         except Exception as e:
             st.error(f"❌ Erro ao processar o ficheiro: {str(e)}")
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Benchmark
+Gera descrições sintéticas cobrindo todos os ramos do conversor e mede
+throughput (linhas/s), latência por ramo e pico de memória de:
+  - converter_especificacao (chamada a chamada)
+  - processar_planilha (DataFrame completo)
+  - linha de comando, da planilha Excel de entrada à de saída
+  - exportação da tabela convertida (Excel por motor, CSV, CSV comprimido e Parquet)
+
+Uso:
+    python3.11 scripts/benchmark_conversor.py --linhas 50000 --taxa-duplicadas 0.6
+    python3.11 scripts/benchmark_conversor.py --comparar benchmark_anterior.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from conversor_poliron import ConversorPoliron, motivo_falha, ahocorasick
+from formatos_tabela import gravar_tabela, gravar_excel, xlsxwriter
+
+SCRIPT_CONVERSOR = Path(__file__).parent / "conversor_poliron.py"
+
+# Ramos do conversor cobertos pelo gerador
+RAMOS = [
+    'vfd_concentrico', 'vfd_simetrico',
+    'instrumentacao_pares', 'instrumentacao_ternas', 'instrumentacao_quadras',
+    'energia', 'controle', 'cores_condutores', 'cil', 'nao_reconhecida',
+]
+
+PERCENTIS = [50, 90, 99]
+
+# Opções de cada atributo (None = atributo ausente, o conversor usa o padrão)
+ISOLACOES = [None, "ISOLACAO EM XLPE", "ISOLACAO EM HEPR", "ISOLACAO EM PVC/E", "PVC 105"]
+COBERTURAS = [None, "COBERTURA ST2", "COBERTURA ST3", "COBERTURA SHF1", "COBERTURA SHF2",
+              "NAO HALOGENADO", "NÃO HALOGENADO", "LSZH"]
+BLINDAGENS = [None, "BLINDAGEM EM TRANCA DE COBRE", "TRANÇA DE COBRE",
+              "BLINDAGEM EM FITA DE COBRE", "BLINDAGEM EM FITA DE ALUMINIO"]
+CORES_CAPA = [None, "COR VERMELHO", "COR AZUL", "COR VERDE", "COR CINZA"]
+EXTRAS = [None, "CLASSE 2", "COBRE ESTANHADO", "0,6/1KV", "ANTICHAMA"]
+
+# Frases de veias coloridas, por quantidade de condutores
+VEIAS_COLORIDAS = {
+    1: "1C PRETO",
+    2: "2C PRETO E AZUL CLARO",
+    3: "3C PRETO, BRANCO E AZUL CLARO",
+    4: "4C PRETO, BRANCO, VERMELHO E AZUL CLARO",
+    5: "VEIAS PRETO, BRANCO, VERMELHO, AZUL CLARO E VERDE/AMARELO",
+}
+FRASES_CIL = ["ACABAMENTO CILINDRICO", "COBERTURA DE FORMATO CILINDRICO", "acabamento externo cilindrico"]
+
+SECOES_ENERGIA = ["1,5", "2.5", "4", "6,0", "10", "16", "25", "35", "50", "70", "95", "120", "240"]
+SECOES_INSTRUMENTACAO = ["0,5", "0.75", "1", "1,5", "2.5"]
+
+
+def _formacao(qtd: int, letra: str, secao: str, aleatorio: random.Random) -> str:
+    """Formação no estilo das planilhas: '3Cx4mm2', '12Px 2.5MM2'... (grafia variável)"""
+    separador = aleatorio.choice(["x", "x", "x "])
+    sufixo = aleatorio.choice(["mm2", "mm2", "MM2"]) if letra in "Cc" else "mm2"
+    return f"{qtd}{letra}{separador}{secao}{sufixo}"
+
+
+def _descricao_ramo(ramo: str, aleatorio: random.Random) -> str:
+    """Gera uma descrição que deve seguir o ramo indicado do conversor"""
+    escolher = aleatorio.choice
+    atributos = [escolher(ISOLACOES), escolher(COBERTURAS), escolher(CORES_CAPA), escolher(EXTRAS)]
+    
+    if ramo in ('vfd_concentrico', 'vfd_simetrico'):
+        cabeca = escolher(["CABO PARA INVERSOR DE FREQUENCIA", "CABO VFD", "Cabo vfd"])
+        secao = escolher(SECOES_ENERGIA)
+        qtd2 = 1 if ramo == 'vfd_concentrico' else 3
+        atributos.append(escolher([None, "PRETO/BRANCO/AZUL", "PT/BR/VM"]))
+        formacao = (f"{_formacao(3, escolher('Cc'), secao, aleatorio)}"
+                    f"{escolher(['+', ' + '])}{_formacao(qtd2, escolher('Cc'), secao, aleatorio)}")
+    elif ramo.startswith('instrumentacao'):
+        cabeca = escolher(["CABO DE INSTRUMENTACAO", "CABO DE INSTRUMENTAÇÃO", "cabo de instrumentacao"])
+        letra = {'instrumentacao_pares': 'Pp', 'instrumentacao_ternas': 'Tt', 'instrumentacao_quadras': 'Qq'}[ramo]
+        atributos[0] = "ISOLACAO EM PVC/E"
+        atributos.append(escolher([None, "BLINDAGEM INDIVIDUAL E COLETIVA"]))
+        formacao = _formacao(escolher([1, 2, 4, 8, 12, 24]), escolher(letra),
+                             escolher(SECOES_INSTRUMENTACAO), aleatorio)
+    elif ramo in ('energia', 'cores_condutores', 'cil'):
+        cabeca = escolher(["CABO DE BAIXA TENSAO", "CABO DE POTENCIA", "cabo de energia",
+                           "CABO DE COBRE FLEXIVEL"])
+        qtd = escolher([1, 2, 3, 4, 5])
+        atributos.append(escolher(BLINDAGENS))
+        if ramo == 'cores_condutores':
+            atributos += ["IDENTIFICACAO VEIAS COLORIDAS", VEIAS_COLORIDAS[qtd]]
+        elif ramo == 'cil':
+            atributos.append(escolher(FRASES_CIL))
+        formacao = _formacao(qtd, escolher('Cc'), escolher(SECOES_ENERGIA), aleatorio)
+    elif ramo == 'controle':
+        cabeca = escolher(["CABO DE CONTROLE", "CABO DE COMANDO", "cabo de controle"])
+        atributos.append(escolher(BLINDAGENS))
+        formacao = _formacao(escolher([2, 4, 7, 12, 19, 24, 37]), escolher('Cc'),
+                             escolher(SECOES_ENERGIA[:4]), aleatorio)
+    else:  # nao_reconhecida: sem formação, formação sem tipo, VFD fora do padrão...
+        cabeca, formacao = escolher([
+            ("CABO DE BAIXA TENSAO", "70mm2"),
+            ("CABO DE CONTROLE", "7 vias 1,5"),
+            ("CABO", _formacao(3, "C", escolher(SECOES_ENERGIA), aleatorio)),
+            ("CABO PARA INVERSOR DE FREQUENCIA", "2Cx4mm2+1Cx4mm2"),
+            ("CABO VFD", "4Cx10mm2"),
+            ("CABO DE INSTRUMENTACAO", "4x2x1,5mm2"),
+            ("ELETRODUTO DE ACO GALVANIZADO", '3/4"'),
+            ("", ""),
+        ])
+    
+    atributos = [a for a in atributos if a]
+    aleatorio.shuffle(atributos)
+    texto = " , ".join(p for p in [cabeca] + atributos if p)
+    return f"{texto} - {formacao}" if formacao else texto
+
+
+def gerar_descricoes(linhas: int, taxa_duplicadas: float = 0.5, semente: int = 42,
+                     ramos: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """
+    Gera (ramo, descrição) para `linhas` linhas, distribuídas igualmente entre os ramos
+    Cerca de `taxa_duplicadas` das linhas repetem uma descrição já gerada
+    (0.0 = todas distintas; 0.9 = só 10% de descrições únicas)
+    """
+    aleatorio = random.Random(semente)
+    ramos = ramos or RAMOS
+    qtd_unicas = max(1, min(linhas, round(linhas * (1.0 - taxa_duplicadas))))
+    
+    unicas = []
+    vistas = set()
+    tentativas = 0
+    while len(unicas) < qtd_unicas:
+        ramo = ramos[len(unicas) % len(ramos)]
+        descricao = _descricao_ramo(ramo, aleatorio)
+        tentativas += 1
+        if descricao in vistas:
+            # Espaço de combinações esgotado para o ramo: diferenciar pelo número do item
+            if tentativas < 20 * qtd_unicas:
+                continue
+            descricao = f"ITEM {len(unicas)} {descricao}"
+        vistas.add(descricao)
+        unicas.append((ramo, descricao))
+    
+    amostra = unicas + [aleatorio.choice(unicas) for _ in range(linhas - qtd_unicas)]
+    aleatorio.shuffle(amostra)
+    return amostra
+
+
+def _percentis(latencias_ns: np.ndarray) -> Dict:
+    """Percentis de latência em microssegundos"""
+    if len(latencias_ns) == 0:
+        return {'n': 0}
+    resultado = {'n': int(len(latencias_ns))}
+    for p, valor in zip(PERCENTIS, np.percentile(latencias_ns, PERCENTIS)):
+        resultado[f'p{p}_us'] = round(float(valor) / 1000, 2)
+    resultado['max_us'] = round(float(latencias_ns.max()) / 1000, 2)
+    return resultado
+
+
+def _pico_memoria(funcao: Callable) -> float:
+    """Executa a função sob tracemalloc e retorna o pico de memória alocada (MB)"""
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 2**20, 2)
+
+
+def _resumo_tempos(tempos: List[float], linhas: int) -> Dict:
+    """Melhor tempo e mediana das repetições, com o throughput do melhor tempo"""
+    melhor = min(tempos)
+    return {
+        'segundos': round(melhor, 4),
+        'segundos_mediana': round(float(np.median(tempos)), 4),
+        'linhas_por_segundo': round(linhas / max(melhor, 1e-9), 1),
+    }
+
+
+def medir_converter_especificacao(conversor: ConversorPoliron, amostra: List[Tuple[str, str]],
+                                  repeticoes: int) -> Dict:
+    """Latência de cada chamada a converter_especificacao, agrupada pelo ramo gerado"""
+    ramos = [ramo for ramo, _ in amostra]
+    descricoes = [descricao for _, descricao in amostra]
+    converter = conversor.converter_especificacao
+    relogio = time.perf_counter_ns
+    
+    latencias = np.empty((repeticoes, len(descricoes)), dtype=np.int64)
+    tempos = []
+    for r in range(repeticoes):
+        linha = latencias[r]
+        inicio = time.perf_counter()
+        for i, descricao in enumerate(descricoes):
+            t0 = relogio()
+            converter(descricao)
+            linha[i] = relogio() - t0
+        tempos.append(time.perf_counter() - inicio)
+    
+    # Taxa de conversão por ramo: uma queda indica regressão nas regras
+    convertidas = np.array([motivo_falha(converter(d)) is None for d in descricoes])
+    por_ramo = {}
+    ramos_array = np.array(ramos)
+    for ramo in sorted(set(ramos), key=RAMOS.index):
+        mascara = ramos_array == ramo
+        por_ramo[ramo] = _percentis(latencias[:, mascara].ravel())
+        por_ramo[ramo]['taxa_convertidas'] = round(float(convertidas[mascara].mean()), 4)
+    
+    resultado = _resumo_tempos(tempos, len(descricoes))
+    resultado['latencia'] = _percentis(latencias.ravel())
+    resultado['latencia_por_ramo'] = por_ramo
+    resultado['pico_memoria_mb'] = _pico_memoria(lambda: [converter(d) for d in descricoes])
+    return resultado
+
+
+def medir_processar_planilha(conversor: ConversorPoliron, amostra: List[Tuple[str, str]],
+                             repeticoes: int, workers: int) -> Dict:
+    """Tempo e memória de processar_planilha sobre um DataFrame com a amostra"""
+    df = pd.DataFrame({
+        'Item': np.arange(1, len(amostra) + 1),
+        'Descrição': [descricao for _, descricao in amostra],
+    })
+    
+    def executar(copia: pd.DataFrame):
+        conversor.processar_planilha(copia, 'Descrição', workers=workers, detalhes=True)
+    
+    # processar_planilha acrescenta colunas ao DataFrame: cada execução recebe uma cópia
+    tempos = []
+    for _ in range(repeticoes):
+        copia = df.copy()
+        inicio = time.perf_counter()
+        executar(copia)
+        tempos.append(time.perf_counter() - inicio)
+    
+    resultado = _resumo_tempos(tempos, len(df))
+    resultado['descricoes_unicas'] = conversor.estatisticas_dedup['descricoes_unicas']
+    resultado['workers'] = workers
+    # Com workers > 1 o tracemalloc mede apenas o processo principal
+    copia = df.copy()
+    resultado['pico_memoria_mb'] = _pico_memoria(lambda: executar(copia))
+    return resultado
+
+
+def medir_exportacao(df: pd.DataFrame, repeticoes: int, formato: str, motor: Optional[str] = None) -> Dict:
+    """
+    Tempo, memória e tamanho da gravação da tabela convertida num ficheiro temporário
+    Em Excel, `motor` é 'xlsxwriter' ou 'openpyxl' (gravar_excel) ou 'pandas' (to_excel, a referência)
+    """
+    def executar(destino):
+        if motor == 'pandas':
+            df.to_excel(destino, index=False, sheet_name='Conversão')
+        elif formato == 'excel':
+            gravar_excel(df, destino, nome_folha='Conversão', motor=motor)
+        else:
+            gravar_tabela(df, destino, formato)
+    
+    tempos = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        destino = Path(diretorio) / "saida"
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            executar(destino)
+            tempos.append(time.perf_counter() - inicio)
+        tamanho = destino.stat().st_size
+        resultado = _resumo_tempos(tempos, len(df))
+        resultado['formato'] = formato
+        resultado['motor'] = motor
+        resultado['tamanho_mb'] = round(tamanho / 2**20, 2)
+        resultado['pico_memoria_mb'] = _pico_memoria(lambda: executar(destino))
+    return resultado
+
+
+def _executar_cli(argumentos: List[str], diretorio: str) -> Tuple[float, Optional[float]]:
+    """
+    Executa a linha de comando num subprocesso
+    Retorna (segundos, pico de memória residente em MB, ou None se indisponível)
+    """
+    comando = [sys.executable, str(SCRIPT_CONVERSOR), *argumentos]
+    with tempfile.TemporaryFile() as saida:
+        inicio = time.perf_counter()
+        processo = subprocess.Popen(comando, cwd=diretorio, stdout=saida, stderr=subprocess.STDOUT)
+        if hasattr(os, 'wait4'):
+            _, status, uso = os.wait4(processo.pid, 0)
+            processo.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss: kB no Linux, bytes no macOS
+            pico = uso.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+        else:
+            processo.wait()
+            pico = None
+        duracao = time.perf_counter() - inicio
+        
+        if processo.returncode != 0:
+            saida.seek(0)
+            mensagem = saida.read().decode(errors='replace')
+            raise RuntimeError(f"Linha de comando falhou ({processo.returncode}):\n{mensagem}")
+    
+    return duracao, (round(pico, 2) if pico is not None else None)
+
+
+def medir_cli_excel(amostra: List[Tuple[str, str]], repeticoes: int, streaming: bool = False) -> Dict:
+    """
+    Ciclo completo da linha de comando: inicialização, leitura do Excel,
+    conversão e gravação da planilha de saída (a geração da entrada não é medida)
+    """
+    with tempfile.TemporaryDirectory() as diretorio:
+        entrada = Path(diretorio) / "entrada.xlsx"
+        pd.DataFrame({
+            'Item': np.arange(1, len(amostra) + 1),
+            'Descrição': [descricao for _, descricao in amostra],
+        }).to_excel(entrada, index=False)
+        
+        argumentos = [str(entrada)] + (["--streaming"] if streaming else [])
+        tempos, picos = [], []
+        for _ in range(repeticoes):
+            duracao, pico = _executar_cli(argumentos, diretorio)
+            tempos.append(duracao)
+            picos.append(pico)
+    
+    resultado = _resumo_tempos(tempos, len(amostra))
+    resultado['streaming'] = streaming
+    # Memória residente do processo inteiro (interpretador, pandas, openpyxl...)
+    resultado['pico_memoria_rss_mb'] = max(picos) if None not in picos else None
+    return resultado
+
+
+def comparar(atual: Dict, anterior: Dict):
+    """Imprime a variação de throughput e memória em relação a um resultado anterior"""
+    print(f"\n📊 Comparação com {anterior['meta']['data']} (regras {anterior['meta']['versao_regras']})")
+    for etapa, medidas in atual['etapas'].items():
+        base = anterior.get('etapas', {}).get(etapa)
+        if not base:
+            continue
+        variacao = medidas['linhas_por_segundo'] / base['linhas_por_segundo'] - 1
+        print(f"   {etapa:<28} {base['linhas_por_segundo']:>12,.0f} -> "
+              f"{medidas['linhas_por_segundo']:>12,.0f} linhas/s ({variacao:+.1%})")
+    
+    ramos_atuais = atual['etapas'].get('converter_especificacao', {}).get('latencia_por_ramo', {})
+    ramos_base = anterior.get('etapas', {}).get('converter_especificacao', {}).get('latencia_por_ramo', {})
+    for ramo, medidas in ramos_atuais.items():
+        base = ramos_base.get(ramo)
+        if base and base.get('p50_us'):
+            print(f"   {ramo:<28} p50 {base['p50_us']:>8.1f} -> {medidas['p50_us']:>8.1f} µs, "
+                  f"convertidas {base['taxa_convertidas']:.1%} -> {medidas['taxa_convertidas']:.1%}")
+
+
+def main():
+    """Executa o benchmark e grava o resultado em JSON"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark do conversor de especificações Poliron")
+    parser.add_argument("--linhas", type=int, default=20000, help="Linhas da amostra sintética (padrão: 20000)")
+    parser.add_argument("--taxa-duplicadas", type=float, default=0.5,
+                        help="Fração das linhas que repetem uma descrição (padrão: 0.5)")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (padrão: 42)")
+    parser.add_argument("--repeticoes", type=int, default=3,
+                        help="Repetições de cada medida; vale o melhor tempo (padrão: 3)")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para processar_planilha (padrão: 1)")
+    parser.add_argument("--sem-cli", action="store_true", help="Não mede o ciclo Excel da linha de comando")
+    parser.add_argument("--sem-exportacao", action="store_true", help="Não mede a gravação da tabela convertida")
+    parser.add_argument("--saida", help="Ficheiro JSON do resultado (padrão: benchmark_<data>.json)")
+    parser.add_argument("--comparar", metavar="JSON", help="Resultado anterior para comparação")
+    args = parser.parse_args()
+    
+    amostra = gerar_descricoes(args.linhas, args.taxa_duplicadas, args.semente)
+    
+    inicio = time.perf_counter()
+    conversor = ConversorPoliron()
+    inicializacao = time.perf_counter() - inicio
+    
+    resultado = {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'versao_regras': conversor.versao_regras,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+            'processadores': os.cpu_count(),
+            'aho_corasick': ahocorasick is not None,
+        },
+        'parametros': {
+            'linhas': args.linhas,
+            'taxa_duplicadas': args.taxa_duplicadas,
+            'semente': args.semente,
+            'repeticoes': args.repeticoes,
+        },
+        'amostra': {
+            'descricoes_unicas': len({descricao for _, descricao in amostra}),
+            'linhas_por_ramo': {ramo: sum(1 for r, _ in amostra if r == ramo) for ramo in RAMOS},
+        },
+        'inicializacao_s': round(inicializacao, 4),
+        'etapas': {},
+    }
+    etapas = resultado['etapas']
+    
+    print(f"🧪 {args.linhas} linhas, {resultado['amostra']['descricoes_unicas']} descrições únicas")
+    etapas['converter_especificacao'] = medir_converter_especificacao(conversor, amostra, args.repeticoes)
+    etapas['processar_planilha'] = medir_processar_planilha(conversor, amostra, args.repeticoes, args.workers)
+    if not args.sem_cli:
+        etapas['cli_excel'] = medir_cli_excel(amostra, args.repeticoes)
+        etapas['cli_excel_streaming'] = medir_cli_excel(amostra, args.repeticoes, streaming=True)
+    if not args.sem_exportacao:
+        df_convertido = conversor.processar_planilha(
+            pd.DataFrame({'Item': np.arange(1, len(amostra) + 1),
+                          'Descrição': [descricao for _, descricao in amostra]}),
+            'Descrição')
+        motores = (['xlsxwriter'] if xlsxwriter is not None else []) + ['openpyxl', 'pandas']
+        for motor in motores:
+            etapas[f'exportacao_excel_{motor}'] = medir_exportacao(df_convertido, args.repeticoes, 'excel', motor)
+        for formato in ('csv', 'csv_gz', 'parquet'):
+            etapas[f'exportacao_{formato}'] = medir_exportacao(df_convertido, args.repeticoes, formato)
+    
+    for etapa, medidas in etapas.items():
+        memoria = medidas.get('pico_memoria_mb', medidas.get('pico_memoria_rss_mb'))
+        memoria_fmt = f"{memoria:,.1f} MB" if memoria is not None else "n/d"
+        print(f"⏱️  {etapa:<28} {medidas['segundos']:>8.3f}s  "
+              f"{medidas['linhas_por_segundo']:>12,.0f} linhas/s  pico {memoria_fmt}")
+    for ramo, medidas in etapas['converter_especificacao']['latencia_por_ramo'].items():
+        print(f"   {ramo:<28} p50 {medidas['p50_us']:>8.1f} µs  p99 {medidas['p99_us']:>8.1f} µs  "
+              f"convertidas {medidas['taxa_convertidas']:.1%}")
+    
+    arquivo_saida = args.saida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(arquivo_saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"✅ Resultado salvo: {arquivo_saida}")
+    
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Cache de Conversões
+Cache persistente (SQLite) dos códigos gerados, por descrição normalizada e versão das regras
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+# Limite de parâmetros por consulta (o SQLite antigo aceita no máximo 999)
+TAMANHO_LOTE_SQL = 900
+
+
+class CacheConversao:
+    """
+    Cache em disco de descrição normalizada -> (código Poliron, tipo de cabo).
+    A chave inclui a versão das regras (hash dos JSON de configuração), então
+    alterar uma regra invalida automaticamente as entradas antigas, que deixam
+    de ser consultadas e acabam removidas pela política LRU.
+    """
+    
+    def __init__(self, caminho: str, versao_regras: str, tamanho_maximo: int = 1_000_000):
+        """Abre (ou cria) o ficheiro do cache"""
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.versao_regras = versao_regras
+        self.tamanho_maximo = tamanho_maximo
+        
+        self.acertos = 0
+        self.falhas = 0
+        
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(str(self.caminho), check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS conversoes (
+                versao TEXT NOT NULL,
+                descricao TEXT NOT NULL,
+                codigo TEXT NOT NULL,
+                ultimo_uso INTEGER NOT NULL,
+                tipo TEXT,
+                PRIMARY KEY (versao, descricao)
+            )
+        """)
+        # Ficheiros criados antes da coluna 'tipo': as entradas sem tipo contam como ausentes
+        colunas = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(conversoes)")}
+        if 'tipo' not in colunas:
+            self._conexao.execute("ALTER TABLE conversoes ADD COLUMN tipo TEXT")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_uso ON conversoes (ultimo_uso)")
+        self._conexao.commit()
+        
+        # Relógio lógico do LRU: continua a partir do maior valor já gravado
+        linha = self._conexao.execute("SELECT COALESCE(MAX(ultimo_uso), 0) FROM conversoes").fetchone()
+        self._relogio = linha[0]
+        
+        # Entradas no ficheiro, contadas na abertura e mantidas a cada gravação; outros processos
+        # podem gravar no mesmo ficheiro, então são recontadas antes de remover o excesso
+        self._entradas = self._contar()
+    
+    def _contar(self) -> int:
+        return self._conexao.execute("SELECT COUNT(*) FROM conversoes").fetchone()[0]
+    
+    def _tique(self) -> int:
+        self._relogio += 1
+        return self._relogio
+    
+    def buscar_lote(self, descricoes: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """
+        Busca várias descrições normalizadas de uma vez
+        Retorna {descrição: (código, tipo)} apenas para as encontradas
+        """
+        descricoes = list(descricoes)
+        encontradas = {}
+        with self._lock:
+            for i in range(0, len(descricoes), TAMANHO_LOTE_SQL):
+                lote = descricoes[i:i + TAMANHO_LOTE_SQL]
+                marcadores = ','.join('?' * len(lote))
+                cursor = self._conexao.execute(
+                    f"SELECT descricao, codigo, tipo FROM conversoes "
+                    f"WHERE versao = ? AND tipo IS NOT NULL AND descricao IN ({marcadores})",
+                    [self.versao_regras, *lote],
+                )
+                encontradas.update((descricao, (codigo, tipo)) for descricao, codigo, tipo in cursor)
+            
+            # Marcar as entradas usadas (LRU)
+            if encontradas:
+                uso = self._tique()
+                self._conexao.executemany(
+                    "UPDATE conversoes SET ultimo_uso = ? WHERE versao = ? AND descricao = ?",
+                    [(uso, self.versao_regras, descricao) for descricao in encontradas],
+                )
+                self._conexao.commit()
+            
+            self.acertos += len(encontradas)
+            self.falhas += len(descricoes) - len(encontradas)
+        return encontradas
+    
+    def gravar_lote(self, entradas: Iterable[Tuple[str, str, str]]):
+        """Grava (descrição normalizada, código, tipo) e aplica o limite de tamanho"""
+        with self._lock:
+            uso = self._tique()
+            linhas = [(codigo, tipo, uso, self.versao_regras, descricao) for descricao, codigo, tipo in entradas]
+            
+            # As descrições novas entram com INSERT OR IGNORE, que conta as linhas acrescentadas;
+            # as que já existiam (ex: gravadas por outro processo) são atualizadas a seguir
+            antes = self._conexao.total_changes
+            self._conexao.executemany(
+                "INSERT OR IGNORE INTO conversoes (codigo, tipo, ultimo_uso, versao, descricao) "
+                "VALUES (?, ?, ?, ?, ?)",
+                linhas,
+            )
+            novas = self._conexao.total_changes - antes
+            if novas < len(linhas):
+                self._conexao.executemany(
+                    "UPDATE conversoes SET codigo = ?, tipo = ?, ultimo_uso = ? WHERE versao = ? AND descricao = ?",
+                    linhas,
+                )
+            self._entradas += novas
+            self._remover_excesso()
+            self._conexao.commit()
+    
+    def listar(self, excluir_prefixo: str = None) -> List[Tuple[str, str]]:
+        """
+        Todas as entradas (descrição normalizada, código) da versão atual das regras
+        Com `excluir_prefixo`, sem os códigos que começam por ele (ex: as falhas de conversão)
+        """
+        consulta = "SELECT descricao, codigo FROM conversoes WHERE versao = ?"
+        parametros = [self.versao_regras]
+        if excluir_prefixo:
+            consulta += " AND substr(codigo, 1, ?) <> ?"
+            parametros += [len(excluir_prefixo), excluir_prefixo]
+        with self._lock:
+            return self._conexao.execute(consulta, parametros).fetchall()
+    
+    def _remover_excesso(self):
+        """Remove as entradas menos usadas recentemente acima de tamanho_maximo"""
+        if self._entradas <= self.tamanho_maximo:
+            return
+        self._entradas = self._contar()
+        excesso = self._entradas - self.tamanho_maximo
+        if excesso > 0:
+            self._conexao.execute(
+                "DELETE FROM conversoes WHERE rowid IN "
+                "(SELECT rowid FROM conversoes ORDER BY ultimo_uso LIMIT ?)",
+                (excesso,),
+            )
+            self._entradas -= excesso
+    
+    def estatisticas(self) -> Dict:
+        """Acertos/falhas desde a abertura e número de entradas no ficheiro"""
+        with self._lock:
+            self._entradas = entradas = self._contar()
+            acertos, falhas = self.acertos, self.falhas
+        consultas = acertos + falhas
+        return {
+            'acertos': acertos,
+            'falhas': falhas,
+            'taxa_acertos': (acertos / consultas) if consultas > 0 else 0.0,
+            'entradas': entradas,
+        }
+    
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
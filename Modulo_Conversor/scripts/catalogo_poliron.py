@@ -0,0 +1,262 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Catálogo
+Valida os códigos gerados contra o catálogo de produtos Poliron, com um índice
+em disco (Arrow, mapeado em memória) que abre em milissegundos
+"""
+
+import os
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from conversor_poliron import PREFIXO_FALHA
+from formatos_tabela import formato_arquivo, ler_tabela
+
+# Muda sempre que o formato do ficheiro de índice muda (índices antigos são reconstruídos)
+VERSAO_INDICE = '2'
+
+# Coluna do catálogo com os códigos (sem ela, a primeira coluna)
+COLUNA_CATALOGO = 'Código'
+
+# Estado de cada código no catálogo (categorias da coluna 'Catálogo')
+ESTADOS_CATALOGO = ['EXATO', 'FORA_DO_CATALOGO', 'NAO_CONVERTIDO']
+
+# Vizinhos comparados de cada lado da posição alfabética do código, na sugestão
+VIZINHOS_SUGESTAO = 8
+
+# Sem códigos do mesmo prefixo, famílias até este tamanho são comparadas por inteiro na sugestão
+FAMILIA_COMPARADA_INTEIRA = 512
+
+
+def normalizar_codigo(codigo: str) -> str:
+    """Código em maiúsculas, com os espaços repetidos reduzidos a um"""
+    return ' '.join(str(codigo).upper().split())
+
+
+def _hash(texto: str) -> int:
+    """Hash estável de 64 bits (o hash() do Python muda entre processos)"""
+    return int.from_bytes(hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _semelhanca(elementos: Set[str], codigo: str, candidato: str) -> Tuple[int, int]:
+    """Elementos (separados por espaço) em comum e, no empate, o início comum mais longo"""
+    return len(elementos.intersection(candidato.split(' '))), len(os.path.commonprefix((codigo, candidato)))
+
+
+def _vista(tabela: pa.Table, nome: str) -> np.ndarray:
+    """Coluna numérica sem nulos como vista numpy (sobre o ficheiro mapeado, sem cópia)"""
+    coluna = tabela.column(nome)
+    return coluna.chunk(0).to_numpy() if coluna.num_chunks == 1 else coluna.to_numpy()
+
+
+def _chaves(codigo_normalizado: str) -> Tuple[str, str]:
+    """
+    Chaves de vizinhança de um código: família (segundo elemento, ex: 'CE', 'ITA',
+    'CONCENTRICO') e prefixo (seção e família, ex: '70 CE', 'VFD CONCENTRICO')
+    """
+    partes = codigo_normalizado.split(' ', 2)
+    familia = partes[1] if len(partes) > 1 else partes[0]
+    return familia, ' '.join(partes[:2])
+
+
+class CatalogoPoliron:
+    """
+    Índice do catálogo de códigos Poliron, gravado num ficheiro Arrow e mapeado em memória.
+    As linhas estão ordenadas por (família, prefixo, código), pelo hash das chaves:
+    cada família e cada prefixo ocupam um intervalo contíguo, encontrado por busca binária,
+    e dentro de cada prefixo os códigos estão em ordem alfabética. A ordem alfabética de cada
+    família inteira está em 'linha_familia' (a linha de cada posição do intervalo da família).
+    Para a pesquisa exata há outra ordem, pelo hash do código normalizado
+    ('hash_ordenado' e a linha correspondente em 'linha_hash').
+    Use carregar() para abrir o índice de um catálogo (construído na primeira vez).
+    """
+    
+    def __init__(self, tabela: pa.Table):
+        self.tabela = tabela
+        self.metadados = {k.decode(): v.decode() for k, v in (tabela.schema.metadata or {}).items()}
+        codigos = tabela.column('codigo')
+        self.codigos = codigos.chunk(0) if codigos.num_chunks == 1 else codigos.combine_chunks()
+        self._hash_familia = _vista(tabela, 'hash_familia')
+        self._hash_prefixo = _vista(tabela, 'hash_prefixo')
+        self._hash_ordenado = _vista(tabela, 'hash_ordenado')
+        self._linha_hash = _vista(tabela, 'linha_hash')
+        self._linha_familia = _vista(tabela, 'linha_familia')
+    
+    def __len__(self) -> int:
+        return self.tabela.num_rows
+    
+    @classmethod
+    def construir(cls, codigos: Iterable[str], arquivo_indice: Union[str, Path],
+                  metadados: Optional[Dict[str, str]] = None) -> 'CatalogoPoliron':
+        """Cria o ficheiro de índice a partir dos códigos do catálogo e abre-o"""
+        normalizados = sorted({normalizar_codigo(c) for c in codigos if isinstance(c, str) and c.strip()})
+        chaves = [_chaves(codigo) for codigo in normalizados]
+        hash_familia = np.fromiter((_hash(familia) for familia, _ in chaves), dtype=np.uint64,
+                                   count=len(normalizados))
+        hash_prefixo = np.fromiter((_hash(prefixo) for _, prefixo in chaves), dtype=np.uint64,
+                                   count=len(normalizados))
+        
+        # Ordem estável: dentro de cada prefixo os códigos continuam em ordem alfabética
+        ordem = np.lexsort((hash_prefixo, hash_familia))
+        codigos_ordenados = [normalizados[i] for i in ordem]
+        hash_codigo = np.fromiter((_hash(codigo) for codigo in codigos_ordenados), dtype=np.uint64,
+                                  count=len(codigos_ordenados))
+        linha_hash = np.argsort(hash_codigo, kind='stable').astype(np.uint32)
+        
+        # Ordem alfabética de cada família: os intervalos das famílias são os mesmos das linhas
+        linha_de = np.empty(len(normalizados), dtype=np.uint32)
+        linha_de[ordem] = np.arange(len(normalizados), dtype=np.uint32)
+        linha_familia = linha_de[np.argsort(hash_familia, kind='stable')]
+        
+        tabela = pa.table({
+            'codigo': pa.array(codigos_ordenados, type=pa.string()),
+            'hash_familia': hash_familia[ordem],
+            'hash_prefixo': hash_prefixo[ordem],
+            'hash_ordenado': hash_codigo[linha_hash],
+            'linha_hash': linha_hash,
+            'linha_familia': linha_familia,
+        }).replace_schema_metadata({'versao_indice': VERSAO_INDICE, **(metadados or {})})
+        
+        arquivo_indice = Path(arquivo_indice)
+        arquivo_indice.parent.mkdir(parents=True, exist_ok=True)
+        temporario = arquivo_indice.with_name(f".{arquivo_indice.name}.tmp")
+        with pa.OSFile(str(temporario), 'wb') as saida, pa.ipc.new_file(saida, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        temporario.replace(arquivo_indice)
+        return cls.abrir(arquivo_indice)
+    
+    @classmethod
+    def abrir(cls, arquivo_indice: Union[str, Path]) -> 'CatalogoPoliron':
+        """Abre um índice já construído, mapeado em memória (sem ler o ficheiro inteiro)"""
+        with pa.memory_map(str(arquivo_indice), 'r') as fonte:
+            tabela = pa.ipc.open_file(fonte).read_all()
+        return cls(tabela)
+    
+    @classmethod
+    def carregar(cls, arquivo_catalogo: Union[str, Path], arquivo_indice: Union[str, Path, None] = None,
+                 coluna: str = COLUNA_CATALOGO) -> 'CatalogoPoliron':
+        """
+        Índice do catálogo (Excel, CSV, Parquet ou Arrow), por padrão em '<catálogo>.indice.arrow'
+        O índice é reconstruído quando o catálogo muda (tamanho ou data) ou o formato do índice é antigo.
+        """
+        arquivo_catalogo = Path(arquivo_catalogo)
+        arquivo_indice = Path(arquivo_indice or arquivo_catalogo.with_name(f"{arquivo_catalogo.name}.indice.arrow"))
+        estado = arquivo_catalogo.stat()
+        metadados = {
+            'origem_tamanho': str(estado.st_size),
+            'origem_mtime_ns': str(estado.st_mtime_ns),
+            'coluna': coluna,
+        }
+        
+        if arquivo_indice.exists():
+            try:
+                catalogo = cls.abrir(arquivo_indice)
+            except (OSError, pa.ArrowInvalid, KeyError):
+                catalogo = None  # índice corrompido: construir de novo
+            if catalogo is not None and catalogo.metadados == {'versao_indice': VERSAO_INDICE, **metadados}:
+                return catalogo
+        
+        return cls.construir(cls.ler_codigos(arquivo_catalogo, coluna), arquivo_indice, metadados)
+    
+    @staticmethod
+    def ler_codigos(origem, coluna: str = COLUNA_CATALOGO, formato: Optional[str] = None) -> List[str]:
+        """Códigos do catálogo: a `coluna` indicada ou, se não existir, a primeira coluna"""
+        df = ler_tabela(origem, formato or formato_arquivo(origem))
+        serie = df[coluna] if coluna in df.columns else df.iloc[:, 0]
+        return serie.dropna().astype(str).tolist()
+    
+    def _intervalo(self, valores: np.ndarray, chave: str, inicio: int = 0, fim: Optional[int] = None) -> Tuple[int, int]:
+        """Intervalo [a, b) das linhas com o hash da chave, dentro de [inicio, fim)"""
+        alvo = np.uint64(_hash(chave))
+        fatia = valores[inicio:fim]
+        return (inicio + int(np.searchsorted(fatia, alvo, 'left')),
+                inicio + int(np.searchsorted(fatia, alvo, 'right')))
+    
+    def contem(self, codigo: str) -> bool:
+        """O código (normalizado) existe no catálogo"""
+        normalizado = normalizar_codigo(codigo)
+        a, b = self._intervalo(self._hash_ordenado, normalizado)
+        # Confirmar o texto: dois códigos podem ter o mesmo hash
+        return any(self.codigos[int(self._linha_hash[i])].as_py() == normalizado for i in range(a, b))
+    
+    def _posicao_alfabetica(self, codigo: str, inicio: int, fim: int, linhas: Optional[np.ndarray] = None) -> int:
+        """
+        Busca binária da posição do código entre os códigos (em ordem alfabética) de [inicio, fim),
+        ou entre as linhas linhas[inicio:fim] (ordem alfabética de uma família)
+        """
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if self.codigos[meio if linhas is None else int(linhas[meio])].as_py() < codigo:
+                inicio = meio + 1
+            else:
+                fim = meio
+        return inicio
+    
+    def sugerir(self, codigo: str) -> Optional[str]:
+        """
+        Código do catálogo mais parecido, procurado entre os códigos com o mesmo prefixo
+        (seção e família) ou, se não houver nenhum, da mesma família: só os VIZINHOS_SUGESTAO
+        de cada lado da posição alfabética do código, que partilham o início mais longo,
+        são comparados (ver _semelhanca), exceto numa família sem o prefixo com até
+        FAMILIA_COMPARADA_INTEIRA códigos, comparada por inteiro. None sem candidatos.
+        """
+        normalizado = normalizar_codigo(codigo)
+        familia, prefixo = _chaves(normalizado)
+        a, b = self._intervalo(self._hash_familia, familia)
+        if a == b:
+            return None
+        p, q = self._intervalo(self._hash_prefixo, prefixo, a, b)
+        if p < q:
+            posicao = self._posicao_alfabetica(normalizado, p, q)
+            inicio = max(p, posicao - VIZINHOS_SUGESTAO)
+            candidatos = self.codigos.slice(inicio, min(q, posicao + VIZINHOS_SUGESTAO) - inicio).to_pylist()
+        else:
+            if b - a > FAMILIA_COMPARADA_INTEIRA:
+                posicao = self._posicao_alfabetica(normalizado, a, b, self._linha_familia)
+                a, b = max(a, posicao - VIZINHOS_SUGESTAO), min(b, posicao + VIZINHOS_SUGESTAO)
+            candidatos = self.codigos.take(pa.array(self._linha_familia[a:b])).to_pylist()
+        elementos = set(normalizado.split(' '))
+        return max(candidatos, key=lambda candidato: _semelhanca(elementos, normalizado, candidato))
+    
+    def verificar(self, codigos: Iterable[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Estado de cada código distinto no catálogo e, fora dele, a sugestão mais próxima"""
+        resultado = {}
+        for codigo in codigos:
+            if codigo in resultado:
+                continue
+            if codigo.startswith(PREFIXO_FALHA):
+                resultado[codigo] = ('NAO_CONVERTIDO', None)
+            elif self.contem(codigo):
+                resultado[codigo] = ('EXATO', None)
+            else:
+                resultado[codigo] = ('FORA_DO_CATALOGO', self.sugerir(codigo))
+        return resultado
+    
+    def marcar_colunas(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Acrescenta ao resultado de processar_planilha as colunas 'Catálogo' (estado, categórica)
+        e 'Sugestão do Catálogo'. Cada código distinto é verificado uma única vez
+        (pelas categorias da coluna 'Referência YOFC').
+        """
+        codigos = df['Referência YOFC']
+        if not isinstance(codigos.dtype, pd.CategoricalDtype):
+            codigos = codigos.astype(str).astype('category')
+        categorias = codigos.cat.categories.astype(str).tolist()
+        verificados = self.verificar(categorias)
+        
+        estados = pd.Categorical([verificados[c][0] for c in categorias], categories=ESTADOS_CATALOGO)
+        sugestoes = pd.Categorical([verificados[c][1] for c in categorias])
+        indices = codigos.cat.codes.to_numpy()
+        df['Catálogo'] = estados.take(indices, allow_fill=True)
+        df['Sugestão do Catálogo'] = sugestoes.take(indices, allow_fill=True)
+        return df
+    
+    def estatisticas(self, df: pd.DataFrame) -> Dict[str, int]:
+        """Linhas por estado no catálogo (depois de marcar_colunas)"""
+        return {estado: int(n) for estado, n in df['Catálogo'].value_counts().items()}
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Comparação de Regras
+Converte um corpus com duas versões da configuração (duas pastas com os JSON) numa única
+passagem e lista só as linhas cujos códigos mudam, com as contagens por tipo de cabo
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from conversor_poliron import (ConversorPoliron, ResultadoConversao, PREFIXO_FALHA, TIPOS_CABO,
+                               MIN_DESCRICOES_PARALELO)
+from formatos_tabela import formato_arquivo, ler_tabela, ler_previa
+
+# Colunas da tabela de diferenças (uma linha por linha do corpus com códigos diferentes)
+COLUNAS_COMPARACAO = ['Ficheiro', 'Linha', 'Descrição', 'Código A', 'Código B', 'Tipo A', 'Tipo B', 'Mudança']
+
+# Mudança de cada linha diferente: passou a converter, deixou de converter ou mudou de código
+MUDANCAS = ['NOVA_CONVERSAO', 'DEIXOU_DE_CONVERTER', 'CODIGO_ALTERADO']
+
+# Comparação de cada processo do pool (criada uma única vez por processo)
+_comparacao = None
+
+
+def _iniciar_worker(config_a: Optional[str], config_b: Optional[str]):
+    """Inicializador do pool: carrega as duas configurações uma vez por processo"""
+    global _comparacao
+    _comparacao = ComparacaoRegras(config_a, config_b)
+
+
+def _comparar_lote(descricoes: List[str]) -> Tuple[List[ResultadoConversao], List[ResultadoConversao]]:
+    """Converte um lote de descrições com as duas configurações no processo do pool"""
+    return _comparacao._comparar_unicas(descricoes)
+
+
+class ComparacaoRegras:
+    """
+    Dois conversores, um por pasta de configuração (None: a pasta config do módulo)
+    As descrições de todo o corpus são normalizadas e fatoradas uma única vez; cada
+    descrição única é analisada uma vez (palavras-chave e formação) e a mesma análise
+    serve os dois conversores, desde que as duas configurações tenham as mesmas
+    palavras-chave (senão, cada conversor analisa a descrição com as suas).
+    """
+    
+    def __init__(self, config_a: Optional[str] = None, config_b: Optional[str] = None):
+        self.config_a = config_a
+        self.config_b = config_b
+        self.conversor_a = ConversorPoliron(config_a)
+        self.conversor_b = ConversorPoliron(config_b)
+        self.analise_partilhada = self.conversor_a.scanner.palavras == self.conversor_b.scanner.palavras
+        self.estatisticas: Dict = {}
+    
+    def _comparar_unicas(self, unicas: Sequence[str]) -> Tuple[List[ResultadoConversao], List[ResultadoConversao]]:
+        """Converte descrições já deduplicadas com os dois conversores, no processo atual"""
+        a, b = self.conversor_a, self.conversor_b
+        if not self.analise_partilhada:
+            return ([a.converter_detalhado(d) for d in unicas], [b.converter_detalhado(d) for d in unicas])
+        
+        resultados_a, resultados_b = [], []
+        for descricao in unicas:
+            analise = a.analisar(descricao)
+            resultados_a.append(a.converter_analise(analise))
+            resultados_b.append(b.converter_analise(analise))
+        return resultados_a, resultados_b
+    
+    def comparar_unicas(self, unicas: List[str],
+                        workers: int = 1) -> Tuple[List[ResultadoConversao], List[ResultadoConversao]]:
+        """
+        Resultados das duas configurações para cada descrição única, pela mesma ordem
+        Com workers > 1 (e descrições suficientes, ver MIN_DESCRICOES_PARALELO), os lotes
+        são convertidos num pool de processos, cada um com as duas configurações carregadas
+        """
+        if workers <= 1 or len(unicas) < MIN_DESCRICOES_PARALELO:
+            return self._comparar_unicas(unicas)
+        
+        tamanho_lote = -(-len(unicas) // (workers * 4))
+        lotes = [unicas[i:i + tamanho_lote] for i in range(0, len(unicas), tamanho_lote)]
+        configs = tuple(str(c) if c is not None else None for c in (self.config_a, self.config_b))
+        resultados_a, resultados_b = [], []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=configs) as pool:
+            for parcial_a, parcial_b in pool.map(_comparar_lote, lotes):
+                resultados_a.extend(parcial_a)
+                resultados_b.extend(parcial_b)
+        return resultados_a, resultados_b
+    
+    def comparar(self, descricoes: pd.Series, workers: int = 1) -> pd.DataFrame:
+        """
+        Compara as duas configurações sobre uma coluna de descrições e retorna só as linhas
+        com códigos diferentes: 'Linha' (posição na coluna, a partir de 1), 'Descrição', os
+        códigos e os tipos de cabo de cada configuração e a 'Mudança' (ver MUDANCAS)
+        Preenche estatisticas: linhas e descrições únicas, no total e com códigos diferentes
+        """
+        indices, unicas = self.conversor_a.fatorar_descricoes(descricoes)
+        resultados_a, resultados_b = self.comparar_unicas(unicas, workers)
+        
+        codigos_a = np.array([r.codigo for r in resultados_a], dtype=object)
+        codigos_b = np.array([r.codigo for r in resultados_b], dtype=object)
+        diferentes = codigos_a != codigos_b
+        linhas = np.flatnonzero(diferentes[indices])
+        unicas_linhas = indices[linhas]
+        
+        # Mudança de cada única (só as diferentes chegam à tabela)
+        falha_a = np.array([c.startswith(PREFIXO_FALHA) for c in codigos_a], dtype=bool)
+        falha_b = np.array([c.startswith(PREFIXO_FALHA) for c in codigos_b], dtype=bool)
+        mudanca = np.where(falha_a & ~falha_b, 0, np.where(falha_b & ~falha_a, 1, 2))
+        
+        tipos_a = pd.Categorical([r.tipo for r in resultados_a], categories=TIPOS_CABO)
+        tipos_b = pd.Categorical([r.tipo for r in resultados_b], categories=TIPOS_CABO)
+        diferencas = pd.DataFrame({
+            'Linha': linhas + 1,
+            'Descrição': descricoes.to_numpy(dtype=object)[linhas],
+            'Código A': codigos_a[unicas_linhas],
+            'Código B': codigos_b[unicas_linhas],
+            'Tipo A': tipos_a.take(unicas_linhas),
+            'Tipo B': tipos_b.take(unicas_linhas),
+            'Mudança': pd.Categorical.from_codes(mudanca[unicas_linhas], categories=MUDANCAS),
+        })
+        
+        self.estatisticas = {
+            'linhas': len(descricoes),
+            'descricoes_unicas': len(unicas),
+            'linhas_diferentes': len(linhas),
+            'descricoes_diferentes': int(diferentes.sum()),
+            'analise_partilhada': self.analise_partilhada,
+        }
+        return diferencas
+    
+    def ler_descricoes(self, arquivo: Path, coluna: str) -> Tuple[pd.Series, str]:
+        """
+        Só a coluna de descrições de uma planilha: a `coluna` indicada ou, se o ficheiro não
+        a tiver, a detetada (detectar_coluna_descricao) no cabeçalho e nas primeiras linhas
+        Retorna (descrições, nome da coluna lida); ValueError se nenhuma parecer ter descrições
+        """
+        formato = formato_arquivo(arquivo)
+        detetada = self.conversor_a.detectar_coluna_descricao(ler_previa(arquivo, formato), coluna)
+        if detetada is None:
+            raise ValueError(f"{arquivo}: coluna '{coluna}' não encontrada e nenhuma coluna parece ter descrições")
+        return ler_tabela(arquivo, formato, [detetada])[detetada], detetada
+    
+    def comparar_arquivos(self, arquivos: Sequence[Path], coluna: str = 'Descrição',
+                          workers: int = 1) -> pd.DataFrame:
+        """
+        Compara as duas configurações sobre várias planilhas numa única passagem: as colunas
+        de descrições de todos os ficheiros são juntadas, e cada descrição repetida entre
+        ficheiros é convertida uma única vez. Retorna as linhas diferentes (COLUNAS_COMPARACAO),
+        com o ficheiro de origem e a linha dentro dele
+        """
+        partes = [self.ler_descricoes(arquivo, coluna)[0] for arquivo in arquivos]
+        tamanhos = np.array([len(parte) for parte in partes], dtype=np.int64)
+        descricoes = (pd.concat([parte.astype(object) for parte in partes], ignore_index=True)
+                      if partes else pd.Series([], dtype=object))
+        
+        diferencas = self.comparar(descricoes, workers)
+        
+        # Posição global -> ficheiro e linha dentro do ficheiro
+        inicios = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+        posicoes = diferencas['Linha'].to_numpy() - 1
+        origem = np.searchsorted(inicios, posicoes, side='right') - 1
+        diferencas['Linha'] = posicoes - inicios[origem] + 1
+        diferencas.insert(0, 'Ficheiro', pd.Categorical.from_codes(origem, categories=[str(a) for a in arquivos]))
+        self.estatisticas['ficheiros'] = len(arquivos)
+        return diferencas[COLUNAS_COMPARACAO]
+
+
+def contar_por_tipo(diferencas: pd.DataFrame) -> pd.DataFrame:
+    """Linhas diferentes por tipo de cabo em cada configuração e por mudança"""
+    return (diferencas.groupby(['Tipo A', 'Tipo B', 'Mudança'], observed=True).size()
+            .rename('Linhas').reset_index().sort_values('Linhas', ascending=False, ignore_index=True))
@@ -5,12 +5,312 @@ Módulo Conversor Poliron - Versão Corrigida
 Converte especificações técnicas de cabos para códigos Poliron
 """
 
-import pandas as pd
+from __future__ import annotations
+
 import re
 import json
+import time
+import hashlib
+import unicodedata
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, Iterable, Set, List, NamedTuple, TYPE_CHECKING
 from datetime import datetime
+from functools import lru_cache, cached_property
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# pandas e numpy só são importados nos métodos que processam tabelas: quem apenas
+# converte descrições (converter_especificacao) não paga o tempo de importação
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+try:
+    import ahocorasick  # opcional: pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Padrões de formação, em ordem de prioridade (o primeiro que casar vence)
+PADROES_FORMACAO = [
+    ('pares', r'\d+[Pp]x\s*\d+[,.]?\d*mm2'),  # 12Px2.5mm2
+    ('ternas', r'\d+[Tt]x\s*\d+[,.]?\d*mm2'),  # 8Tx2.5mm2
+    ('quadras', r'\d+[Qq]x\s*\d+[,.]?\d*mm2'),  # 4Qx1.5mm2
+    ('vfd', r'\d+[Cc]x\s*\d+[,.]?\d*mm2\s*\+\s*\d+[Cc]x\s*\d+[,.]?\d*mm2'),  # VFD
+    ('condutores', r'\d+[Cc]x\s*\d+[,.]?\d*mm2'),  # 1Cx70mm2
+    ('multipares', r'\d+x\s*\d+x\s*\d+[,.]?\d*mm2'),  # 4x2x1.5mm2
+]
+
+
+# Marcadores verificados pelos conversores (além das palavras-chave dos JSON), pelo
+# atributo do código que decidem (o atributo só é usado na explicação, ver explicar)
+MARCADORES_ATRIBUTO = {
+    'isolacao': ['HEPR', 'XLPE', 'PVC/E', '105'],
+    'cobertura': ['ST2', 'ST3', 'SHF1', 'SHF2', 'NAO HALOGENADO', 'NÃO HALOGENADO', 'LSZH'],
+    'classe': ['CLASSE 2'],
+    'blindagem': ['TRANCA', 'TRANÇA', 'FITA', 'COBRE', 'ALUMINIO', 'BLINDAGEM'],
+    'cor': ['VERMELHO', 'CINZA', 'AZUL', 'COR VERMELHO', 'COR AZUL', 'COR VERDE', 'COR CINZA'],
+    'material': ['COBRE ESTANHADO'],
+    'cores': ['PRETO/BRANCO/AZUL', 'PT/BR/AZ', 'PRETO/BRANCO/VERMELHO', 'PT/BR/VM'],
+}
+MARCADORES = [palavra for palavras in MARCADORES_ATRIBUTO.values() for palavra in palavras]
+ATRIBUTO_MARCADOR = {palavra: atributo for atributo, palavras in MARCADORES_ATRIBUTO.items() for palavra in palavras}
+
+
+class ScannerPalavrasChave:
+    """
+    Localiza numa única passagem todas as palavras-chave presentes num texto.
+    Usa um autômato Aho-Corasick (pyahocorasick) quando disponível; sem ele,
+    recorre às buscas de substring do Python, feitas uma só vez por descrição.
+    """
+    
+    def __init__(self, palavras: Iterable[str]):
+        self.palavras = tuple(sorted({p for p in palavras if p}))
+        
+        self._automato = None
+        if ahocorasick is not None:
+            self._automato = ahocorasick.Automaton()
+            for palavra in self.palavras:
+                self._automato.add_word(palavra, palavra)
+            self._automato.make_automaton()
+    
+    def encontrar(self, texto: str) -> Set[str]:
+        """Retorna o conjunto de palavras-chave contidas no texto (já em maiúsculas)"""
+        if self._automato is not None:
+            return {palavra for _, palavra in self._automato.iter(texto)}
+        return {palavra for palavra in self.palavras if palavra in texto}
+
+
+class PalavrasRastreadas(set):
+    """
+    Palavras-chave encontradas que registam cada teste 'palavra in palavras' feito sobre elas,
+    pela ordem, como (palavra, encontrada): só a explicação (explicar) as usa, para seguir as
+    decisões dos conversores sem lhes acrescentar nada na conversão normal
+    """
+    
+    def __init__(self, palavras: Iterable[str] = ()):
+        super().__init__(palavras)
+        self.testes: List[Tuple[str, bool]] = []
+    
+    def __contains__(self, palavra) -> bool:
+        encontrada = super().__contains__(palavra)
+        self.testes.append((palavra, encontrada))
+        return encontrada
+
+
+class DescricaoAnalisada(NamedTuple):
+    """Descrição analisada uma única vez e partilhada por todos os conversores"""
+    texto: str
+    texto_upper: str
+    palavras: Set[str]                # palavras-chave encontradas (ScannerPalavrasChave)
+    formacao: Optional[str]           # trecho da formação, ex: '3Cx4mm2+1Cx4mm2'
+    padrao_formacao: Optional[str]    # nome do padrão de PADROES_FORMACAO que casou
+    qtd: Optional[int]                # condutores ou elementos (1ª parte no VFD)
+    elemento: Optional[str]           # P, T ou Q na instrumentação
+    secao: Optional[str]              # seção com ponto decimal, ex: '2.5'
+    qtd2: Optional[int]               # 2ª parte da formação VFD
+    secao2: Optional[str]
+
+
+class ResultadoConversao(NamedTuple):
+    """Código gerado para uma descrição e o tipo de cabo identificado"""
+    codigo: str
+    tipo: str                         # VFD, INSTRUMENTACAO, ENERGIA, CONTROLE ou DESCONHECIDO
+
+
+# Tipos de cabo (categorias da coluna 'Tipo de Cabo')
+TIPOS_CABO = ['VFD', 'INSTRUMENTACAO', 'ENERGIA', 'CONTROLE', 'DESCONHECIDO']
+
+# Mensagens de falha e o código do motivo correspondente
+PREFIXO_FALHA = "Não consegui identificar a codificação"
+MOTIVOS_FALHA = {
+    'Formação não encontrada': 'FORMACAO_NAO_ENCONTRADA',
+    'Tipo de cabo desconhecido': 'TIPO_DESCONHECIDO',
+    'Formação VFD inválida': 'FORMACAO_VFD_INVALIDA',
+    'Formação VFD não padrão': 'FORMACAO_VFD_NAO_PADRAO',
+    'Formação de instrumentação inválida': 'FORMACAO_INSTRUMENTACAO_INVALIDA',
+    'Formação inválida': 'FORMACAO_INVALIDA',
+}
+
+
+def motivo_falha(codigo: str) -> Optional[str]:
+    """Código do motivo de falha de uma conversão (None quando a conversão teve sucesso)"""
+    if not codigo.startswith(PREFIXO_FALHA):
+        return None
+    detalhe = codigo[len(PREFIXO_FALHA):].strip(' ()')
+    return MOTIVOS_FALHA.get(detalhe, 'ERRO_INTERNO')
+
+
+class PerfilConversao:
+    """
+    Tempos acumulados e contadores da conversão, ativados com ConversorPoliron.ativar_perfil()
+    - etapas: passos por ficheiro (leitura, fatoração, conversão, gravação...)
+    - etapas_descricao: passos de cada descrição (palavras-chave, formação, tipo, conversor)
+    - por_tipo: descrições e tempo total por tipo de cabo
+    - formação: padrão que casou e quantos padrões seriam testados em ordem de prioridade
+    - motivos de falha
+    """
+    
+    def __init__(self):
+        self.etapas = defaultdict(lambda: [0, 0.0])             # etapa -> [chamadas, segundos]
+        self.etapas_descricao = defaultdict(lambda: [0, 0.0])
+        self.por_tipo = defaultdict(lambda: [0, 0.0])           # tipo -> [descrições, segundos]
+        self.padroes_formacao = defaultdict(int)
+        self.padroes_testados = 0
+        self.motivos_falha = defaultdict(int)
+    
+    @contextmanager
+    def medir(self, etapa: str):
+        """Acumula o tempo do bloco na etapa indicada"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_etapa(etapa, time.perf_counter() - inicio)
+    
+    def registrar_etapa(self, etapa: str, segundos: float):
+        """Acumula o tempo de uma etapa medida fora de um bloco 'with'"""
+        acumulado = self.etapas[etapa]
+        acumulado[0] += 1
+        acumulado[1] += segundos
+    
+    def registrar(self, etapa: str, segundos: float):
+        """Acumula o tempo de um passo da conversão de uma descrição"""
+        acumulado = self.etapas_descricao[etapa]
+        acumulado[0] += 1
+        acumulado[1] += segundos
+    
+    def registrar_formacao(self, padrao: Optional[str]):
+        """Conta o padrão de formação que casou (None = nenhum)"""
+        self.padroes_formacao[padrao or 'nenhum'] += 1
+        # Padrões percorridos até o vencedor, na ordem de PADROES_FORMACAO
+        testados = [nome for nome, _ in PADROES_FORMACAO].index(padrao) + 1 if padrao else len(PADROES_FORMACAO)
+        self.padroes_testados += testados
+    
+    def registrar_resultado(self, tipo: str, codigo: str, segundos: float = 0.0):
+        """Conta uma descrição convertida: tipo de cabo, tempo e motivo de falha"""
+        acumulado = self.por_tipo[tipo]
+        acumulado[0] += 1
+        acumulado[1] += segundos
+        motivo = motivo_falha(codigo)
+        if motivo is not None:
+            self.motivos_falha[motivo] += 1
+    
+    def para_dict(self) -> Dict:
+        """Estatísticas em dicionário (serializável em JSON)"""
+        def tempos(acumulados):
+            return {
+                nome: {
+                    'chamadas': chamadas,
+                    'segundos': round(segundos, 6),
+                    'media_us': round(segundos / chamadas * 1e6, 2) if chamadas else 0.0,
+                }
+                for nome, (chamadas, segundos) in acumulados.items()
+            }
+        
+        formacoes = sum(self.padroes_formacao.values())
+        return {
+            'etapas': tempos(self.etapas),
+            'etapas_descricao': tempos(self.etapas_descricao),
+            'por_tipo': {
+                tipo: {'descricoes': qtd, 'segundos': round(segundos, 6)}
+                for tipo, (qtd, segundos) in self.por_tipo.items()
+            },
+            'formacao': {
+                'por_padrao': dict(self.padroes_formacao),
+                'padroes_testados': self.padroes_testados,
+                'media_padroes_testados': round(self.padroes_testados / formacoes, 3) if formacoes else 0.0,
+            },
+            'motivos_falha': dict(self.motivos_falha),
+        }
+    
+    def para_json(self, **kwargs) -> str:
+        return json.dumps(self.para_dict(), ensure_ascii=False, **kwargs)
+    
+    def resumo(self) -> str:
+        """Tabela em texto para a linha de comando"""
+        dados = self.para_dict()
+        linhas = []
+        for titulo, chave in [("Etapas", 'etapas'), ("Etapas por descrição", 'etapas_descricao')]:
+            if dados[chave]:
+                linhas.append(f"{titulo}:")
+                for nome, t in sorted(dados[chave].items(), key=lambda item: -item[1]['segundos']):
+                    linhas.append(f"   {nome:<32} {t['chamadas']:>10,} chamadas {t['segundos']:>10.3f}s "
+                                  f"{t['media_us']:>10.1f} µs/chamada")
+        if dados['por_tipo']:
+            linhas.append("Por tipo de cabo:")
+            for tipo, t in dados['por_tipo'].items():
+                # No modo paralelo só há contagens, sem tempo por descrição
+                tempo = f" {t['segundos']:>10.3f}s" if t['segundos'] else ""
+                linhas.append(f"   {tipo:<32} {t['descricoes']:>10,} descrições{tempo}")
+        formacao = dados['formacao']
+        if formacao['por_padrao']:
+            linhas.append(f"Formação: {formacao['por_padrao']} "
+                          f"({formacao['media_padroes_testados']} padrões testados por descrição)")
+        if dados['motivos_falha']:
+            linhas.append(f"Motivos de falha: {dados['motivos_falha']}")
+        return "\n".join(linhas)
+
+
+# Abaixo deste número de descrições únicas a conversão paralela não compensa
+MIN_DESCRICOES_PARALELO = 5000
+
+# Deteção da coluna de descrições de cada folha (livros com várias folhas):
+# início dos cabeçalhos reconhecidos (sem acentos, em maiúsculas) e, pelo conteúdo,
+# valores de amostra por coluna e fração mínima deles com uma formação reconhecida
+CABECALHOS_DESCRICAO = ('DESCRI', 'ESPECIFICA', 'SPECIFICATION')
+AMOSTRA_DETECCAO = 200
+TAXA_MINIMA_DETECCAO = 0.2
+
+# Tabela combinada de processar_folhas: descrições de todas as folhas e folha de origem
+COLUNA_COMBINADA = 'Descrição'
+COLUNA_FOLHA = 'Folha'
+
+# Colunas de resultado de cada linha: as de processar_planilha (as três últimas só com
+# detalhes=True) e as da validação no catálogo (catalogo_poliron.CatalogoPoliron.marcar_colunas)
+COLUNAS_RESULTADO = ['Referência YOFC', 'Tipo de Cabo', 'Convertido', 'Motivo da Falha',
+                     'Catálogo', 'Sugestão do Catálogo']
+
+
+def _normalizar_cabecalho(nome) -> str:
+    """Cabeçalho sem acentos, em maiúsculas e sem espaços nas pontas"""
+    texto = unicodedata.normalize('NFKD', str(nome))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).strip().upper()
+
+# Conversor de cada processo do pool (criado uma única vez por processo)
+_conversor_worker = None
+
+
+def _iniciar_worker(config_dir: str):
+    """Inicializador do pool: carrega os JSON e compila as regras uma vez por processo"""
+    global _conversor_worker
+    _conversor_worker = ConversorPoliron(config_dir)
+
+
+def _converter_lote(descricoes: List[str]) -> List[ResultadoConversao]:
+    """Converte um lote de descrições no processo do pool"""
+    return _conversor_worker._converter_unicas(descricoes)
+
+
+def criar_pool(workers: int, config_dir: Optional[str] = None):
+    """
+    Pool de processos com um conversor já carregado em cada processo
+    Para servir vários pedidos com os mesmos processos: processar_planilha(executor=pool)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    
+    return ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                               initargs=(str(config_dir) if config_dir is not None else None,))
+
+
+def compilar_flags(flags: str) -> int:
+    """Converte o campo 'flags' dos JSON (ex: "IGNORECASE|DOTALL") em flags do módulo re"""
+    resultado = 0
+    for nome in (flags or '').split('|'):
+        nome = nome.strip().upper()
+        if nome:
+            resultado |= getattr(re, nome)
+    return resultado
+
 
 class ConversorPoliron:
     """Classe para converter especificações de cabos em códigos Poliron"""
@@ -21,56 +321,169 @@ class ConversorPoliron:
             config_dir = Path(__file__).parent.parent / "config"
         else:
             config_dir = Path(config_dir)
+        self.config_dir = config_dir
         
         # Carregar configurações
-        with open(config_dir / "regras_conversao.json", 'r', encoding='utf-8') as f:
-            self.regras = json.load(f)
+        conteudo_regras = (config_dir / "regras_conversao.json").read_bytes()
+        conteudo_padroes = (config_dir / "padroes_especiais.json").read_bytes()
+        self.regras = json.loads(conteudo_regras.decode('utf-8'))
+        self.padroes = json.loads(conteudo_padroes.decode('utf-8'))
         
-        with open(config_dir / "padroes_especiais.json", 'r', encoding='utf-8') as f:
-            self.padroes = json.load(f)
+        # Versão das regras: muda sempre que um dos JSON é editado
+        self.versao_regras = hashlib.sha256(conteudo_regras + b'\0' + conteudo_padroes).hexdigest()[:16]
         
         self.secao_map = self.regras['secao_energia_controle']
         self.secao_inst_map = self.regras['secao_instrumentacao']
         self.elementos_map = self.regras['elementos_instrumentacao']
+        
+        self.estatisticas_dedup = {}
+        self.estatisticas_folhas = {}
+        
+        # Instrumentação opcional (ver ativar_perfil); desligada não custa nada além de um teste
+        self.perfil = None
+        
+        self._compilar_regras()
+    
+    def ativar_perfil(self) -> PerfilConversao:
+        """Passa a medir tempos e contadores da conversão num PerfilConversao novo"""
+        self.perfil = PerfilConversao()
+        return self.perfil
+    
+    def _medir(self, etapa: str):
+        """Bloco medido no perfil ativo (ou um bloco vazio com o perfil desligado)"""
+        return self.perfil.medir(etapa) if self.perfil is not None else nullcontext()
+    
+    def _compilar_regras(self):
+        """Compila uma única vez os padrões usados na análise de cada linha"""
+        # Formação: uma alternância única com o prefixo numérico em comum e um grupo
+        # nomeado vazio no fim de cada ramo, que identifica o padrão que casou
+        prefixo = r'\d+'
+        ramos = '|'.join(f'{padrao[len(prefixo):]}(?P<{nome}>)' for nome, padrao in PADROES_FORMACAO)
+        self.re_formacao = re.compile(f'{prefixo}(?:{ramos})', re.IGNORECASE)
+        self.prioridade_formacao = {nome: i for i, (nome, _) in enumerate(PADROES_FORMACAO)}
+        
+        # Padrões usados na identificação do tipo de cabo (os dos conversores ficam abaixo)
+        self.re_inst_tipo = re.compile(r'\d+[PTQ]X')
+        self.re_qtd_condutores = re.compile(r'(\d+)[Cc]x')
+        
+        # Palavras-chave: tipos de cabo, gatilho de cores e marcadores dos conversores
+        palavras = [p for lista in self.padroes['palavras_chave_tipo'].values() for p in lista]
+        palavras.append(self.padroes['regras_cores_condutores']['trigger_pattern'])
+        self.scanner = ScannerPalavrasChave(palavras + MARCADORES)
+    
+    # Padrões de um só conversor: compilados no primeiro uso, para que um processo que
+    # converte poucas descrições (ex: uma chamada do ERP) não compile os que não usa.
+    # Depois do primeiro acesso ficam no __dict__ da instância, como atributos comuns.
+    
+    @cached_property
+    def re_vfd(self) -> re.Pattern:
+        return re.compile(r'(\d+)[Cc]x\s*(\d+[,.]?\d*)mm2\s*\+\s*(\d+)[Cc]x\s*(\d+[,.]?\d*)mm2', re.IGNORECASE)
+    
+    @cached_property
+    def re_instrumentacao(self) -> re.Pattern:
+        return re.compile(r'(\d+)([PTQ])x\s*(\d+[,.]?\d*)mm2', re.IGNORECASE)
+    
+    @cached_property
+    def re_energia_controle(self) -> re.Pattern:
+        return re.compile(r'(\d+)[Cc]x\s*(\d+[,.]?\d*)mm2', re.IGNORECASE)
+    
+    @cached_property
+    def re_cil(self) -> re.Pattern:
+        """Padrão CIL de padroes_especiais.json"""
+        regras_cil = self.padroes['regras_cil']
+        return re.compile(regras_cil['pattern'], compilar_flags(regras_cil.get('flags', 'IGNORECASE')))
+    
+    @cached_property
+    def re_cores_condutores(self) -> Dict[str, re.Pattern]:
+        """Padrões das cores dos condutores por quantidade, de padroes_especiais.json"""
+        padroes = {}
+        for qtd_str, config in self.padroes['regras_cores_condutores']['mapeamento_por_quantidade'].items():
+            if 'pattern_verde_amarelo' in config:
+                padroes[qtd_str] = re.compile(config['pattern_verde_amarelo'])
+            else:
+                padroes[qtd_str] = re.compile(config['pattern'], re.IGNORECASE)
+        return padroes
+    
+    def detectar_palavras(self, descricao: str) -> Set[str]:
+        """Varre a descrição uma única vez e retorna as palavras-chave encontradas"""
+        return self.scanner.encontrar(descricao.upper())
+    
+    def _casar_formacao(self, descricao: str):
+        """Retorna o match da formação de maior prioridade na descrição (ou None)"""
+        # A alternância casa na posição mais à esquerda; para manter a prioridade
+        # entre os padrões, percorre as ocorrências e fica com a de maior prioridade
+        melhor = None
+        match = self.re_formacao.search(descricao)
+        while match:
+            if melhor is None or self.prioridade_formacao[match.lastgroup] < self.prioridade_formacao[melhor.lastgroup]:
+                melhor = match
+                if self.prioridade_formacao[match.lastgroup] == 0:
+                    break
+            match = self.re_formacao.search(descricao, match.start() + 1)
+        return melhor
     
     def extrair_formacao(self, descricao: str) -> Optional[str]:
         """Extrai a formação do cabo da descrição"""
-        patterns = [
-            r'(\d+[Pp]x\s*\d+[,.]?\d*mm2)',  # 12Px2.5mm2
-            r'(\d+[Tt]x\s*\d+[,.]?\d*mm2)',  # 8Tx2.5mm2
-            r'(\d+[Qq]x\s*\d+[,.]?\d*mm2)',  # 4Qx1.5mm2
-            r'(\d+[Cc]x\s*\d+[,.]?\d*mm2\s*\+\s*\d+[Cc]x\s*\d+[,.]?\d*mm2)',  # VFD
-            r'(\d+[Cc]x\s*\d+[,.]?\d*mm2)',  # 1Cx70mm2
-            r'(\d+x\s*\d+x\s*\d+[,.]?\d*mm2)',  # 4x2x1.5mm2
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, descricao, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        match = self._casar_formacao(descricao)
+        if match:
+            return match.group().strip()
         
         return None
     
-    def identificar_tipo_cabo(self, descricao: str, formacao: str) -> str:
+    def analisar(self, descricao: str) -> DescricaoAnalisada:
+        """Analisa a descrição uma única vez: texto em maiúsculas, formação e palavras-chave"""
+        texto_upper = descricao.upper()
+        palavras = self.scanner.encontrar(texto_upper)
+        
+        match = self._casar_formacao(descricao)
+        return self._montar_analise(descricao, texto_upper, palavras, match)
+    
+    def _montar_analise(self, descricao: str, texto_upper: str, palavras: Set[str], match) -> DescricaoAnalisada:
+        """Extrai os grupos (quantidade, elemento, seções) da formação encontrada"""
+        if not match:
+            return DescricaoAnalisada(descricao, texto_upper, palavras, None, None, None, None, None, None, None)
+        
+        formacao = match.group().strip()
+        padrao = match.lastgroup
+        qtd = elemento = secao = qtd2 = secao2 = None
+        
+        # Grupos da formação, com as seções já com ponto decimal
+        if padrao == 'vfd':
+            # 3Cx4mm2+1Cx4mm2 ou 3Cx4mm2+3Cx4mm2
+            grupos = self.re_vfd.search(formacao)
+            qtd, secao = int(grupos.group(1)), grupos.group(2).replace(',', '.')
+            qtd2, secao2 = int(grupos.group(3)), grupos.group(4).replace(',', '.')
+        elif padrao in ('pares', 'ternas', 'quadras'):
+            grupos = self.re_instrumentacao.search(formacao)
+            qtd, elemento = int(grupos.group(1)), grupos.group(2).upper()
+            secao = grupos.group(3).replace(',', '.')
+        elif padrao == 'condutores':
+            grupos = self.re_energia_controle.search(formacao)
+            qtd, secao = int(grupos.group(1)), grupos.group(2).replace(',', '.')
+        
+        return DescricaoAnalisada(descricao, texto_upper, palavras, formacao, padrao,
+                                  qtd, elemento, secao, qtd2, secao2)
+    
+    def identificar_tipo_cabo(self, analise: DescricaoAnalisada) -> str:
         """Identifica o tipo de cabo com base na descrição e formação"""
-        desc_upper = descricao.upper()
-        form_upper = formacao.upper() if formacao else ""
+        palavras = analise.palavras
+        form_upper = analise.formacao.upper() if analise.formacao else ""
         
         # VFD - Inversor de Frequência
         for palavra in self.padroes['palavras_chave_tipo']['vfd']:
-            if palavra in desc_upper:
+            if palavra in palavras:
                 return 'VFD'
         
         # Instrumentação - padrões específicos
-        if re.search(r'\d+[PTQ]X', form_upper):
+        if self.re_inst_tipo.search(form_upper):
             return 'INSTRUMENTACAO'
         
         for palavra in self.padroes['palavras_chave_tipo']['instrumentacao']:
-            if palavra in desc_upper:
+            if palavra in palavras:
                 return 'INSTRUMENTACAO'
         
         # Controle vs Energia - baseado na quantidade de condutores
-        match_condutores = re.search(r'(\d+)[Cc]x', form_upper)
+        match_condutores = self.re_qtd_condutores.search(form_upper)
         if match_condutores:
             qtd = int(match_condutores.group(1))
             if qtd > 5:
@@ -80,67 +493,52 @@ class ConversorPoliron:
         
         # Verificar palavras-chave
         for palavra in self.padroes['palavras_chave_tipo']['controle']:
-            if palavra in desc_upper:
+            if palavra in palavras:
                 return 'CONTROLE'
         
         for palavra in self.padroes['palavras_chave_tipo']['energia']:
-            if palavra in desc_upper:
+            if palavra in palavras:
                 return 'ENERGIA'
         
         return 'DESCONHECIDO'
     
-    def extrair_cores_condutores(self, descricao: str, qtd_condutores: int) -> str:
+    def extrair_cores_condutores(self, analise: DescricaoAnalisada) -> str:
         """
         CORREÇÃO PROBLEMA 2: Extrai cores específicas dos condutores
         """
-        desc_upper = descricao.upper()
-        
         # Verificar se tem identificação de cores
         trigger = self.padroes['regras_cores_condutores']['trigger_pattern']
-        if trigger not in desc_upper:
+        if trigger not in analise.palavras:
             return ""
         
         # Mapear cores baseado na quantidade de condutores
         mapeamento = self.padroes['regras_cores_condutores']['mapeamento_por_quantidade']
-        qtd_str = str(qtd_condutores)
+        qtd_str = str(analise.qtd)
         
         if qtd_str in mapeamento:
-            config = mapeamento[qtd_str]
-            
-            # Para 5 condutores, verificar verde e amarelo
-            if qtd_condutores == 5:
-                if re.search(config['pattern_verde_amarelo'], desc_upper):
-                    return config['codigo']
-            else:
-                # Para outros, verificar padrão de cores
-                if re.search(config['pattern'], desc_upper, re.IGNORECASE):
-                    return config['codigo']
+            # Para 5 condutores o padrão é o de verde e amarelo; para os outros, o de cores
+            if self.re_cores_condutores[qtd_str].search(analise.texto_upper):
+                return mapeamento[qtd_str]['codigo']
         
         return ""
     
-    def verificar_cil(self, descricao: str) -> bool:
+    def verificar_cil(self, analise: DescricaoAnalisada) -> bool:
         """
         CORREÇÃO PROBLEMA 1: Verifica se deve adicionar CIL
         Apenas quando houver menção explícita a acabamento ou cobertura cilíndrica
         """
-        desc_upper = descricao.upper()
-        pattern = self.padroes['regras_cil']['pattern']
-        
-        return bool(re.search(pattern, desc_upper, re.IGNORECASE))
+        return bool(self.re_cil.search(analise.texto_upper))
     
-    def converter_vfd(self, descricao: str, formacao: str) -> str:
+    def converter_vfd(self, analise: DescricaoAnalisada) -> str:
         """Converte especificação VFD para código Poliron"""
         try:
-            # Extrair formação: 3Cx4mm2+1Cx4mm2 ou 3Cx4mm2+3Cx4mm2
-            match = re.search(r'(\d+)[Cc]x\s*(\d+[,.]?\d*)mm2\s*\+\s*(\d+)[Cc]x\s*(\d+[,.]?\d*)mm2', 
-                            formacao, re.IGNORECASE)
-            if not match:
+            palavras = analise.palavras
+            
+            # Formação: 3Cx4mm2+1Cx4mm2 ou 3Cx4mm2+3Cx4mm2
+            if analise.padrao_formacao != 'vfd':
                 return "Não consegui identificar a codificação (Formação VFD inválida)"
             
-            qtd1 = int(match.group(1))
-            secao1 = match.group(2).replace(',', '.')
-            qtd2 = int(match.group(3))
-            secao2 = match.group(4).replace(',', '.')
+            qtd1, qtd2 = analise.qtd, analise.qtd2
             
             # Determinar tipo: Concêntrico (3+1) ou Simétrico (3+3)
             if qtd1 == 3 and qtd2 == 1:
@@ -151,26 +549,26 @@ class ConversorPoliron:
                 return "Não consegui identificar a codificação (Formação VFD não padrão)"
             
             # Formatar seções
-            secao1_fmt = secao1.replace('.', ',')
-            secao2_fmt = secao2.replace('.', ',')
+            secao1_fmt = analise.secao.replace('.', ',')
+            secao2_fmt = analise.secao2.replace('.', ',')
             
             # Isolação
             isolacao = ""
-            if 'HEPR' in descricao.upper():
+            if 'HEPR' in palavras:
                 isolacao = "HEPR "
             
             # Cobertura
             cobertura = ""
-            if 'SHF1' in descricao.upper() or 'NAO HALOGENADO' in descricao.upper() or 'NÃO HALOGENADO' in descricao.upper() or 'LSZH' in descricao.upper():
+            if 'SHF1' in palavras or 'NAO HALOGENADO' in palavras or 'NÃO HALOGENADO' in palavras or 'LSZH' in palavras:
                 cobertura = "SHF1 "
-            elif 'SHF2' in descricao.upper():
+            elif 'SHF2' in palavras:
                 cobertura = "SHF2 "
             
             # Cores dos condutores
             cores = ""
-            if 'PRETO/BRANCO/AZUL' in descricao.upper() or 'PT/BR/AZ' in descricao.upper():
+            if 'PRETO/BRANCO/AZUL' in palavras or 'PT/BR/AZ' in palavras:
                 cores = "(PT/BR/AZ)"
-            elif 'PRETO/BRANCO/VERMELHO' in descricao.upper() or 'PT/BR/VM' in descricao.upper():
+            elif 'PRETO/BRANCO/VERMELHO' in palavras or 'PT/BR/VM' in palavras:
                 cores = "(PT/BR/VM)"
             else:
                 cores = "PT"
@@ -182,26 +580,24 @@ class ConversorPoliron:
                 codigo = f"VFD SIMETRICO {isolacao}3X{secao1_fmt}MM2 + 3X{secao2_fmt}MM2 {cobertura}{cores}".strip()
             
             return codigo
-            
+        
         except Exception as e:
             return f"Não consegui identificar a codificação (Erro VFD: {str(e)})"
     
-    def converter_instrumentacao(self, descricao: str, formacao: str) -> str:
+    def converter_instrumentacao(self, analise: DescricaoAnalisada) -> str:
         """
         CORREÇÃO PROBLEMA 3: Converte instrumentação SEM ESPAÇO entre elemento e seção
         """
         try:
-            desc_upper = descricao.upper()
+            palavras = analise.palavras
             
-            # Extrair elemento e quantidade
-            match = re.search(r'(\d+)([PTQ])x\s*(\d+[,.]?\d*)mm2', formacao, re.IGNORECASE)
-            if match:
-                qtd_elementos = int(match.group(1))
-                tipo_elemento = match.group(2).upper()
-                secao = match.group(3).replace(',', '.')
+            # Elemento e quantidade (pares, ternas ou quadras)
+            if analise.elemento is not None:
+                qtd_elementos = analise.qtd
+                secao = analise.secao
                 
                 # Mapear elemento
-                elemento = self.elementos_map.get(tipo_elemento, '2')
+                elemento = self.elementos_map.get(analise.elemento, '2')
                 
                 # Mapear seção para instrumentação
                 secao_codigo = self.secao_inst_map.get(secao, secao.replace('.', ''))
@@ -217,18 +613,18 @@ class ConversorPoliron:
                 
                 # Cobertura
                 cobertura = "ST1"
-                if 'ST2' in desc_upper:
+                if 'ST2' in palavras:
                     cobertura = "ST2"
-                elif 'SHF1' in desc_upper or 'NAO HALOGENADO' in desc_upper or 'NÃO HALOGENADO' in desc_upper:
+                elif 'SHF1' in palavras or 'NAO HALOGENADO' in palavras or 'NÃO HALOGENADO' in palavras:
                     cobertura = "SHF1"
                 
                 # Cor
                 cor = "PT"
-                if 'VERMELHO' in desc_upper and 'COR VERMELHO' in desc_upper:
+                if 'VERMELHO' in palavras and 'COR VERMELHO' in palavras:
                     cor = "VM"
-                elif 'CINZA' in desc_upper and 'COR CINZA' in desc_upper:
+                elif 'CINZA' in palavras and 'COR CINZA' in palavras:
                     cor = "CZ"
-                elif 'AZUL' in desc_upper and 'COR AZUL' in desc_upper:
+                elif 'AZUL' in palavras and 'COR AZUL' in palavras:
                     cor = "AZ"
                 
                 # Quantidade de elementos formatada
@@ -240,25 +636,24 @@ class ConversorPoliron:
                 return codigo
             
             return "Não consegui identificar a codificação (Formação de instrumentação inválida)"
-            
+        
         except Exception as e:
             return f"Não consegui identificar a codificação (Erro instrumentação: {str(e)})"
     
-    def converter_energia_controle(self, descricao: str, formacao: str, tipo: str) -> str:
+    def converter_energia_controle(self, analise: DescricaoAnalisada, tipo: str) -> str:
         """
         Converte especificação de energia ou controle
         INCLUI CORREÇÕES: CIL apenas quando necessário, cores dos condutores
         """
         try:
-            desc_upper = descricao.upper()
+            palavras = analise.palavras
             
-            # Extrair quantidade de condutores e seção
-            match = re.search(r'(\d+)[Cc]x\s*(\d+[,.]?\d*)mm2', formacao, re.IGNORECASE)
-            if not match:
+            # Quantidade de condutores e seção (formação em condutores ou a 1ª parte da de VFD)
+            if analise.padrao_formacao not in ('condutores', 'vfd'):
                 return "Não consegui identificar a codificação (Formação inválida)"
             
-            qtd_condutores = int(match.group(1))
-            secao = match.group(2).replace(',', '.')
+            qtd_condutores = analise.qtd
+            secao = analise.secao
             
             # Mapear seção
             secao_codigo = self.secao_map.get(secao, secao.replace('.', ''))
@@ -268,65 +663,65 @@ class ConversorPoliron:
                 tipo_cabo = "CE"
             else:  # CONTROLE
                 tipo_cabo = "CM"
-                if 'BLINDAGEM' in desc_upper:
-                    if 'FITA' in desc_upper and 'ALUMINIO' in desc_upper:
+                if 'BLINDAGEM' in palavras:
+                    if 'FITA' in palavras and 'ALUMINIO' in palavras:
                         tipo_cabo = "CA"
             
             # Isolação
             isolacao = "PVC/A"
-            if 'XLPE' in desc_upper:
+            if 'XLPE' in palavras:
                 isolacao = "XLPE"
-            elif 'HEPR' in desc_upper:
+            elif 'HEPR' in palavras:
                 isolacao = "HEPR"
-            elif 'PVC/E' in desc_upper or '105' in desc_upper:
+            elif 'PVC/E' in palavras or '105' in palavras:
                 isolacao = "PVC/E"
             
             # Cobertura
             cobertura = "ST1"
-            if 'ST2' in desc_upper:
+            if 'ST2' in palavras:
                 cobertura = "ST2"
-            elif 'ST3' in desc_upper:
+            elif 'ST3' in palavras:
                 cobertura = "ST3"
-            elif 'SHF1' in desc_upper or 'NAO HALOGENADO' in desc_upper or 'NÃO HALOGENADO' in desc_upper or 'LSZH' in desc_upper:
+            elif 'SHF1' in palavras or 'NAO HALOGENADO' in palavras or 'NÃO HALOGENADO' in palavras or 'LSZH' in palavras:
                 cobertura = "SHF1"
-            elif 'SHF2' in desc_upper:
+            elif 'SHF2' in palavras:
                 cobertura = "SHF2"
             
             # Classe
             classe = "CL5"
-            if 'CLASSE 2' in desc_upper:
+            if 'CLASSE 2' in palavras:
                 classe = "CL2"
             
             # Blindagem/Armação
             blindagem = ""
-            if 'TRANCA' in desc_upper or 'TRANÇA' in desc_upper:
+            if 'TRANCA' in palavras or 'TRANÇA' in palavras:
                 blindagem = "B "
-            elif 'FITA' in desc_upper and 'COBRE' in desc_upper and 'BLINDAGEM' in desc_upper:
+            elif 'FITA' in palavras and 'COBRE' in palavras and 'BLINDAGEM' in palavras:
                 blindagem = "E "
             
             # Cor da capa
             cor = "PT"
-            if 'COR VERMELHO' in desc_upper:
+            if 'COR VERMELHO' in palavras:
                 cor = "VM"
-            elif 'COR AZUL' in desc_upper:
+            elif 'COR AZUL' in palavras:
                 cor = "AZ"
-            elif 'COR VERDE' in desc_upper:
+            elif 'COR VERDE' in palavras:
                 cor = "VD"
-            elif 'COR CINZA' in desc_upper:
+            elif 'COR CINZA' in palavras:
                 cor = "CZ"
             
             # Material condutor
             material = ""
-            if 'COBRE ESTANHADO' in desc_upper:
+            if 'COBRE ESTANHADO' in palavras:
                 material = " SN"
             
             # CORREÇÃO PROBLEMA 1: CIL apenas quando explícito
             cil = ""
-            if self.verificar_cil(descricao):
+            if self.verificar_cil(analise):
                 cil = " CIL"
             
             # CORREÇÃO PROBLEMA 2: Extrair cores dos condutores
-            cores_condutores = self.extrair_cores_condutores(descricao, qtd_condutores)
+            cores_condutores = self.extrair_cores_condutores(analise)
             if cores_condutores:
                 cores_condutores = f" {cores_condutores}"
             
@@ -343,72 +738,763 @@ class ConversorPoliron:
             codigo += material + cil + cores_condutores
             
             return codigo.strip()
-            
+        
         except Exception as e:
             return f"Não consegui identificar a codificação (Erro energia/controle: {str(e)})"
     
     def converter_especificacao(self, descricao: str) -> str:
         """Converte uma especificação completa para código Poliron"""
-        # Extrair formação
-        formacao = self.extrair_formacao(descricao)
-        if not formacao:
-            return "Não consegui identificar a codificação (Formação não encontrada)"
+        return self.converter_detalhado(descricao).codigo
+    
+    def converter_detalhado(self, descricao: str) -> ResultadoConversao:
+        """Converte uma especificação e retorna também o tipo de cabo identificado"""
+        if self.perfil is not None:
+            return self._converter_detalhado_perfil(descricao)
+        
+        # Analisar a descrição uma única vez (formação e palavras-chave)
+        return self.converter_analise(self.analisar(descricao))
+    
+    def converter_analise(self, analise: DescricaoAnalisada) -> ResultadoConversao:
+        """
+        Converte uma descrição já analisada (analisar): a mesma análise serve a outro
+        conversor com as mesmas palavras-chave (ver comparacao_regras)
+        """
+        if not analise.formacao:
+            return ResultadoConversao("Não consegui identificar a codificação (Formação não encontrada)", 'DESCONHECIDO')
         
         # Identificar tipo de cabo
-        tipo = self.identificar_tipo_cabo(descricao, formacao)
+        tipo = self.identificar_tipo_cabo(analise)
         
         # Converter conforme o tipo
+        return ResultadoConversao(self._converter_por_tipo(analise, tipo), tipo)
+    
+    def _converter_por_tipo(self, analise: DescricaoAnalisada, tipo: str) -> str:
+        """Converte conforme o tipo de cabo identificado (identificar_tipo_cabo)"""
         if tipo == 'VFD':
-            return self.converter_vfd(descricao, formacao)
+            return self.converter_vfd(analise)
         elif tipo == 'INSTRUMENTACAO':
-            return self.converter_instrumentacao(descricao, formacao)
+            return self.converter_instrumentacao(analise)
         elif tipo == 'ENERGIA':
-            return self.converter_energia_controle(descricao, formacao, 'ENERGIA')
+            return self.converter_energia_controle(analise, 'ENERGIA')
         elif tipo == 'CONTROLE':
-            return self.converter_energia_controle(descricao, formacao, 'CONTROLE')
+            return self.converter_energia_controle(analise, 'CONTROLE')
+        return "Não consegui identificar a codificação (Tipo de cabo desconhecido)"
+    
+    def _converter_detalhado_perfil(self, descricao: str) -> ResultadoConversao:
+        """converter_detalhado medindo cada passo no perfil ativo"""
+        perfil = self.perfil
+        relogio = time.perf_counter
+        
+        inicio = relogio()
+        texto_upper = descricao.upper()
+        palavras = self.scanner.encontrar(texto_upper)
+        t_palavras = relogio()
+        match = self._casar_formacao(descricao)
+        t_formacao = relogio()
+        analise = self._montar_analise(descricao, texto_upper, palavras, match)
+        t_analise = relogio()
+        
+        perfil.registrar('palavras_chave', t_palavras - inicio)
+        perfil.registrar('extrair_formacao', t_formacao - t_palavras)
+        perfil.registrar('grupos_formacao', t_analise - t_formacao)
+        perfil.registrar_formacao(analise.padrao_formacao)
+        
+        if not analise.formacao:
+            resultado = ResultadoConversao("Não consegui identificar a codificação (Formação não encontrada)",
+                                           'DESCONHECIDO')
+        else:
+            tipo = self.identificar_tipo_cabo(analise)
+            t_tipo = relogio()
+            resultado = ResultadoConversao(self._converter_por_tipo(analise, tipo), tipo)
+            perfil.registrar('identificar_tipo_cabo', t_tipo - t_analise)
+            perfil.registrar(f'converter_{tipo.lower()}', relogio() - t_tipo)
+        
+        perfil.registrar_resultado(resultado.tipo, resultado.codigo, relogio() - inicio)
+        return resultado
+    
+    def explicar(self, descricao: str) -> Dict:
+        """
+        Trajeto de decisão da conversão de uma descrição, calculado só a pedido (a conversão
+        normal não regista nada): formação e padrão que casou, tipo de cabo e a regra que o
+        decidiu, palavras-chave testadas e encontradas por atributo do código, consultas aos
+        mapas de seções e elementos, CIL e cores dos condutores, código e motivo de falha.
+        A descrição é normalizada como nas planilhas (fatorar_descricoes) e os conversores
+        correm como na conversão, sobre PalavrasRastreadas.
+        """
+        descricao = str(descricao).strip().upper()
+        analise = self.analisar(descricao)
+        resultado = self.converter_analise(analise)
+        explicacao = {
+            'descricao': descricao,
+            'codigo': resultado.codigo,
+            'tipo': resultado.tipo,
+            'motivo_falha': motivo_falha(resultado.codigo),
+            'formacao': None,
+            'regra_tipo': None,
+            'atributos': {},
+            'mapas': [],
+            'cil': None,
+            'cores_condutores': None,
+        }
+        if not analise.formacao:
+            return explicacao
+        
+        explicacao['formacao'] = {
+            'trecho': analise.formacao, 'padrao': analise.padrao_formacao, 'qtd': analise.qtd,
+            'elemento': analise.elemento, 'secao': analise.secao, 'qtd2': analise.qtd2, 'secao2': analise.secao2,
+        }
+        
+        # Tipo de cabo: a palavra-chave que o decidiu ou, sem ela, a regra da formação
+        palavras = PalavrasRastreadas(analise.palavras)
+        tipo = self.identificar_tipo_cabo(analise._replace(palavras=palavras))
+        decisiva = next((palavra for palavra, encontrada in palavras.testes if encontrada), None)
+        condutores = self.re_qtd_condutores.search(analise.formacao.upper())
+        if decisiva is not None:
+            regra = {'regra': 'palavra_chave', 'palavra': decisiva}
+        elif tipo == 'INSTRUMENTACAO':
+            regra = {'regra': 'formacao_instrumentacao', 'padrao': self.re_inst_tipo.pattern}
+        elif tipo in ('ENERGIA', 'CONTROLE') and condutores:
+            # O mesmo teste de identificar_tipo_cabo, sobre a formação em maiúsculas
+            regra = {'regra': 'quantidade_condutores', 'condutores': int(condutores.group(1)), 'limite_energia': 5}
         else:
-            return "Não consegui identificar a codificação (Tipo de cabo desconhecido)"
+            regra = {'regra': 'nenhuma'}
+        explicacao['regra_tipo'] = {'palavras_testadas': [p for p, _ in palavras.testes], **regra}
+        
+        # Atributos do código: os testes do conversor, agrupados pelo atributo de cada palavra
+        palavras = PalavrasRastreadas(analise.palavras)
+        self._converter_por_tipo(analise._replace(palavras=palavras), tipo)
+        gatilho_cores = self.padroes['regras_cores_condutores']['trigger_pattern']
+        for palavra, encontrada in palavras.testes:
+            nome = ATRIBUTO_MARCADOR.get(palavra, 'cores_condutores' if palavra == gatilho_cores else 'outro')
+            atributo = explicacao['atributos'].setdefault(nome, {'encontradas': [], 'testadas': []})
+            atributo['testadas'].append(palavra)
+            if encontrada:
+                atributo['encontradas'].append(palavra)
+        
+        # Consultas aos mapas de regras_conversao.json
+        def consultar(mapa, chave, valor):
+            explicacao['mapas'].append({'mapa': mapa, 'chave': chave, 'valor': valor,
+                                        'no_mapa': chave in self.regras[mapa]})
+        
+        if tipo == 'INSTRUMENTACAO' and analise.elemento is not None:
+            consultar('elementos_instrumentacao', analise.elemento, self.elementos_map.get(analise.elemento, '2'))
+            consultar('secao_instrumentacao', analise.secao,
+                      self.secao_inst_map.get(analise.secao, analise.secao.replace('.', '')))
+        elif tipo in ('ENERGIA', 'CONTROLE') and analise.padrao_formacao in ('condutores', 'vfd'):
+            consultar('secao_energia_controle', analise.secao,
+                      self.secao_map.get(analise.secao, analise.secao.replace('.', '')))
+            explicacao['cil'] = {'cil': self.verificar_cil(analise), 'padrao': self.re_cil.pattern}
+            explicacao['cores_condutores'] = self.extrair_cores_condutores(analise) or None
+        return explicacao
+    
+    def _converter_unicas(self, unicas) -> List[ResultadoConversao]:
+        """Converte uma lista de descrições (já deduplicadas) no processo atual"""
+        return [self.converter_detalhado(str(descricao)) for descricao in unicas]
     
-    def processar_planilha(self, df: pd.DataFrame, coluna_descricao: str = 'Descrição') -> pd.DataFrame:
-        """Processa uma planilha completa"""
+    def _converter_paralelo(self, unicas, workers: int, executor=None) -> List[ResultadoConversao]:
+        """
+        Divide as descrições em lotes e converte-os num pool de processos, mantendo a ordem
+        Sem executor (ver criar_pool), o pool é criado e encerrado nesta chamada.
+        """
+        tamanho_lote = -(-len(unicas) // (workers * 4))
+        lotes = [unicas[i:i + tamanho_lote] for i in range(0, len(unicas), tamanho_lote)]
+        
         resultados = []
+        with (nullcontext(executor) if executor is not None else criar_pool(workers, self.config_dir)) as pool:
+            for parcial in pool.map(_converter_lote, lotes):
+                resultados.extend(parcial)
+        return resultados
+    
+    def processar_planilha(self, df: pd.DataFrame, coluna_descricao: str = 'Descrição',
+                           workers: int = 1, cache=None, detalhes: bool = False,
+                           executor=None, min_paralelo: Optional[int] = None) -> pd.DataFrame:
+        """
+        Processa uma planilha completa
+        Cada descrição distinta é convertida uma única vez: a conversão não depende
+        de maiúsculas/minúsculas nem de espaços nas pontas do texto.
+        Com workers > 1 as descrições são convertidas em paralelo num pool de processos
+        (entradas pequenas, abaixo de min_paralelo ou MIN_DESCRICOES_PARALELO, continuam em série);
+        um executor de criar_pool reaproveita processos já carregados entre chamadas.
+        Com um CacheConversao, só as descrições ausentes do cache são convertidas.
+        Com detalhes=True acrescenta as colunas 'Tipo de Cabo' (categórica),
+        'Convertido' (booleana) e 'Motivo da Falha' (código categórico).
+        Com o perfil ativo (ativar_perfil), cada etapa é medida.
+        """
+        indices, unicas = self.fatorar_descricoes(df[coluna_descricao])
+        resultados_unicos = self.converter_descricoes_unicas(unicas, workers, cache, executor, min_paralelo)
+        self.montar_colunas(df, indices, resultados_unicos, detalhes)
+        
+        total = len(df)
+        self.estatisticas_dedup = {
+            'linhas': total,
+            'descricoes_unicas': len(unicas),
+            'taxa_unicas': (len(unicas) / total) if total > 0 else 0.0,
+        }
+        return df
+    
+    # Etapas de processar_planilha, também usadas separadamente na conversão em
+    # segundo plano (tarefa_conversao): fatorar, converter as únicas em blocos, montar
+    
+    def fatorar_descricoes(self, descricoes: pd.Series) -> Tuple[np.ndarray, List[str]]:
+        """
+        Normaliza as descrições e fatora-as: retorna o índice de cada linha e a lista das
+        descrições únicas, pela ordem da primeira ocorrência
+        """
+        import pandas as pd
+        
+        with self._medir('fatoracao'):
+            normalizadas = descricoes.astype(str).str.strip().str.upper()
+            indices, unicas = pd.factorize(normalizadas, use_na_sentinel=False)
+            return indices, [str(descricao) for descricao in unicas]
+    
+    def converter_descricoes_unicas(self, unicas: List[str], workers: int = 1, cache=None,
+                                    executor=None, min_paralelo: Optional[int] = None) -> List[ResultadoConversao]:
+        """Converte descrições únicas já normalizadas, consultando e alimentando o cache"""
+        # Consultar o cache num único lote e converter apenas o que faltar
+        with self._medir('cache_consulta'):
+            em_cache = cache.buscar_lote(unicas) if cache is not None else {}
+            pendentes = [descricao for descricao in unicas if descricao not in em_cache]
+        
+        if min_paralelo is None:
+            min_paralelo = MIN_DESCRICOES_PARALELO
+        paralelo = workers > 1 and len(pendentes) >= max(min_paralelo, 1)
+        with self._medir('conversao'):
+            if paralelo:
+                convertidas = self._converter_paralelo(pendentes, workers, executor)
+            else:
+                convertidas = self._converter_unicas(pendentes)
+        
+        # O modo paralelo não passa por converter_detalhado neste processo: contar aqui
+        if self.perfil is not None and paralelo:
+            for r in convertidas:
+                self.perfil.registrar_resultado(r.tipo, r.codigo)
+        
+        if cache is not None and pendentes:
+            with self._medir('cache_gravacao'):
+                cache.gravar_lote((descricao, r.codigo, r.tipo) for descricao, r in zip(pendentes, convertidas))
         
-        for idx, row in df.iterrows():
-            descricao = str(row[coluna_descricao])
-            codigo_poliron = self.converter_especificacao(descricao)
-            resultados.append(codigo_poliron)
+        if not em_cache:
+            return convertidas
+        novas = dict(zip(pendentes, convertidas))
+        return [ResultadoConversao(*em_cache[d]) if d in em_cache else novas[d] for d in unicas]
+    
+    def montar_colunas(self, df: pd.DataFrame, indices: np.ndarray, resultados_unicos: List[ResultadoConversao],
+                       detalhes: bool = False) -> pd.DataFrame:
+        """Acrescenta ao df as colunas de resultado, a partir do resultado de cada descrição única"""
+        import pandas as pd
+        
+        # Vários textos podem gerar o mesmo código: fatorar também os resultados
+        with self._medir('montagem_colunas'):
+            codigos_unicos = pd.Series([r.codigo for r in resultados_unicos], dtype=object)
+            indices_codigo, codigos = pd.factorize(codigos_unicos)
+            df['Referência YOFC'] = pd.Categorical.from_codes(indices_codigo[indices], categories=codigos)
         
-        df['Referência YOFC'] = resultados
+        if detalhes:
+            with self._medir('colunas_detalhe'):
+                tipos_unicos = pd.Categorical([r.tipo for r in resultados_unicos], categories=TIPOS_CABO)
+                motivos_unicos = pd.Categorical([motivo_falha(codigo) for codigo in codigos_unicos],
+                                                categories=sorted(set(MOTIVOS_FALHA.values())) + ['ERRO_INTERNO'])
+                df['Tipo de Cabo'] = tipos_unicos.take(indices)
+                df['Convertido'] = motivos_unicos.codes[indices] < 0  # sem motivo de falha
+                df['Motivo da Falha'] = motivos_unicos.take(indices)
         return df
+    
+    # Livros com várias folhas: as descrições de todas as folhas são convertidas numa única
+    # passagem (fatoração e cache partilhados) e os resultados voltam à folha de origem
+    
+    def detectar_coluna_descricao(self, df: pd.DataFrame, preferida: Optional[str] = None) -> Optional[str]:
+        """
+        Coluna com as descrições dos cabos: a `preferida`, se a folha a tiver; senão a primeira
+        cujo cabeçalho indique uma descrição ('Descrição', 'Especificação'...); senão, pelo
+        conteúdo, a coluna de texto com mais formações reconhecidas numa amostra das linhas.
+        Retorna None se nenhuma coluna parecer conter descrições.
+        """
+        if preferida is not None and preferida in df.columns:
+            return preferida
+        for coluna in df.columns:
+            if _normalizar_cabecalho(coluna).startswith(CABECALHOS_DESCRICAO):
+                return coluna
+        
+        melhor, melhor_taxa = None, 0.0
+        for posicao, coluna in enumerate(df.columns):
+            valores = df.iloc[:, posicao].dropna().head(AMOSTRA_DETECCAO).tolist()
+            if not valores:
+                continue
+            com_formacao = sum(1 for v in valores if isinstance(v, str) and self._casar_formacao(v) is not None)
+            taxa = com_formacao / len(valores)
+            if taxa > melhor_taxa:
+                melhor, melhor_taxa = coluna, taxa
+        return melhor if melhor_taxa >= TAXA_MINIMA_DETECCAO else None
+    
+    def juntar_folhas(self, folhas: Dict[str, pd.DataFrame], colunas: Dict[str, Optional[str]]) -> pd.DataFrame:
+        """
+        Descrições de todas as folhas com coluna detetada, pela ordem das folhas, numa única
+        coluna, com a folha de origem de cada linha
+        """
+        import numpy as np
+        import pandas as pd
+        
+        nomes = [nome for nome, coluna in colunas.items() if coluna is not None]
+        partes = [folhas[nome][colunas[nome]].astype(object) for nome in nomes]
+        descricoes = pd.concat(partes, ignore_index=True) if partes else pd.Series([], dtype=object)
+        origem = pd.Categorical.from_codes(np.repeat(np.arange(len(nomes)), [len(p) for p in partes]),
+                                           categories=nomes)
+        return pd.DataFrame({COLUNA_FOLHA: origem, COLUNA_COMBINADA: descricoes})
+    
+    def separar_folhas(self, folhas: Dict[str, pd.DataFrame], colunas: Dict[str, Optional[str]],
+                       combinada: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Acrescenta a cada folha as colunas de resultado das suas linhas na tabela combinada"""
+        colunas_resultado = [c for c in COLUNAS_RESULTADO if c in combinada.columns]
+        inicio = 0
+        for nome, df in folhas.items():
+            if colunas.get(nome) is None:
+                continue
+            parte = combinada.iloc[inicio:inicio + len(df)]
+            for coluna in colunas_resultado:
+                df[coluna] = parte[coluna].set_axis(df.index)
+            inicio += len(df)
+        return folhas
+    
+    def processar_folhas(self, folhas: Dict[str, pd.DataFrame], coluna_descricao: Optional[str] = None,
+                         workers: int = 1, cache=None, detalhes: bool = False,
+                         executor=None) -> Dict[str, pd.DataFrame]:
+        """
+        Processa um livro inteiro (ex: pd.read_excel(..., sheet_name=None)), com as mesmas
+        opções de processar_planilha: a coluna de descrições de cada folha é detetada
+        (detectar_coluna_descricao) e uma descrição repetida em várias folhas é convertida
+        uma única vez. As folhas sem descrições ficam como estão.
+        estatisticas_folhas guarda a coluna usada e as linhas de cada folha.
+        """
+        colunas = {nome: self.detectar_coluna_descricao(df, coluna_descricao) for nome, df in folhas.items()}
+        combinada = self.processar_planilha(self.juntar_folhas(folhas, colunas), COLUNA_COMBINADA,
+                                            workers, cache, detalhes, executor)
+        self.estatisticas_folhas = {nome: {'coluna': colunas[nome], 'linhas': len(df)} for nome, df in folhas.items()}
+        return self.separar_folhas(folhas, colunas, combinada)
+    
+    def processar_excel_streaming(self, arquivo_entrada: str, arquivo_saida: str,
+                                  coluna_descricao: str = 'Descrição', tamanho_cache: int = 100_000) -> Dict:
+        """
+        Converte uma planilha linha a linha, sem carregá-la inteira em memória:
+        lê com openpyxl em modo read_only e grava cada linha convertida num
+        workbook write_only. A memória fica limitada ao cache de descrições.
+        """
+        from openpyxl import Workbook, load_workbook
+        
+        # Cache LRU limitado das descrições já convertidas (normalizadas)
+        converter = lru_cache(maxsize=tamanho_cache)(self.converter_especificacao)
+        
+        entrada = load_workbook(arquivo_entrada, read_only=True, data_only=True)
+        saida = Workbook(write_only=True)
+        try:
+            linhas = entrada.worksheets[0].iter_rows(values_only=True)
+            cabecalho = list(next(linhas, ()))
+            if coluna_descricao not in cabecalho:
+                raise ValueError(f"Coluna '{coluna_descricao}' não encontrada no cabeçalho da planilha")
+            pos_descricao = cabecalho.index(coluna_descricao)
+            
+            if 'Referência YOFC' in cabecalho:
+                pos_codigo = cabecalho.index('Referência YOFC')
+            else:
+                pos_codigo = len(cabecalho)
+                cabecalho.append('Referência YOFC')
+            
+            destino = saida.create_sheet('Sheet1')
+            destino.append(cabecalho)
+            
+            total = falhas = 0
+            for valores in linhas:
+                valores = list(valores)
+                if len(valores) < len(cabecalho):
+                    valores.extend([None] * (len(cabecalho) - len(valores)))
+                codigo = converter(str(valores[pos_descricao]).strip().upper())
+                valores[pos_codigo] = codigo
+                destino.append(valores)
+                total += 1
+                if codigo.startswith(PREFIXO_FALHA):
+                    falhas += 1
+            
+            saida.save(arquivo_saida)
+        finally:
+            entrada.close()
+        
+        info = converter.cache_info()
+        return {
+            'linhas': total,
+            'falhas': falhas,
+            'descricoes_convertidas': info.misses,
+            'acertos_cache': info.hits,
+        }
 
 
 def main():
     """Função principal para uso via linha de comando"""
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Converte especificações de cabos para códigos Poliron")
+    parser.add_argument("entradas", nargs='*', metavar="ENTRADA",
+                        help="Planilha (.xlsx, .csv, .parquet ou .arrow) com a coluna 'Descrição'; "
+                             "no modo em lote, também pastas ou padrões glob ('projetos/**/*.xlsx')")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Número de processos para a conversão; no modo em lote, "
+                             "ficheiros convertidos em paralelo (padrão: 1)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Lê e grava a planilha linha a linha, com memória limitada "
+                             "(ignora --workers)")
+    parser.add_argument("--coluna", default="Descrição",
+                        help="Nome da coluna com as descrições (padrão: 'Descrição')")
+    parser.add_argument("--detalhes", action="store_true",
+                        help="Acrescenta as colunas 'Tipo de Cabo', 'Convertido' e 'Motivo da Falha'")
+    parser.add_argument("--cache", metavar="ARQUIVO",
+                        help="Cache SQLite de conversões, reaproveitado entre execuções")
+    parser.add_argument("--perfil", "--profile", action="store_true",
+                        help="Mede o tempo de cada etapa (leitura, conversão por tipo, gravação) e mostra o resumo")
+    parser.add_argument("--perfil-json", metavar="ARQUIVO",
+                        help="Grava as estatísticas do perfil em JSON (implica --perfil)")
+    parser.add_argument("--saida", metavar="ARQUIVO",
+                        help="Ficheiro de saída; o formato vem da extensão "
+                             "(padrão: convertido_<data> no formato da entrada)")
+    parser.add_argument("--somente-descricao", action="store_true",
+                        help="Lê apenas a coluna de descrições e grava só ela e o código "
+                             "(em Parquet e Arrow as outras colunas nem são lidas)")
+    parser.add_argument("--catalogo", metavar="ARQUIVO",
+                        help="Catálogo Poliron (Excel, CSV, Parquet ou Arrow): marca cada código como exato ou "
+                             "fora do catálogo, com o código mais próximo; o índice fica em <catálogo>.indice.arrow")
+    parser.add_argument("--coluna-catalogo", default="Código",
+                        help="Coluna do catálogo com os códigos (padrão: 'Código'; sem ela, a primeira)")
+    parser.add_argument("--sugestoes", type=int, nargs='?', const=3, default=0, metavar="N",
+                        help="Acrescenta às linhas não convertidas as N descrições convertidas mais parecidas "
+                             "(padrão: 3) e os seus códigos, nas colunas 'Semelhante', 'Código Semelhante' e 'Semelhança'")
+    parser.add_argument("--corpus", action="append", metavar="ARQUIVO",
+                        help="Conversão anterior (com as colunas de descrição e 'Referência YOFC') também usada "
+                             "nas sugestões, além das linhas convertidas da entrada e do --cache; pode repetir-se")
+    parser.add_argument("--todas-folhas", action="store_true",
+                        help="Converte todas as folhas do livro Excel numa única passagem, detetando a "
+                             "coluna de descrições de cada folha, e grava um livro com as mesmas folhas")
+    parser.add_argument("--saida-dir", metavar="PASTA",
+                        help="Modo em lote: converte todas as entradas para esta pasta, saltando os "
+                             "ficheiros inalterados desde a última execução (ver manifesto.json)")
+    parser.add_argument("--forcar", action="store_true",
+                        help="Modo em lote: reconverte também os ficheiros inalterados")
+    parser.add_argument("--pipe", action="store_true",
+                        help="Lê descrições da entrada padrão (uma por linha, em texto ou JSON com 'descricao' e "
+                             "'id') e escreve um resultado JSON por linha (id, codigo, tipo, convertido, motivo)")
+    parser.add_argument("--tamanho-lote", type=int, default=5000,
+                        help="Modo --pipe: linhas por micro-lote (padrão: 5000)")
+    parser.add_argument("--janela-ms", type=float, default=5.0,
+                        help="Modo --pipe: milissegundos que um lote incompleto espera por mais linhas (padrão: 5)")
+    parser.add_argument("--explicar", action="store_true",
+                        help="As ENTRADAS são descrições: mostra o trajeto de decisão da conversão de cada uma "
+                             "(formação, tipo de cabo, palavras-chave de cada atributo, mapas de seções)")
+    parser.add_argument("--comparar", nargs=2, metavar=("CONFIG_A", "CONFIG_B"),
+                        help="Converte as entradas (ficheiros, pastas ou padrões glob) com as configurações de "
+                             "duas pastas numa única passagem e grava só as linhas com códigos diferentes "
+                             "(padrão: comparacao_<data>.csv), com as contagens por tipo de cabo")
+    args = parser.parse_args()
+    perfil_ativo = args.perfil or args.perfil_json
+    if args.corpus and not args.sugestoes:
+        parser.error("--corpus só se aplica com --sugestoes")
+    
+    if args.pipe:
+        if args.entradas:
+            parser.error("--pipe lê as descrições da entrada padrão: não indique ENTRADAS")
+        if (args.streaming or args.todas_folhas or args.saida_dir or args.saida or args.catalogo
+                or args.sugestoes or args.comparar or args.explicar or perfil_ativo):
+            parser.error("--pipe só se combina com --workers, --cache, --tamanho-lote e --janela-ms")
+        _converter_fluxo(args)
+        return
+    if not args.entradas:
+        parser.error("indique pelo menos uma ENTRADA (ou use --pipe)")
+    
+    if args.explicar:
+        conversor = ConversorPoliron()
+        print("\n\n".join(formatar_explicacao(conversor.explicar(descricao)) for descricao in args.entradas))
+        return
+    
+    if args.comparar:
+        if (args.streaming or args.todas_folhas or args.saida_dir or args.cache or args.catalogo
+                or args.sugestoes or perfil_ativo):
+            parser.error("--comparar não se aplica a --streaming, --todas-folhas, --saida-dir, --cache, "
+                         "--catalogo, --sugestoes nem --perfil")
+        _comparar_regras(parser, args)
+        return
+    
+    # Várias entradas, uma pasta ou um padrão glob: modo em lote
+    em_lote = args.saida_dir or len(args.entradas) > 1 or not Path(args.entradas[0]).is_file()
+    if em_lote:
+        if perfil_ativo or args.saida or args.catalogo or args.sugestoes:
+            parser.error("--perfil, --saida, --catalogo e --sugestoes só estão disponíveis para um único ficheiro")
+        from lote_conversao import processar_lote, imprimir_resumo
+        inicio = time.perf_counter()
+        resumo = processar_lote(args.entradas, args.saida_dir or "convertidos", args.coluna,
+                                workers=args.workers, streaming=args.streaming,
+                                detalhes=args.detalhes, arquivo_cache=args.cache, forcar=args.forcar,
+                                somente_descricao=args.somente_descricao, todas_folhas=args.todas_folhas)
+        if not resumo:
+            parser.error("nenhuma planilha encontrada nas entradas indicadas")
+        imprimir_resumo(resumo, time.perf_counter() - inicio)
+        if any(r['estado'] == 'erro' for r in resumo):
+            raise SystemExit(1)
+        return
     
-    if len(sys.argv) < 2:
-        print("Uso: python conversor_poliron.py <arquivo_entrada.xlsx>")
-        sys.exit(1)
+    from formatos_tabela import formato_arquivo, extensao_saida, ler_tabela, gravar_tabela, ler_folhas, gravar_folhas
     
-    arquivo_entrada = sys.argv[1]
+    arquivo_entrada = args.entradas[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    arquivo_saida = args.saida or f"convertido_{timestamp}{extensao_saida(arquivo_entrada)}"
+    try:
+        formato_entrada = formato_arquivo(arquivo_entrada)
+        formato_saida = formato_arquivo(arquivo_saida)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.todas_folhas and (formato_entrada != 'excel' or formato_saida != 'excel'):
+        parser.error("--todas-folhas só se aplica a livros Excel (entrada e saída .xlsx)")
     
-    # Carregar planilha
-    df = pd.read_excel(arquivo_entrada)
+    if args.streaming and not args.todas_folhas:
+        if args.catalogo or args.sugestoes:
+            parser.error("--catalogo e --sugestoes não se aplicam a --streaming")
+        if formato_entrada != 'excel' or formato_saida != 'excel':
+            parser.error("--streaming só se aplica a planilhas Excel (entrada e saída .xlsx)")
+        conversor = ConversorPoliron()
+        if perfil_ativo:
+            conversor.ativar_perfil()
+        inicio = time.perf_counter()
+        with conversor._medir('streaming_excel'):
+            estatisticas = conversor.processar_excel_streaming(arquivo_entrada, arquivo_saida, args.coluna)
+        duracao = time.perf_counter() - inicio
+        print(f"🔁 {estatisticas['descricoes_convertidas']} descrições convertidas em {estatisticas['linhas']} linhas")
+        print(f"⏱️  Leitura + conversão + gravação: {duracao:.2f}s "
+              f"({estatisticas['linhas'] / max(duracao, 1e-9):,.0f} linhas/s)")
+        _mostrar_perfil(conversor, args.perfil_json)
+        print(f"✅ Conversão concluída! Arquivo salvo: {arquivo_saida}")
+        return
     
     # Criar conversor
+    inicio = time.perf_counter()
     conversor = ConversorPoliron()
+    if perfil_ativo:
+        conversor.ativar_perfil().registrar_etapa('inicializacao', time.perf_counter() - inicio)
+    
+    # Carregar planilha (só a coluna de descrições com --somente-descricao; todas as folhas com --todas-folhas)
+    with conversor._medir(f'leitura_{formato_entrada}'):
+        if args.todas_folhas:
+            folhas = ler_folhas(arquivo_entrada)
+        else:
+            df = ler_tabela(arquivo_entrada, formato_entrada, [args.coluna] if args.somente_descricao else None)
+    
+    cache = None
+    if args.cache:
+        from cache_conversao import CacheConversao
+        cache = CacheConversao(args.cache, conversor.versao_regras)
+    
+    # Conversões anteriores para as sugestões (lidas antes da conversão: um corpus inválido falha já)
+    pares_corpus = []
+    if args.sugestoes:
+        from semelhanca_poliron import IndiceSemelhanca, pares_convertidos, ler_corpus
+        with conversor._medir('leitura_corpus'):
+            try:
+                for arquivo in args.corpus or []:
+                    pares_corpus.extend(ler_corpus(arquivo, args.coluna))
+            except (OSError, ValueError) as e:
+                parser.error(str(e))
     
     # Processar
-    df_resultado = conversor.processar_planilha(df)
+    inicio = time.perf_counter()
+    opcoes = dict(workers=args.workers, cache=cache, detalhes=args.detalhes)
+    if args.todas_folhas:
+        folhas = conversor.processar_folhas(folhas, args.coluna, **opcoes)
+    else:
+        df_resultado = conversor.processar_planilha(df, args.coluna, **opcoes)
+    duracao = time.perf_counter() - inicio
+    
+    # Tabelas convertidas e a sua coluna de descrições (uma por folha com --todas-folhas)
+    if args.todas_folhas:
+        tabelas = [(folhas[nome], folha['coluna']) for nome, folha in conversor.estatisticas_folhas.items()
+                   if folha['coluna'] is not None]
+    else:
+        tabelas = [(df_resultado, args.coluna)]
+    
+    # Validar os códigos no catálogo (cada código distinto uma única vez)
+    estatisticas_catalogo = None
+    if args.catalogo:
+        from catalogo_poliron import CatalogoPoliron
+        with conversor._medir('catalogo'):
+            catalogo = CatalogoPoliron.carregar(args.catalogo, coluna=args.coluna_catalogo)
+            estatisticas_catalogo = defaultdict(int)
+            for tabela, _ in tabelas:
+                for estado, linhas in catalogo.estatisticas(catalogo.marcar_colunas(tabela)).items():
+                    estatisticas_catalogo[estado] += linhas
+    
+    # Sugestões para as linhas não convertidas: as descrições convertidas mais parecidas,
+    # da própria entrada, dos corpus indicados e do cache
+    if args.sugestoes:
+        with conversor._medir('semelhanca'):
+            pares = [par for tabela, coluna in tabelas for par in pares_convertidos(tabela, coluna)]
+            pares.extend(pares_corpus)
+            if cache is not None:
+                pares.extend(cache.listar(excluir_prefixo=PREFIXO_FALHA))
+            indice = IndiceSemelhanca.construir(pares)
+            for tabela, coluna in tabelas:
+                indice.marcar_colunas(tabela, coluna, args.sugestoes)
+            nao_convertidas = sum(int(tabela['Referência YOFC'].astype(str).str.startswith(PREFIXO_FALHA).sum())
+                                  for tabela, _ in tabelas)
+            com_sugestao = sum(int(tabela['Semelhante 1'].notna().sum()) for tabela, _ in tabelas)
     
     # Salvar resultado
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    arquivo_saida = f"convertido_{timestamp}.xlsx"
-    df_resultado.to_excel(arquivo_saida, index=False)
+    with conversor._medir(f'gravacao_{formato_saida}'):
+        if args.todas_folhas:
+            gravar_folhas(folhas, arquivo_saida)
+        else:
+            gravar_tabela(df_resultado, arquivo_saida, formato_saida)
     
+    if args.todas_folhas:
+        for nome, folha in conversor.estatisticas_folhas.items():
+            coluna = f"coluna '{folha['coluna']}'" if folha['coluna'] is not None else "sem descrições"
+            print(f"📄 {nome}: {folha['linhas']} linhas, {coluna}")
+    dedup = conversor.estatisticas_dedup
+    print(f"🔁 {dedup['descricoes_unicas']} descrições únicas em {dedup['linhas']} linhas "
+          f"({dedup['taxa_unicas']:.1%} convertidas)")
+    print(f"⏱️  Conversão: {duracao:.2f}s ({dedup['linhas'] / max(duracao, 1e-9):,.0f} linhas/s, "
+          f"{args.workers} worker(s))")
+    if estatisticas_catalogo is not None:
+        print(f"📚 Catálogo ({len(catalogo):,} códigos): {estatisticas_catalogo['EXATO']} linhas com código do "
+              f"catálogo, {estatisticas_catalogo['FORA_DO_CATALOGO']} fora do catálogo")
+    if args.sugestoes:
+        print(f"💡 Sugestões: {com_sugestao} de {nao_convertidas} linhas não convertidas com descrições "
+              f"semelhantes (índice de {len(indice):,} descrições convertidas)")
+    if cache is not None:
+        est = cache.estatisticas()
+        print(f"🗄️  Cache: {est['acertos']} acertos, {est['falhas']} falhas "
+              f"({est['taxa_acertos']:.1%}), {est['entradas']} entradas")
+        cache.fechar()
+    _mostrar_perfil(conversor, args.perfil_json)
     print(f"✅ Conversão concluída! Arquivo salvo: {arquivo_saida}")
 
 
+def _converter_fluxo(args):
+    """Modo --pipe: descrições da entrada padrão, um resultado JSON por linha na saída padrão"""
+    import sys
+    from fluxo_conversao import ConversorFluxo, processar_fluxo
+    
+    # A saída padrão leva só os resultados: o resumo vai para a saída de erros
+    sys.stdin.reconfigure(encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    conversor = ConversorPoliron()
+    cache = None
+    if args.cache:
+        from cache_conversao import CacheConversao
+        cache = CacheConversao(args.cache, conversor.versao_regras)
+    pool = criar_pool(args.workers) if args.workers > 1 else None
+    try:
+        # Os processos do pool arrancam já, antes da thread de leitura da entrada: um fork
+        # com essa thread a meio de uma leitura deixa os processos bloqueados
+        if pool is not None:
+            pool.submit(int).result()
+        fluxo = ConversorFluxo(conversor, args.workers, cache, pool)
+        est = processar_fluxo(fluxo, sys.stdin, sys.stdout, args.tamanho_lote, args.janela_ms / 1000)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if cache is not None:
+            cache.fechar()
+    erros = f", {est['erros']} linhas inválidas" if est['erros'] else ""
+    linhas = est['linhas'] + est['erros']
+    print(f"🔁 {linhas} linhas em {est['lotes']} lotes: {est['descricoes_convertidas']} descrições "
+          f"convertidas, {est['acertos_memoria']} repetidas, {est['convertidas']} com código{erros} "
+          f"({linhas / max(est['segundos'], 1e-9):,.0f} linhas/s)", file=sys.stderr)
+
+
+def _comparar_regras(parser, args):
+    """Modo --comparar: diferenças de códigos entre duas pastas de configuração"""
+    from comparacao_regras import ComparacaoRegras, contar_por_tipo
+    from lote_conversao import expandir_entradas
+    from formatos_tabela import formato_arquivo, gravar_tabela
+    
+    arquivos = expandir_entradas(args.entradas)
+    if not arquivos:
+        parser.error("nenhuma planilha encontrada nas entradas indicadas")
+    arquivo_saida = args.saida or f"comparacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    try:
+        formato_saida = formato_arquivo(arquivo_saida)
+        comparacao = ComparacaoRegras(*args.comparar)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    
+    inicio = time.perf_counter()
+    try:
+        diferencas = comparacao.comparar_arquivos(arquivos, args.coluna, workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    duracao = time.perf_counter() - inicio
+    gravar_tabela(diferencas, arquivo_saida, formato_saida)
+    
+    est = comparacao.estatisticas
+    analise = "análise partilhada" if est['analise_partilhada'] else "palavras-chave diferentes: análise por configuração"
+    print(f"🔀 A: {args.comparar[0]}  B: {args.comparar[1]}")
+    print(f"🔁 {est['descricoes_unicas']} descrições únicas em {est['linhas']} linhas de "
+          f"{est['ficheiros']} ficheiro(s) ({analise})")
+    print(f"⏱️  Leitura + comparação: {duracao:.2f}s ({est['linhas'] / max(duracao, 1e-9):,.0f} linhas/s, "
+          f"{args.workers} worker(s))")
+    print(f"📊 {est['linhas_diferentes']} linhas com códigos diferentes "
+          f"({est['descricoes_diferentes']} descrições únicas)")
+    if len(diferencas):
+        print(contar_por_tipo(diferencas).to_string(index=False))
+    print(f"✅ Comparação concluída! Diferenças salvas: {arquivo_saida}")
+
+
+def descrever_regra_tipo(explicacao: Dict) -> str:
+    """Regra que decidiu o tipo de cabo numa explicação (ConversorPoliron.explicar), em texto"""
+    regra = explicacao['regra_tipo']
+    if regra is None:
+        return "sem formação"
+    if regra['regra'] == 'palavra_chave':
+        return f"palavra-chave '{regra['palavra']}'"
+    if regra['regra'] == 'formacao_instrumentacao':
+        return f"formação de instrumentação ({regra['padrao']})"
+    if regra['regra'] == 'quantidade_condutores':
+        return f"{regra['condutores']} condutores na formação (até {regra['limite_energia']}: ENERGIA)"
+    return "nenhuma palavra-chave nem regra da formação"
+
+
+def formatar_explicacao(explicacao: Dict) -> str:
+    """Explicação (ConversorPoliron.explicar) em texto, uma decisão por linha"""
+    linhas = [f"Descrição: {explicacao['descricao']}"]
+    formacao = explicacao['formacao']
+    if formacao is None:
+        linhas.append("Formação: não encontrada")
+    else:
+        grupos = ', '.join(f"{nome}={valor}" for nome, valor in formacao.items()
+                           if nome not in ('trecho', 'padrao') and valor is not None)
+        linhas.append(f"Formação: '{formacao['trecho']}' (padrão '{formacao['padrao']}': {grupos})")
+        
+        linhas.append(f"Tipo de cabo: {explicacao['tipo']} ({descrever_regra_tipo(explicacao)})")
+        
+        for nome, atributo in explicacao['atributos'].items():
+            encontradas = ', '.join(atributo['encontradas']) or "nenhuma (valor padrão)"
+            linhas.append(f"  {nome}: {encontradas} (testadas: {', '.join(atributo['testadas'])})")
+        for consulta in explicacao['mapas']:
+            origem = "no mapa" if consulta['no_mapa'] else "fora do mapa: seção sem ponto"
+            linhas.append(f"  {consulta['mapa']}['{consulta['chave']}'] -> '{consulta['valor']}' ({origem})")
+        if explicacao['cil'] is not None:
+            linhas.append(f"  CIL: {'sim' if explicacao['cil']['cil'] else 'não'} ({explicacao['cil']['padrao']})")
+            linhas.append(f"  Cores dos condutores: {explicacao['cores_condutores'] or '—'}")
+    
+    motivo = f" [{explicacao['motivo_falha']}]" if explicacao['motivo_falha'] else ""
+    linhas.append(f"Código: {explicacao['codigo']}{motivo}")
+    return "\n".join(linhas)
+
+
+def _mostrar_perfil(conversor: ConversorPoliron, arquivo_json: Optional[str]):
+    """Imprime o resumo do perfil (se ativo) e grava-o em JSON quando pedido"""
+    if conversor.perfil is None:
+        return
+    print("🔬 Perfil da conversão")
+    print(conversor.perfil.resumo())
+    if arquivo_json:
+        Path(arquivo_json).write_text(conversor.perfil.para_json(indent=2), encoding='utf-8')
+        print(f"🔬 Perfil salvo: {arquivo_json}")
+
+
 if __name__ == "__main__":
     main()
 
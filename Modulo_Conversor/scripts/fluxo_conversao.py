@@ -0,0 +1,230 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Conversão em Fluxo (pipe)
+Lê descrições da entrada padrão (linhas de texto ou JSON-lines com id), converte-as em
+micro-lotes com deduplicação e escreve um resultado JSON por linha na saída padrão
+"""
+
+import json
+import time
+import codecs
+import queue
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from conversor_poliron import ConversorPoliron, ResultadoConversao, motivo_falha
+
+# Linhas por micro-lote e segundos que um lote incompleto espera por mais linhas antes de
+# ser convertido (um produtor lento recebe as respostas logo, um rápido enche os lotes)
+TAMANHO_LOTE = 5000
+JANELA = 0.005
+
+# A partir deste número de descrições novas por lote, a conversão vai ao pool de processos
+# (já aquecido, como no serviço: MIN_DESCRICOES_PARALELO raramente seria atingido por um
+# lote deduplicado de TAMANHO_LOTE linhas)
+MIN_DESCRICOES_POOL = 64
+
+# Descrições convertidas memorizadas entre lotes (as menos usadas recentemente saem primeiro)
+TAMANHO_MEMORIA = 100_000
+
+# Bytes pedidos à entrada de cada vez (cada leitura devolve o que já chegou, até este tamanho)
+TAMANHO_LEITURA = 1 << 16
+
+# Marca do fim da entrada na fila da thread de leitura
+_FIM = None
+
+
+def ler_pedido(linha: str, numero: int) -> Optional[Tuple[Any, Optional[str], Optional[str]]]:
+    """
+    (id, descrição, erro) de uma linha da entrada: um objeto JSON com 'descricao' (e 'id'
+    opcional) ou o texto da linha; sem id, o id é o número da linha (a partir de 1).
+    None numa linha vazia ou só com espaços, que fica sem resposta
+    """
+    texto = linha.rstrip('\r\n')
+    if not texto.strip():
+        return None
+    if not texto.lstrip().startswith('{'):
+        return numero, texto, None
+    try:
+        pedido = json.loads(texto)
+    except ValueError as erro:
+        return numero, None, f"JSON inválido: {erro}"
+    descricao = pedido.get('descricao')
+    if descricao is not None and not isinstance(descricao, str):
+        descricao = str(descricao)
+    return pedido.get('id', numero), descricao, None if descricao is not None else "Falta o campo 'descricao'"
+
+
+class ConversorFluxo:
+    """
+    Conversão de micro-lotes de descrições com deduplicação no processo: cada descrição
+    (normalizada como nas planilhas) é convertida uma única vez por lote, e as já convertidas
+    ficam memorizadas entre lotes (até `tamanho_memoria`), com a resposta JSON já montada;
+    as restantes passam pelo cache e, a partir de `min_pool` por lote, pelo pool de
+    converter_descricoes_unicas
+    """
+    
+    def __init__(self, conversor: ConversorPoliron, workers: int = 1, cache=None, executor=None,
+                 tamanho_memoria: int = TAMANHO_MEMORIA, min_pool: int = MIN_DESCRICOES_POOL):
+        self.conversor = conversor
+        self.workers = workers
+        self.cache = cache
+        self.executor = executor
+        self.min_pool = min_pool
+        self.tamanho_memoria = tamanho_memoria
+        # Descrição normalizada -> (resultado, fim da resposta JSON a seguir ao id, convertida)
+        self._memoria: 'OrderedDict[str, Tuple[ResultadoConversao, str, bool]]' = OrderedDict()
+        
+        self.lotes = 0
+        self.linhas = 0
+        self.erros = 0
+        self.convertidas = 0
+        self.descricoes_convertidas = 0
+        self.acertos_memoria = 0
+    
+    def _respostas(self, descricoes: List[str]) -> List[Tuple[ResultadoConversao, str, bool]]:
+        """Entrada da memória de cada descrição do lote, pela mesma ordem (convertendo as que faltam)"""
+        memoria = self._memoria
+        normalizadas = [descricao.strip().upper() for descricao in descricoes]
+        pendentes = list(dict.fromkeys(d for d in normalizadas if d not in memoria))
+        novas = {}
+        if pendentes:
+            resultados = self.conversor.converter_descricoes_unicas(
+                pendentes, workers=self.workers, cache=self.cache, executor=self.executor,
+                min_paralelo=self.min_pool)
+            for descricao, resultado in zip(pendentes, resultados):
+                motivo = motivo_falha(resultado.codigo)
+                cauda = json.dumps({'codigo': resultado.codigo, 'tipo': resultado.tipo,
+                                    'convertido': motivo is None, 'motivo': motivo}, ensure_ascii=False)
+                novas[descricao] = (resultado, ', ' + cauda[1:], motivo is None)
+        
+        respostas = []
+        for descricao in normalizadas:
+            resposta = novas.get(descricao)
+            if resposta is None:
+                resposta = memoria[descricao]
+                memoria.move_to_end(descricao)
+                self.acertos_memoria += 1
+            respostas.append(resposta)
+        
+        memoria.update(novas)
+        while len(memoria) > self.tamanho_memoria:
+            memoria.popitem(last=False)
+        
+        self.lotes += 1
+        self.linhas += len(descricoes)
+        self.descricoes_convertidas += len(pendentes)
+        return respostas
+    
+    def converter_lote(self, descricoes: List[str]) -> List[ResultadoConversao]:
+        """Resultado de cada descrição do lote, pela mesma ordem"""
+        return [resultado for resultado, _, _ in self._respostas(descricoes)]
+    
+    def responder_lote(self, pedidos: List[Tuple[Any, Optional[str], Optional[str]]]) -> str:
+        """
+        Respostas JSON-lines dos pedidos (ler_pedido), uma por linha e pela mesma ordem:
+        {id, codigo, tipo, convertido, motivo} ou {id, erro}
+        """
+        respostas = iter(self._respostas([descricao for _, descricao, erro in pedidos if erro is None]))
+        linhas = []
+        for identificador, _, erro in pedidos:
+            texto_id = str(identificador) if type(identificador) is int else json.dumps(identificador, ensure_ascii=False)
+            if erro is not None:
+                self.erros += 1
+                linhas.append(f'{{"id": {texto_id}, "erro": {json.dumps(erro, ensure_ascii=False)}}}\n')
+                continue
+            _, cauda, convertida = next(respostas)
+            self.convertidas += convertida
+            linhas.append(f'{{"id": {texto_id}{cauda}\n')
+        return ''.join(linhas)
+    
+    def estatisticas(self) -> Dict:
+        return {
+            'linhas': self.linhas,
+            'erros': self.erros,
+            'convertidas': self.convertidas,
+            'lotes': self.lotes,
+            'descricoes_convertidas': self.descricoes_convertidas,
+            'acertos_memoria': self.acertos_memoria,
+        }
+
+
+def _ler_blocos(entrada: TextIO, fila: queue.Queue):
+    """
+    Thread de leitura: passa à fila as linhas completas de cada leitura (tudo o que já
+    chegou à entrada, sem esperar por mais) e _FIM no fim
+    """
+    try:
+        fonte = getattr(entrada, 'buffer', None)
+        if not hasattr(fonte, 'read1'):
+            for linha in entrada:
+                fila.put([linha])
+            return
+        
+        decodificador = codecs.getincrementaldecoder(entrada.encoding or 'utf-8')(errors='replace')
+        resto = ''
+        while True:
+            dados = fonte.read1(TAMANHO_LEITURA)
+            texto = resto + decodificador.decode(dados, final=not dados)
+            if not dados:
+                if texto:
+                    fila.put([texto])
+                return
+            linhas = texto.split('\n')
+            resto = linhas.pop()
+            if linhas:
+                fila.put(linhas)
+    finally:
+        fila.put(_FIM)
+
+
+def processar_fluxo(fluxo: ConversorFluxo, entrada: TextIO, saida: TextIO,
+                    tamanho_lote: int = TAMANHO_LOTE, janela: float = JANELA) -> Dict:
+    """
+    Converte as linhas da entrada até ao fim dela e escreve uma resposta JSON por linha
+    (exceto nas vazias), pela mesma ordem. Um lote fecha quando junta `tamanho_lote` linhas ou quando a entrada
+    fica `janela` segundos sem linhas novas; as respostas de cada lote são escritas e
+    despejadas (flush) logo a seguir. Retorna as estatísticas do fluxo e a duração
+    """
+    inicio = time.perf_counter()
+    fila = queue.Queue()
+    threading.Thread(target=_ler_blocos, args=(entrada, fila), name="leitura-fluxo", daemon=True).start()
+    
+    numero = 0
+    fim = False
+    while not fim:
+        bloco = fila.get()
+        if bloco is _FIM:
+            break
+        linhas = list(bloco)
+        
+        # Blocos que já estão na fila entram sem esperar; depois, só durante a janela
+        limite = time.monotonic() + janela
+        while len(linhas) < tamanho_lote:
+            try:
+                bloco = fila.get_nowait()
+            except queue.Empty:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    bloco = fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+            if bloco is _FIM:
+                fim = True
+                break
+            linhas.extend(bloco)
+        
+        pedidos = [ler_pedido(linha, numero + i) for i, linha in enumerate(linhas, 1)]
+        numero += len(linhas)
+        pedidos = [pedido for pedido in pedidos if pedido is not None]
+        if pedidos:
+            saida.write(fluxo.responder_lote(pedidos))
+            saida.flush()
+    
+    estatisticas = fluxo.estatisticas()
+    estatisticas['segundos'] = time.perf_counter() - inicio
+    return estatisticas
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Formatos de Tabela
+Leitura e gravação de Excel, CSV, Parquet e Arrow (Feather), com o formato escolhido pela extensão
+"""
+
+import csv
+import io
+import gzip
+import codecs
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+# Extensão -> formato
+FORMATOS = {
+    '.xlsx': 'excel',
+    '.xlsm': 'excel',
+    '.xls': 'excel',
+    '.csv': 'csv',
+    '.csv.gz': 'csv_gz',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+# Extensão das saídas (o formato .xls antigo já não pode ser gravado)
+EXTENSAO_SAIDA = {'.xls': '.xlsx'}
+
+TIPOS_MIME = {
+    'excel': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'csv': "text/csv",
+    'csv_gz': "application/gzip",
+    'parquet': "application/vnd.apache.parquet",
+    'arrow': "application/vnd.apache.arrow.file",
+}
+
+# Linhas convertidas de cada vez em valores Python na gravação de Excel
+LINHAS_POR_BLOCO_EXCEL = 10000
+
+try:
+    import xlsxwriter  # opcional: grava Excel em fluxo, com memória constante
+except ImportError:
+    xlsxwriter = None
+
+# Motor usado por gravar_excel quando nenhum é indicado
+MOTOR_EXCEL = 'xlsxwriter' if xlsxwriter is not None else 'openpyxl'
+
+# Prévia (ler_previa): linhas lidas e tamanho do bloco lido do início de um CSV
+LINHAS_PREVIA = 200
+BLOCO_PREVIA_CSV = 1 << 20
+
+# Início de um CSV lido para detetar o separador, a codificação e os nomes das colunas
+BLOCO_CABECALHO_CSV = 65536
+
+Origem = Union[str, Path, bytes]
+
+
+def extensao_arquivo(nome: Union[str, Path]) -> str:
+    """Extensão em minúsculas, incluindo as duplas conhecidas (ex: '.csv.gz')"""
+    caminho = Path(nome)
+    dupla = ''.join(caminho.suffixes[-2:]).lower()
+    return dupla if dupla in FORMATOS else caminho.suffix.lower()
+
+
+def formato_arquivo(nome: Union[str, Path]) -> str:
+    """Formato da tabela pela extensão do ficheiro"""
+    extensao = extensao_arquivo(nome)
+    if extensao not in FORMATOS:
+        raise ValueError(f"Formato não suportado: '{extensao}' (use {', '.join(sorted(FORMATOS))})")
+    return FORMATOS[extensao]
+
+
+def extensao_saida(nome: Union[str, Path]) -> str:
+    """Extensão da saída para uma entrada com o mesmo formato"""
+    extensao = extensao_arquivo(nome)
+    return EXTENSAO_SAIDA.get(extensao, extensao)
+
+
+def _cabecalho_csv(origem: Origem, comprimido: bool = False):
+    """Lê só o início do CSV: separador (',' ou ';'), codificação e nomes das colunas"""
+    if isinstance(origem, bytes):
+        fonte = io.BytesIO(origem)
+    else:
+        fonte = open(origem, 'rb')
+    with (gzip.GzipFile(fileobj=fonte) if comprimido else fonte) as f:
+        inicio = f.read(BLOCO_CABECALHO_CSV)
+    
+    # Exportações de ERP costumam vir em UTF-8 (com ou sem BOM) ou em Latin-1: a codificação
+    # é decidida pelo bloco inteiro (um cabeçalho só em ASCII serve às duas). O bloco pode
+    # terminar a meio de um carácter UTF-8, a não ser que seja o ficheiro todo.
+    try:
+        decodificador = codecs.getincrementaldecoder('utf-8')()
+        texto = decodificador.decode(inicio, final=len(inicio) < BLOCO_CABECALHO_CSV)
+        codificacao = 'utf8'
+    except UnicodeDecodeError:
+        texto, codificacao = inicio.decode('latin-1'), 'latin-1'
+    primeira_linha = texto.split('\n', 1)[0].rstrip('\r').lstrip('\ufeff')
+    
+    separador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+    colunas = next(csv.reader([primeira_linha], delimiter=separador), [])
+    return separador, codificacao, colunas
+
+
+def _ler_csv(origem: Origem, formato: str, ler):
+    """
+    Chama ler(fonte, separador, codificacao, nomes) com a fonte Arrow do CSV (descomprimido em csv_gz)
+    Bytes fora de UTF-8 depois do bloco analisado por _cabecalho_csv fazem o Arrow falhar
+    ao validar o texto: nesse caso a leitura é repetida em Latin-1, numa fonte nova.
+    """
+    import pyarrow as pa
+    separador, codificacao, nomes = _cabecalho_csv(origem, comprimido=formato == 'csv_gz')
+    
+    def fonte():
+        if formato == 'csv_gz':
+            return pa.CompressedInputStream(pa.BufferReader(origem) if isinstance(origem, bytes)
+                                            else pa.OSFile(str(origem)), 'gzip')
+        return pa.BufferReader(origem) if isinstance(origem, bytes) else str(origem)
+    
+    try:
+        return ler(fonte(), separador, codificacao, nomes)
+    except pa.ArrowInvalid:
+        if codificacao == 'latin-1':
+            raise
+        return ler(fonte(), separador, 'latin-1', nomes)
+
+
+def ler_tabela(origem: Origem, formato: str, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lê uma tabela de um ficheiro (ou dos seus bytes)
+    Com `colunas`, só essas colunas são lidas (projeção: em Parquet e Arrow as outras nem saem do disco).
+    Em CSV, Parquet e Arrow as colunas ficam em memória Arrow (pd.ArrowDtype): as que não
+    são convertidas passam para a saída sem se tornarem objetos Python. Em CSV todas as
+    colunas são lidas como texto, para a saída reproduzir a entrada (ex: '0012' continua '0012').
+    """
+    if formato == 'excel':
+        fonte = io.BytesIO(origem) if isinstance(origem, bytes) else origem
+        return pd.read_excel(fonte, usecols=colunas)
+    
+    import pyarrow as pa
+    fonte = pa.BufferReader(origem) if isinstance(origem, bytes) else str(origem)
+    mapear_memoria = not isinstance(origem, bytes)
+    
+    if formato in ('csv', 'csv_gz'):
+        import pyarrow.csv as pa_csv
+        
+        def ler(fonte, separador, codificacao, nomes):
+            tabela = pa_csv.read_csv(
+                fonte,
+                read_options=pa_csv.ReadOptions(encoding=codificacao),
+                parse_options=pa_csv.ParseOptions(delimiter=separador),
+                convert_options=pa_csv.ConvertOptions(column_types={nome: pa.string() for nome in nomes},
+                                                      include_columns=colunas),
+            )
+            df = tabela.to_pandas(types_mapper=pd.ArrowDtype)
+            df.attrs['separador_csv'] = separador
+            return df
+        
+        return _ler_csv(origem, formato, ler)
+    
+    if formato == 'parquet':
+        import pyarrow.parquet as pq
+        tabela = pq.read_table(fonte, columns=colunas, memory_map=mapear_memoria)
+    elif formato == 'arrow':
+        import pyarrow.feather as feather
+        tabela = feather.read_table(fonte, columns=colunas, memory_map=mapear_memoria)
+    else:
+        raise ValueError(f"Formato não suportado: '{formato}'")
+    return tabela.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def ler_previa(origem: Origem, formato: str, linhas: int = LINHAS_PREVIA,
+               folha: Optional[str] = None) -> pd.DataFrame:
+    """
+    Cabeçalho e primeiras `linhas` de uma tabela, sem ler o resto do ficheiro: em Excel a
+    leitura da folha para nessas linhas, em CSV só o primeiro bloco é lido, em Parquet o
+    primeiro lote e em Arrow o primeiro lote gravado. As colunas e os tipos são os de ler_tabela.
+    """
+    if formato == 'excel':
+        fonte = io.BytesIO(origem) if isinstance(origem, bytes) else origem
+        return pd.read_excel(fonte, sheet_name=folha if folha is not None else 0, nrows=linhas)
+    
+    import pyarrow as pa
+    fonte = pa.BufferReader(origem) if isinstance(origem, bytes) else str(origem)
+    
+    if formato in ('csv', 'csv_gz'):
+        import pyarrow.csv as pa_csv
+        
+        def ler(fonte, separador, codificacao, nomes):
+            leitor = pa_csv.open_csv(
+                fonte,
+                read_options=pa_csv.ReadOptions(encoding=codificacao, block_size=BLOCO_PREVIA_CSV),
+                parse_options=pa_csv.ParseOptions(delimiter=separador),
+                convert_options=pa_csv.ConvertOptions(column_types={nome: pa.string() for nome in nomes}),
+            )
+            lotes = []
+            while sum(len(lote) for lote in lotes) < linhas:
+                try:
+                    lotes.append(leitor.read_next_batch())
+                except StopIteration:
+                    break
+            return pa.Table.from_batches(lotes, schema=leitor.schema)
+        
+        tabela = _ler_csv(origem, formato, ler)
+    elif formato == 'parquet':
+        import pyarrow.parquet as pq
+        arquivo = pq.ParquetFile(fonte, memory_map=not isinstance(origem, bytes))
+        lote = next(arquivo.iter_batches(batch_size=linhas), None)
+        tabela = pa.Table.from_batches([lote] if lote is not None else [], schema=arquivo.schema_arrow)
+    elif formato == 'arrow':
+        fonte = pa.memory_map(fonte) if isinstance(fonte, str) else fonte
+        leitor = pa.ipc.open_file(fonte)
+        lotes = [leitor.get_batch(0)] if leitor.num_record_batches else []
+        tabela = pa.Table.from_batches(lotes, schema=leitor.schema)
+    else:
+        raise ValueError(f"Formato não suportado: '{formato}'")
+    return tabela.slice(0, linhas).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def ler_folhas(origem: Origem) -> Dict[str, pd.DataFrame]:
+    """Lê todas as folhas de um livro Excel (o ficheiro é aberto e descomprimido uma única vez)"""
+    fonte = io.BytesIO(origem) if isinstance(origem, bytes) else origem
+    return pd.read_excel(fonte, sheet_name=None)
+
+
+def _tabela_arrow(df: pd.DataFrame):
+    """DataFrame -> tabela Arrow (sem cópia para as colunas que já são Arrow)"""
+    import pyarrow as pa
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Colunas vindas do Excel podem misturar números e texto: gravá-las como texto
+        mistas = {coluna: str for coluna in df.columns if df[coluna].dtype == object}
+        return pa.Table.from_pandas(df.astype(mistas), preserve_index=False)
+
+
+def _valores_excel(serie: pd.Series) -> list:
+    """Valores Python de uma coluna para o Excel (vazios -> None, que fica uma célula vazia)"""
+    valores = serie.astype(object)
+    return valores.where(serie.notna(), None).tolist()
+
+
+def _linhas_excel(df: pd.DataFrame):
+    """Linhas da tabela, convertidas em valores Python um bloco de cada vez"""
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO_EXCEL):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO_EXCEL]
+        yield from zip(*[_valores_excel(bloco.iloc[:, i]) for i in range(bloco.shape[1])])
+
+
+def gravar_excel(df: pd.DataFrame, destino, nome_folha: str = 'Sheet1', motor: Optional[str] = None):
+    """Grava a tabela em .xlsx linha a linha (ver gravar_folhas)"""
+    gravar_folhas({nome_folha: df}, destino, motor)
+
+
+def gravar_folhas(folhas: Dict[str, pd.DataFrame], destino, motor: Optional[str] = None):
+    """
+    Grava um livro .xlsx com uma folha por tabela, pela ordem do dicionário, linha a linha
+    e sem montar as folhas inteiras em memória: com o xlsxwriter (modo constant_memory)
+    quando instalado, senão com o openpyxl em modo write_only. O pandas (to_excel) cria
+    um objeto por célula e grava coluna a coluna, o que impede os modos em fluxo.
+    """
+    motor = motor or MOTOR_EXCEL
+    
+    if motor == 'xlsxwriter':
+        livro = xlsxwriter.Workbook(destino, {
+            'constant_memory': True,
+            'strings_to_numbers': False,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        negrito = livro.add_format({'bold': True})
+        for nome_folha, df in folhas.items():
+            folha = livro.add_worksheet(nome_folha)
+            folha.write_row(0, 0, [str(coluna) for coluna in df.columns], negrito)
+            for numero, linha in enumerate(_linhas_excel(df), start=1):
+                folha.write_row(numero, 0, linha)
+        livro.close()
+        return
+    
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    
+    livro = Workbook(write_only=True)
+    negrito = Font(bold=True)
+    for nome_folha, df in folhas.items():
+        folha = livro.create_sheet(nome_folha)
+        cabecalho = []
+        for coluna in df.columns:
+            celula = WriteOnlyCell(folha, value=str(coluna))
+            celula.font = negrito
+            cabecalho.append(celula)
+        folha.append(cabecalho)
+        for linha in _linhas_excel(df):
+            folha.append(linha)
+    livro.save(destino)
+
+
+def gravar_tabela(df: pd.DataFrame, destino, formato: Optional[str] = None, nome_folha: str = 'Sheet1'):
+    """
+    Grava a tabela num ficheiro ou num buffer (BytesIO); sem `formato`, usa a extensão do destino
+    Um CSV lido com ';' é gravado com ';'
+    """
+    formato = formato or formato_arquivo(destino)
+    if formato == 'excel':
+        gravar_excel(df, destino, nome_folha)
+        return
+    
+    tabela = _tabela_arrow(df)
+    if formato in ('csv', 'csv_gz'):
+        import pyarrow.csv as pa_csv
+        separador = df.attrs.get('separador_csv', ',')
+        opcoes = pa_csv.WriteOptions(delimiter=separador)
+        if formato == 'csv_gz':
+            # GzipFile sobre um buffer não o fecha no fim (o chamador ainda o lê)
+            with (gzip.open(destino, 'wb', compresslevel=6) if isinstance(destino, (str, Path))
+                  else gzip.GzipFile(fileobj=destino, mode='wb', compresslevel=6)) as saida:
+                pa_csv.write_csv(tabela, saida, write_options=opcoes)
+        else:
+            pa_csv.write_csv(tabela, destino, write_options=opcoes)
+    elif formato == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(tabela, destino)
+    elif formato == 'arrow':
+        import pyarrow.feather as feather
+        feather.write_feather(tabela, destino)
+    else:
+        raise ValueError(f"Formato não suportado: '{formato}'")
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Conversão em Lote
+Converte pastas inteiras de planilhas num pool de processos; um manifesto com o
+hash de cada entrada permite saltar, nas execuções seguintes, os ficheiros que não mudaram
+"""
+
+import os
+import glob
+import json
+import time
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import as_completed
+from typing import Dict, Iterable, List, Optional
+
+import conversor_poliron
+from conversor_poliron import ConversorPoliron, PREFIXO_FALHA, criar_pool
+from formatos_tabela import (FORMATOS, formato_arquivo, extensao_arquivo, extensao_saida, ler_tabela,
+                             gravar_tabela, ler_folhas, gravar_folhas)
+
+EXTENSOES_PLANILHA = tuple(FORMATOS)
+NOME_MANIFESTO = "manifesto.json"
+TAMANHO_BLOCO_HASH = 1 << 20
+
+def expandir_entradas(entradas: Iterable[str]) -> List[Path]:
+    """
+    Lista as planilhas indicadas por ficheiros, pastas (percorridas recursivamente)
+    ou padrões glob ('dados/**/*.xlsx'), sem repetições e sem ficheiros de bloqueio do Excel
+    Os caminhos são absolutos mas sem seguir ligações simbólicas: uma planilha ligada a um
+    ficheiro fora da pasta continua dentro dela (ver raiz_entradas).
+    """
+    encontrados = []
+    for entrada in entradas:
+        caminho = Path(entrada)
+        if caminho.is_dir():
+            candidatos = sorted(p for p in caminho.rglob('*') if p.name.lower().endswith(EXTENSOES_PLANILHA))
+        elif caminho.exists():
+            candidatos = [caminho]
+        else:
+            candidatos = sorted(Path(p) for p in glob.glob(entrada, recursive=True))
+        encontrados.extend(_absoluto(p) for p in candidatos if p.is_file() and not p.name.startswith('~$'))
+    return list(dict.fromkeys(encontrados))
+
+
+def _absoluto(caminho: Path) -> Path:
+    """Caminho absoluto normalizado, sem resolver ligações simbólicas (ao contrário de resolve())"""
+    return Path(os.path.abspath(caminho))
+
+
+def raiz_entradas(entradas: Iterable[str]) -> Path:
+    """
+    Pasta de referência das chaves do manifesto e das saídas: a pasta comum às entradas
+    indicadas (a própria pasta, a pasta de um ficheiro ou a parte fixa de um padrão glob).
+    Depende só dos argumentos, não dos ficheiros encontrados: um ficheiro novo numa
+    subpasta não muda as chaves nem as saídas dos que já foram convertidos.
+    """
+    raizes = []
+    for entrada in entradas:
+        caminho = Path(entrada)
+        if caminho.is_dir():
+            raizes.append(_absoluto(caminho))
+        elif caminho.exists() or not glob.has_magic(entrada):
+            raizes.append(_absoluto(caminho).parent)
+        else:
+            fixas = []
+            for parte in caminho.parts:
+                if glob.has_magic(parte):
+                    break
+                fixas.append(parte)
+            raizes.append(_absoluto(Path(*fixas)) if fixas else Path.cwd())
+    return Path(os.path.commonpath(raizes))
+
+
+def hash_arquivo(caminho: Path) -> str:
+    """SHA-256 do conteúdo do ficheiro, lido em blocos"""
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+class ManifestoLote:
+    """
+    Registo das conversões já feitas numa pasta de saída (manifesto.json)
+    Cada entrada guarda o hash, tamanho e data de modificação do ficheiro de origem,
+    a versão das regras e as opções usadas: se nada disso mudou e a saída existe,
+    o ficheiro é saltado. Tamanho e data iguais dispensam até o cálculo do hash.
+    """
+    
+    def __init__(self, pasta_saida: Path):
+        self.caminho = Path(pasta_saida) / NOME_MANIFESTO
+        self.arquivos = {}
+        if self.caminho.exists():
+            try:
+                self.arquivos = json.loads(self.caminho.read_text(encoding='utf-8')).get('arquivos', {})
+            except (ValueError, OSError):
+                self.arquivos = {}  # manifesto corrompido: converter tudo de novo
+    
+    def verificar(self, chave: str, entrada: Path, saida: Path, opcoes: Dict) -> Optional[str]:
+        """
+        Retorna None se a conversão registada continua válida (o ficheiro pode ser saltado);
+        caso contrário, o hash atual da entrada, a gravar depois da conversão
+        """
+        registo = self.arquivos.get(chave)
+        estado = entrada.stat()
+        if registo is None or registo.get('opcoes') != opcoes or not saida.exists():
+            return hash_arquivo(entrada)
+        
+        if registo.get('tamanho') == estado.st_size and registo.get('mtime_ns') == estado.st_mtime_ns:
+            return None
+        
+        # Data ou tamanho mudaram: só o conteúdo decide (ex: ficheiro copiado de novo)
+        atual = hash_arquivo(entrada)
+        if atual != registo.get('sha256'):
+            return atual
+        registo['tamanho'], registo['mtime_ns'] = estado.st_size, estado.st_mtime_ns
+        return None
+    
+    def registar(self, chave: str, entrada: Path, sha256: str, opcoes: Dict, resultado: Dict):
+        estado = entrada.stat()
+        self.arquivos[chave] = {
+            'sha256': sha256,
+            'tamanho': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'opcoes': opcoes,
+            'saida': resultado['saida'],
+            'linhas': resultado['linhas'],
+            'falhas': resultado['falhas'],
+            'segundos': resultado['segundos'],
+            'convertido_em': datetime.now().isoformat(timespec='seconds'),
+        }
+    
+    def salvar(self):
+        """Grava o manifesto de forma atómica (um ficheiro temporário substitui o anterior)"""
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho.with_suffix('.json.tmp')
+        temporario.write_text(json.dumps({'arquivos': self.arquivos}, ensure_ascii=False, indent=2),
+                              encoding='utf-8')
+        os.replace(temporario, self.caminho)
+
+
+def _contar_falhas(df) -> int:
+    """Falhas contadas sobre as categorias da coluna de códigos, não linha a linha"""
+    codigos = df['Referência YOFC'].cat
+    return int(codigos.categories.str.startswith(PREFIXO_FALHA)[codigos.codes].sum())
+
+
+def _converter_arquivo(entrada: str, saida: str, coluna_descricao: str, streaming: bool,
+                       detalhes: bool, arquivo_cache: Optional[str], somente_descricao: bool = False,
+                       todas_folhas: bool = False, conversor: Optional[ConversorPoliron] = None) -> Dict:
+    """
+    Converte uma planilha no processo atual; a saída só aparece quando estiver completa
+    (streaming e todas_folhas só se aplicam a Excel: os outros formatos seguem o caminho normal)
+    Sem conversor, usa o do processo do pool (criar_pool).
+    """
+    conversor = conversor or conversor_poliron._conversor_worker
+    inicio = time.perf_counter()
+    saida = Path(saida)
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    parcial = saida.with_name(f".{saida.stem}.parcial{saida.suffix}")
+    
+    formato = formato_arquivo(entrada)
+    multiplas_folhas = todas_folhas and formato == 'excel' and formato_arquivo(saida) == 'excel'
+    if streaming and formato == 'excel' and not somente_descricao and not multiplas_folhas:
+        estatisticas = conversor.processar_excel_streaming(entrada, str(parcial), coluna_descricao)
+        linhas, falhas = estatisticas['linhas'], estatisticas['falhas']
+    else:
+        cache = None
+        if arquivo_cache:
+            from cache_conversao import CacheConversao
+            cache = CacheConversao(arquivo_cache, conversor.versao_regras)
+        try:
+            if multiplas_folhas:
+                folhas = conversor.processar_folhas(ler_folhas(entrada), coluna_descricao,
+                                                    cache=cache, detalhes=detalhes)
+                convertidas = [folhas[nome] for nome, folha in conversor.estatisticas_folhas.items()
+                               if folha['coluna'] is not None]
+            else:
+                df = ler_tabela(entrada, formato, [coluna_descricao] if somente_descricao else None)
+                convertidas = [conversor.processar_planilha(df, coluna_descricao, cache=cache,
+                                                            detalhes=detalhes)]
+        finally:
+            if cache is not None:
+                cache.fechar()
+        
+        falhas = sum(_contar_falhas(df) for df in convertidas)
+        linhas = sum(len(df) for df in convertidas)
+        if multiplas_folhas:
+            gravar_folhas(folhas, parcial)
+        else:
+            gravar_tabela(df, parcial, formato_arquivo(saida))
+    
+    os.replace(parcial, saida)
+    return {
+        'saida': str(saida),
+        'linhas': linhas,
+        'falhas': falhas,
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def _caminho_saida(entrada: Path, raiz: Path, pasta_saida: Path, com_extensao: bool = False) -> Path:
+    """
+    Espelha a estrutura de pastas da entrada, no mesmo formato:
+    raiz/a/b.csv -> saída/a/b_convertido.csv
+    Com com_extensao, a extensão de origem fica no nome: raiz/a/b.xls -> saída/a/b_xls_convertido.xlsx
+    """
+    relativo = entrada.relative_to(raiz)
+    base = relativo.name[:len(relativo.name) - len(extensao_arquivo(relativo))]
+    if com_extensao:
+        base += '_' + relativo.name[len(base) + 1:].replace('.', '_')
+    return pasta_saida / relativo.with_name(f"{base}_convertido{extensao_saida(entrada)}")
+
+
+def _caminhos_saida(arquivos: List[Path], raiz: Path, pasta_saida: Path) -> Dict[Path, Optional[Path]]:
+    """
+    Saída de cada entrada (_caminho_saida). Entradas da mesma pasta com a mesma saída
+    (ex: a.xls e a.xlsx, a.csv e a.CSV) ficam com a extensão de origem no nome, exceto a que
+    já tem a extensão da saída; se o novo nome também estiver ocupado, a entrada fica sem saída (None)
+    """
+    saidas = {entrada: _caminho_saida(entrada, raiz, pasta_saida) for entrada in arquivos}
+    grupos = {}
+    for entrada, saida in saidas.items():
+        grupos.setdefault(saida, []).append(entrada)
+    renomeadas = []
+    for grupo in grupos.values():
+        if len(grupo) > 1:
+            principal = next((e for e in grupo if e.name.endswith(extensao_saida(e))), grupo[0])
+            renomeadas.extend(entrada for entrada in grupo if entrada != principal)
+    for entrada in renomeadas:
+        saidas[entrada] = _caminho_saida(entrada, raiz, pasta_saida, com_extensao=True)
+    
+    contagem = {}
+    for saida in saidas.values():
+        contagem[saida] = contagem.get(saida, 0) + 1
+    for entrada in renomeadas:
+        if contagem[saidas[entrada]] > 1:
+            saidas[entrada] = None
+    return saidas
+
+
+def processar_lote(entradas: Iterable[str], pasta_saida: str, coluna_descricao: str = 'Descrição',
+                   workers: int = 1, streaming: bool = False,
+                   detalhes: bool = False, arquivo_cache: Optional[str] = None,
+                   forcar: bool = False, config_dir: Optional[str] = None,
+                   somente_descricao: bool = False, todas_folhas: bool = False) -> List[Dict]:
+    """
+    Converte todas as planilhas indicadas para pasta_saida, em paralelo (um ficheiro por processo)
+    As chaves do manifesto e as saídas são relativas à pasta das entradas (raiz_entradas).
+    Com todas_folhas, cada livro Excel é convertido com todas as folhas (ver processar_folhas).
+    Ficheiros sem alterações desde a última execução (ver ManifestoLote) são saltados,
+    a não ser com forcar=True. Retorna um resumo por ficheiro, na ordem das entradas.
+    """
+    entradas = list(entradas)
+    pasta_saida = _absoluto(Path(pasta_saida))
+    # A pasta de saída pode estar dentro de uma pasta de entrada: não reconverter as saídas
+    arquivos = [p for p in expandir_entradas(entradas) if pasta_saida not in p.parents]
+    if not arquivos:
+        return []
+    raiz = raiz_entradas(entradas)
+    
+    conversor = ConversorPoliron(config_dir)
+    opcoes = {
+        'versao_regras': conversor.versao_regras,
+        'coluna': coluna_descricao,
+        'detalhes': detalhes,
+        'somente_descricao': somente_descricao,
+    }
+    if todas_folhas:
+        opcoes['todas_folhas'] = True
+    manifesto = ManifestoLote(pasta_saida)
+    
+    resumo = {}
+    pendentes = []
+    saidas = _caminhos_saida(arquivos, raiz, pasta_saida)
+    for entrada in arquivos:
+        chave = entrada.relative_to(raiz).as_posix()
+        saida = saidas[entrada]
+        if saida is None:
+            resumo[chave] = {'arquivo': chave, 'estado': 'erro',
+                             'erro': "Saída repetida: outra entrada da pasta grava o mesmo ficheiro"}
+            continue
+        sha256 = hash_arquivo(entrada) if forcar else manifesto.verificar(chave, entrada, saida, opcoes)
+        if sha256 is None:
+            registo = manifesto.arquivos[chave]
+            resumo[chave] = {'arquivo': chave, 'estado': 'inalterado', 'linhas': registo['linhas'],
+                             'falhas': registo['falhas'], 'segundos': 0.0}
+        else:
+            pendentes.append((chave, entrada, saida, sha256))
+    
+    def concluir(chave, entrada, sha256, resultado=None, erro=None):
+        if erro is not None:
+            resumo[chave] = {'arquivo': chave, 'estado': 'erro', 'erro': f"{type(erro).__name__}: {erro}"}
+            return
+        manifesto.registar(chave, entrada, sha256, opcoes, resultado)
+        manifesto.salvar()  # a cada ficheiro: uma execução interrompida não perde o progresso
+        resumo[chave] = {'arquivo': chave, 'estado': 'convertido', **resultado}
+    
+    def argumentos(entrada, saida):
+        return (str(entrada), str(saida), coluna_descricao, streaming, detalhes, arquivo_cache,
+                somente_descricao, todas_folhas)
+    
+    if workers > 1 and len(pendentes) > 1:
+        with criar_pool(min(workers, len(pendentes)), conversor.config_dir) as executor:
+            tarefas = {
+                executor.submit(_converter_arquivo, *argumentos(entrada, saida)): (chave, entrada, sha256)
+                for chave, entrada, saida, sha256 in pendentes
+            }
+            for tarefa in as_completed(tarefas):
+                chave, entrada, sha256 = tarefas[tarefa]
+                try:
+                    concluir(chave, entrada, sha256, resultado=tarefa.result())
+                except Exception as e:
+                    concluir(chave, entrada, sha256, erro=e)
+    else:
+        for chave, entrada, saida, sha256 in pendentes:
+            try:
+                resultado = _converter_arquivo(*argumentos(entrada, saida), conversor=conversor)
+                concluir(chave, entrada, sha256, resultado=resultado)
+            except Exception as e:
+                concluir(chave, entrada, sha256, erro=e)
+    
+    return [resumo[entrada.relative_to(raiz).as_posix()] for entrada in arquivos]
+
+
+def imprimir_resumo(resumo: List[Dict], duracao: float):
+    """Tabela final: linhas, falhas e tempo por ficheiro"""
+    largura = max([len(r['arquivo']) for r in resumo] + [len("Ficheiro")])
+    print(f"{'Ficheiro':<{largura}}  {'Estado':<10} {'Linhas':>10} {'Falhas':>8} {'Tempo':>9}")
+    for r in resumo:
+        if r['estado'] == 'erro':
+            print(f"{r['arquivo']:<{largura}}  {'erro':<10} {r['erro']}")
+            continue
+        print(f"{r['arquivo']:<{largura}}  {r['estado']:<10} {r['linhas']:>10,} {r['falhas']:>8,} "
+              f"{r['segundos']:>8.2f}s")
+    
+    convertidos = [r for r in resumo if r['estado'] == 'convertido']
+    inalterados = [r for r in resumo if r['estado'] == 'inalterado']
+    erros = [r for r in resumo if r['estado'] == 'erro']
+    linhas = sum(r['linhas'] for r in convertidos)
+    print(f"📦 {len(convertidos)} convertido(s), {len(inalterados)} inalterado(s), {len(erros)} com erro; "
+          f"{linhas:,} linhas convertidas, "
+          f"{sum(r['falhas'] for r in convertidos):,} falhas, em {duracao:.2f}s")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Descrições Semelhantes
+Índice invertido de trigramas de caracteres sobre descrições já convertidas: para cada
+linha não convertida, sugere as descrições convertidas mais parecidas e os seus códigos
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from conversor_poliron import PREFIXO_FALHA, CABECALHOS_DESCRICAO, _normalizar_cabecalho
+from formatos_tabela import formato_arquivo, ler_tabela
+
+# Sugestões por linha não convertida, por padrão
+SUGESTOES_PADRAO = 3
+
+# Coluna com os códigos num corpus (saída de uma conversão anterior)
+COLUNA_CODIGO = 'Referência YOFC'
+
+# Descrições indexadas de cada vez na construção (limita a memória dos trigramas intermédios)
+DESCRICOES_POR_BLOCO = 20000
+
+# Candidatos de cada consulta: votos das listas dos trigramas mais raros da consulta, até
+# somarem ORCAMENTO_POSTAGENS ocorrências; só os MAX_CANDIDATOS mais votados são comparados
+ORCAMENTO_POSTAGENS = 500000
+MAX_CANDIDATOS = 200
+
+# Semelhança (Jaccard dos trigramas) abaixo da qual não se sugere nada
+SEMELHANCA_MINIMA = 0.3
+
+# Deslocamentos de cada caractere no código de 64 bits do trigrama (21 bits por caractere Unicode)
+_BITS_CARACTERE = 21
+
+
+def normalizar_descricao(descricao) -> str:
+    """Descrição em maiúsculas, com os espaços repetidos reduzidos a um"""
+    return ' '.join(str(descricao).upper().split())
+
+
+def _trigramas(textos: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trigramas de caracteres de cada texto (com um espaço em cada ponta), como códigos int64,
+    e o número do texto de cada um. Os textos são codificados de uma só vez em UTF-32,
+    separados por um caractere nulo, e os trigramas saem de três vistas deslocadas.
+    """
+    juntos = '\x00'.join(f" {texto.replace(chr(0), '')} " for texto in textos)
+    caracteres = np.frombuffer(juntos.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    textos_ate = np.cumsum(caracteres == 0)
+    primeiro, segundo, terceiro = caracteres[:-2], caracteres[1:-1], caracteres[2:]
+    validos = (primeiro != 0) & (segundo != 0) & (terceiro != 0)
+    codigos = (primeiro << (2 * _BITS_CARACTERE)) | (segundo << _BITS_CARACTERE) | terceiro
+    return codigos[validos], textos_ate[:-2][validos]
+
+
+def _distintos(valores: np.ndarray) -> np.ndarray:
+    """Valores distintos, ordenados (por ordenação: o np.unique por hash é lento com muitos valores)"""
+    valores = np.sort(valores)
+    return valores[np.concatenate(([True], valores[1:] != valores[:-1]))] if len(valores) else valores
+
+
+class IndiceSemelhanca:
+    """
+    Índice de trigramas das descrições convertidas, em dois formatos CSR:
+    - invertido: `inicios` (início da lista de cada trigrama em `documentos`) e `documentos`
+      (números das descrições, ordenados dentro de cada lista);
+    - direto: `inicios_descricao` (início dos trigramas de cada descrição em `trigramas`) e
+      `trigramas` (números dos trigramas no `vocabulario`, os códigos ordenados).
+    Uma consulta reúne candidatos pelas listas invertidas dos seus trigramas mais raros e
+    conta os trigramas em comum de cada candidato pelo índice direto, sem percorrer o corpus.
+    Use construir() para criar o índice a partir de pares (descrição, código).
+    """
+    
+    def __init__(self, descricoes: List[str], codigos: List[str], vocabulario: np.ndarray,
+                 inicios: np.ndarray, documentos: np.ndarray, inicios_descricao: np.ndarray, trigramas: np.ndarray):
+        self.descricoes = descricoes
+        self.codigos = codigos
+        self.vocabulario = vocabulario
+        self.inicios = inicios
+        self.documentos = documentos
+        self.inicios_descricao = inicios_descricao
+        self.trigramas = trigramas
+        self._trigramas_descricao = np.diff(inicios_descricao)
+    
+    def __len__(self) -> int:
+        return len(self.descricoes)
+    
+    @classmethod
+    def construir(cls, pares: Iterable[Tuple[str, str]]) -> 'IndiceSemelhanca':
+        """
+        Indexa pares (descrição, código) de descrições convertidas; as falhas de conversão são
+        ignoradas e cada descrição normalizada entra uma única vez (a primeira ocorrência)
+        """
+        por_descricao: Dict[str, str] = {}
+        for descricao, codigo in pares:
+            if not isinstance(descricao, str) or not isinstance(codigo, str) or codigo.startswith(PREFIXO_FALHA):
+                continue
+            normalizada = normalizar_descricao(descricao)
+            if normalizada and normalizada not in por_descricao:
+                por_descricao[normalizada] = codigo
+        descricoes = list(por_descricao)
+        codigos = list(por_descricao.values())
+        
+        # Duas passagens por blocos (os trigramas de um bloco são recalculados na segunda,
+        # que é mais barato do que guardá-los): o vocabulário e depois os pares distintos
+        # (descrição, trigrama) como chaves int64 (descrição << 32 | trigrama), já na ordem
+        # do índice direto porque os blocos seguem a ordem das descrições
+        blocos = range(0, len(descricoes), DESCRICOES_POR_BLOCO)
+        vocabulario = np.zeros(0, dtype=np.int64)
+        for inicio in blocos:
+            codigos_trigramas, _ = _trigramas(descricoes[inicio:inicio + DESCRICOES_POR_BLOCO])
+            vocabulario = _distintos(np.concatenate([vocabulario, _distintos(codigos_trigramas)]))
+        chaves = [np.zeros(0, dtype=np.int64)]
+        for inicio in blocos:
+            codigos_trigramas, documentos = _trigramas(descricoes[inicio:inicio + DESCRICOES_POR_BLOCO])
+            chaves.append(_distintos(((documentos + inicio) << 32) | np.searchsorted(vocabulario, codigos_trigramas)))
+        chaves = np.concatenate(chaves)
+        
+        trigramas = (chaves & 0xFFFFFFFF).astype(np.int32)
+        inicios_descricao = np.searchsorted(chaves >> 32, np.arange(len(descricoes) + 1))
+        # Índice invertido: as mesmas chaves com as metades trocadas, ordenadas
+        chaves = (trigramas.astype(np.int64) << 32) | (chaves >> 32)
+        chaves.sort()
+        documentos = (chaves & 0xFFFFFFFF).astype(np.int32)
+        inicios = np.searchsorted(chaves >> 32, np.arange(len(vocabulario) + 1))
+        return cls(descricoes, codigos, vocabulario, inicios, documentos, inicios_descricao, trigramas)
+    
+    def _comuns(self, candidatos: np.ndarray, na_consulta: np.ndarray) -> np.ndarray:
+        """Trigramas em comum de cada candidato com a consulta (`na_consulta`: máscara do vocabulário)"""
+        if not len(candidatos):
+            return np.zeros(0, dtype=np.int64)
+        inicios = self.inicios_descricao[candidatos]
+        tamanhos = self._trigramas_descricao[candidatos]  # toda descrição tem pelo menos um trigrama
+        comecos = np.cumsum(tamanhos) - tamanhos
+        # Posições, no índice direto, dos trigramas de todos os candidatos seguidos: passos de 1,
+        # com um salto no começo de cada candidato
+        passos = np.ones(comecos[-1] + tamanhos[-1], dtype=np.int64)
+        passos[comecos[1:]] = inicios[1:] - (inicios[:-1] + tamanhos[:-1] - 1)
+        passos[0] = inicios[0]
+        presentes = na_consulta[self.trigramas[np.cumsum(passos)]]
+        return np.add.reduceat(presentes, comecos, dtype=np.int64)
+    
+    def _procurar_trigramas(self, codigos_trigramas: np.ndarray, k: int) -> List[Tuple[str, str, float]]:
+        """
+        Sugestões de uma consulta, pelos códigos (distintos) dos seus trigramas: as listas
+        invertidas dos trigramas mais raros, até somarem ORCAMENTO_POSTAGENS ocorrências,
+        votam nas descrições; os MAX_CANDIDATOS mais votados são comparados pela semelhança
+        de Jaccard exata (trigramas em comum pelo índice direto)
+        """
+        total = len(codigos_trigramas)
+        posicoes = np.searchsorted(self.vocabulario, codigos_trigramas)
+        posicoes[posicoes == len(self.vocabulario)] = 0
+        presentes = posicoes[self.vocabulario[posicoes] == codigos_trigramas] if len(self.vocabulario) else posicoes[:0]
+        if not len(presentes):
+            return []
+        na_consulta = np.zeros(len(self.vocabulario), dtype=bool)
+        na_consulta[presentes] = True
+        
+        frequencias = self.inicios[presentes + 1] - self.inicios[presentes]
+        ordem = np.argsort(frequencias, kind='stable')
+        usadas = max(1, int(np.searchsorted(np.cumsum(frequencias[ordem]), ORCAMENTO_POSTAGENS, 'right')))
+        votos = np.bincount(np.concatenate([self.documentos[self.inicios[t]:self.inicios[t + 1]]
+                                            for t in presentes[ordem[:usadas]]]), minlength=len(self))
+        candidatos = np.flatnonzero(votos)
+        if len(candidatos) > MAX_CANDIDATOS:
+            candidatos = candidatos[np.argpartition(-votos[candidatos], MAX_CANDIDATOS)[:MAX_CANDIDATOS]]
+        
+        comuns = self._comuns(candidatos, na_consulta)
+        semelhancas = comuns / (total + self._trigramas_descricao[candidatos] - comuns)
+        melhores = np.argsort(-semelhancas, kind='stable')[:k]
+        return [(self.descricoes[d], self.codigos[d], float(s))
+                for d, s in zip(candidatos[melhores], semelhancas[melhores]) if s >= SEMELHANCA_MINIMA]
+    
+    def procurar(self, descricoes: Sequence[str], k: int = SUGESTOES_PADRAO) -> List[List[Tuple[str, str, float]]]:
+        """
+        Para cada descrição, até k descrições indexadas mais parecidas: (descrição, código,
+        semelhança entre 0 e 1), da mais para a menos parecida
+        """
+        normalizadas = [normalizar_descricao(d) for d in descricoes]
+        if not normalizadas or not len(self):
+            return [[] for _ in normalizadas]
+        codigos_trigramas, numeros = _trigramas(normalizadas)
+        # Trigramas distintos de cada consulta, agrupados por consulta
+        ordem = np.lexsort((codigos_trigramas, numeros))
+        codigos_trigramas, numeros = codigos_trigramas[ordem], numeros[ordem]
+        distintos = np.concatenate(([True], (numeros[1:] != numeros[:-1]) | (codigos_trigramas[1:] != codigos_trigramas[:-1])))
+        codigos_trigramas, numeros = codigos_trigramas[distintos], numeros[distintos]
+        limites = np.searchsorted(numeros, np.arange(len(normalizadas) + 1))
+        return [self._procurar_trigramas(codigos_trigramas[limites[i]:limites[i + 1]], k)
+                for i in range(len(normalizadas))]
+    
+    def marcar_colunas(self, df: pd.DataFrame, coluna_descricao: str, k: int = SUGESTOES_PADRAO) -> pd.DataFrame:
+        """
+        Acrescenta ao resultado de processar_planilha, para as linhas não convertidas, as colunas
+        'Semelhante i', 'Código Semelhante i' e 'Semelhança i' (i = 1..k). Cada descrição
+        não convertida distinta é procurada uma única vez.
+        """
+        codigos = df['Referência YOFC']
+        if not isinstance(codigos.dtype, pd.CategoricalDtype):
+            codigos = codigos.astype(str).astype('category')
+        categorias_falha = codigos.cat.categories.astype(str).str.startswith(PREFIXO_FALHA)
+        codigos_linha = codigos.cat.codes.to_numpy()
+        falhas = np.flatnonzero((codigos_linha >= 0) & categorias_falha[np.maximum(codigos_linha, 0)])
+        
+        indices, unicas = pd.factorize(df[coluna_descricao].iloc[falhas].astype(str).map(normalizar_descricao))
+        sugestoes = self.procurar(list(unicas), k)
+        # Sugestão de cada linha pela descrição única (-1 nas linhas convertidas)
+        linhas = np.full(len(df), -1, dtype=np.int64)
+        linhas[falhas] = indices
+        for i in range(1, k + 1):
+            semelhantes = [s[i - 1] if len(s) >= i else (None, None, np.nan) for s in sugestoes]
+            descricoes, codigos_semelhantes, semelhancas = (list(c) for c in zip(*semelhantes)) if semelhantes else ([], [], [])
+            df[f'Semelhante {i}'] = pd.Categorical(descricoes).take(linhas, allow_fill=True)
+            df[f'Código Semelhante {i}'] = pd.Categorical(codigos_semelhantes).take(linhas, allow_fill=True)
+            # NaN no fim: a posição -1 das linhas convertidas
+            df[f'Semelhança {i}'] = np.append(np.round(np.array(semelhancas, dtype=float), 3), np.nan)[linhas]
+        return df
+
+
+def colunas_semelhanca(k: int = SUGESTOES_PADRAO) -> List[str]:
+    """Nomes das colunas acrescentadas por IndiceSemelhanca.marcar_colunas"""
+    return [nome for i in range(1, k + 1) for nome in (f'Semelhante {i}', f'Código Semelhante {i}', f'Semelhança {i}')]
+
+
+def pares_convertidos(df: pd.DataFrame, coluna_descricao: str) -> List[Tuple[str, str]]:
+    """Pares (descrição, código) das linhas convertidas de um resultado de processar_planilha"""
+    codigos = df[COLUNA_CODIGO].astype(str)
+    convertidas = ~codigos.str.startswith(PREFIXO_FALHA) & df[coluna_descricao].notna()
+    return list(zip(df[coluna_descricao][convertidas].astype(str), codigos[convertidas]))
+
+
+def ler_corpus(origem, coluna_descricao: Optional[str] = None, formato: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Pares (descrição, código) de uma conversão anterior gravada (Excel, CSV, Parquet ou Arrow),
+    com a coluna 'Referência YOFC' e a coluna de descrições indicada ou, na falta dela, a
+    primeira cujo cabeçalho indique uma descrição ('Descrição', 'Especificação'...)
+    """
+    df = ler_tabela(origem, formato or formato_arquivo(origem))
+    if coluna_descricao not in df.columns:
+        coluna_descricao = next((c for c in df.columns if _normalizar_cabecalho(c).startswith(CABECALHOS_DESCRICAO)),
+                                None)
+    if COLUNA_CODIGO not in df.columns or coluna_descricao is None:
+        raise ValueError(f"corpus sem as colunas de descrição e '{COLUNA_CODIGO}': {origem}")
+    return pares_convertidos(df, coluna_descricao)
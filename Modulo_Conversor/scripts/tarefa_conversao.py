@@ -0,0 +1,213 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Conversão em Segundo Plano
+Converte uma tabela em blocos numa thread própria, com progresso, resultados
+parciais e cancelamento entre blocos (usada pela interface web)
+"""
+
+import copy
+import time
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from conversor_poliron import ConversorPoliron, ResultadoConversao
+from cache_conversao import CacheConversao
+
+# Descrições únicas convertidas por bloco: o progresso e o cancelamento atualizam-se a cada bloco
+TAMANHO_BLOCO = 5000
+
+
+class TarefaConversao:
+    """
+    Conversão de uma tabela numa thread própria, pelas etapas de processar_planilha:
+    a coluna é fatorada uma vez, as descrições únicas são convertidas em blocos de
+    `tamanho_bloco` e as colunas de resultado são montadas no fim (o resultado é
+    idêntico ao de processar_planilha sobre a tabela inteira).
+    Como as únicas seguem a ordem da primeira ocorrência, cada bloco completa as linhas
+    cujas descrições já foram todas convertidas: é esse o progresso, em linhas.
+    Sem `df`, a tabela é lida na própria thread com `ler()`, que retorna (tabela, segundos
+    de leitura): a leitura de um ficheiro grande não prende a sessão que pediu a conversão.
+    Estados: 'em_curso', 'concluida', 'cancelada' ou 'erro'; fases de uma tarefa em curso:
+    'leitura' e 'conversao'.
+    """
+    
+    def __init__(self, conversor: ConversorPoliron, df: Optional[pd.DataFrame], coluna_descricao: str,
+                 arquivo_cache: Optional[str] = None, medir_perfil: bool = False,
+                 tamanho_bloco: int = TAMANHO_BLOCO,
+                 ler: Optional[Callable[[], Tuple[pd.DataFrame, float]]] = None, etapa_leitura: str = 'leitura'):
+        # Cópia rasa: partilha as regras compiladas, mas as estatísticas ficam nesta tarefa
+        self.conversor = copy.copy(conversor)
+        self.perfil = self.conversor.ativar_perfil() if medir_perfil else None
+        # Resultados parciais montados pelo conversor original, fora do perfil da tarefa
+        self._conversor_parcial = conversor
+        self.df = df
+        self.coluna_descricao = coluna_descricao
+        self.arquivo_cache = arquivo_cache
+        self.tamanho_bloco = tamanho_bloco
+        self._ler = ler
+        self._etapa_leitura = etapa_leitura
+        
+        self.total = len(df) if df is not None else 0
+        self.linhas_feitas = 0
+        self.estado = 'em_curso'
+        self.fase = 'leitura' if df is None else 'conversao'
+        self.erro: Optional[BaseException] = None
+        self.inicio = time.perf_counter()
+        self.fim: Optional[float] = None
+        
+        self.estatisticas_dedup: Dict = {}
+        self.estatisticas_cache: Optional[Dict] = None
+        self.estatisticas_perfil: Optional[Dict] = None
+        
+        self._indices: Optional[np.ndarray] = None
+        self._resultados_unicos: List[ResultadoConversao] = []
+        self._resultado: Optional[pd.DataFrame] = None
+        self._cancelar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="tarefa-conversao", daemon=True)
+    
+    def iniciar(self) -> 'TarefaConversao':
+        self._thread.start()
+        return self
+    
+    def cancelar(self):
+        """Pede o cancelamento; a tarefa para no fim do bloco em curso"""
+        self._cancelar.set()
+    
+    @property
+    def cancelamento_pedido(self) -> bool:
+        return self._cancelar.is_set()
+    
+    @property
+    def segundos(self) -> float:
+        return (self.fim or time.perf_counter()) - self.inicio
+    
+    @property
+    def fracao(self) -> float:
+        if self.fase == 'leitura':
+            return 0.0
+        return self.linhas_feitas / self.total if self.total else 1.0
+    
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.linhas_feitas / max(self.segundos, 1e-9)
+    
+    @property
+    def segundos_restantes(self) -> Optional[float]:
+        """Estimativa pelo ritmo até agora (None antes do primeiro bloco)"""
+        if not self.linhas_feitas:
+            return None
+        return (self.total - self.linhas_feitas) / self.linhas_por_segundo
+    
+    def parcial(self, ultimas: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Linhas já convertidas, com as colunas de resultado (None antes do primeiro bloco)
+        Com `ultimas`, só as últimas dessas linhas (para mostrar enquanto a conversão decorre)
+        """
+        if self._resultado is not None:
+            return self._resultado if ultimas is None else self._resultado.tail(ultimas)
+        resultados = self._resultados_unicos[:]
+        if not resultados:
+            return None
+        posicoes = np.flatnonzero(self._indices < len(resultados))
+        if ultimas is not None:
+            posicoes = posicoes[-ultimas:]
+        return self._conversor_parcial.montar_colunas(self.df.iloc[posicoes].copy(), self._indices[posicoes],
+                                                      resultados, detalhes=True)
+    
+    def resultado(self) -> pd.DataFrame:
+        """Tabela convertida completa (só depois de concluída)"""
+        return self._resultado
+    
+    def _executar(self):
+        conversor = self.conversor
+        cache = CacheConversao(self.arquivo_cache, conversor.versao_regras) if self.arquivo_cache else None
+        try:
+            if self.df is None:
+                df, segundos_leitura = self._ler()
+                if self.perfil is not None:
+                    self.perfil.registrar_etapa(self._etapa_leitura, segundos_leitura)
+                self.total = len(df)
+                self.df = df
+                self.fase = 'conversao'
+            
+            indices, unicas = conversor.fatorar_descricoes(self.df[self.coluna_descricao])
+            # Linhas completas depois de convertidas as k primeiras únicas: linhas_completas[k - 1]
+            linhas_completas = np.bincount(indices, minlength=len(unicas)).cumsum()
+            self._indices = indices
+            
+            for inicio in range(0, len(unicas), self.tamanho_bloco):
+                if self._cancelar.is_set():
+                    self.estado = 'cancelada'
+                    return
+                bloco = unicas[inicio:inicio + self.tamanho_bloco]
+                self._resultados_unicos.extend(conversor.converter_descricoes_unicas(bloco, cache=cache))
+                self.linhas_feitas = int(linhas_completas[inicio + len(bloco) - 1])
+            
+            resultado = conversor.montar_colunas(self.df.copy(), indices, self._resultados_unicos, detalhes=True)
+            self.estatisticas_dedup = {
+                'linhas': self.total,
+                'descricoes_unicas': len(unicas),
+                'taxa_unicas': (len(unicas) / self.total) if self.total > 0 else 0.0,
+            }
+            if cache is not None:
+                self.estatisticas_cache = cache.estatisticas()
+            if self.perfil is not None:
+                self.estatisticas_perfil = self.perfil.para_dict()
+            self._resultado = resultado
+            self.estado = 'concluida'
+        except Exception as erro:
+            self.erro = erro
+            self.estado = 'erro'
+        finally:
+            self.fim = time.perf_counter()
+            if cache is not None:
+                cache.fechar()
+
+
+class RegistoTarefas:
+    """
+    Tarefas de conversão por chave (ex: hash do ficheiro, coluna e opções), partilhadas entre
+    sessões: pedir de novo a mesma conversão acompanha a tarefa já em curso ou concluída.
+    Guarda no máximo `maximo` tarefas; as terminadas mais antigas são descartadas primeiro.
+    """
+    
+    def __init__(self, maximo: int = 8):
+        self.maximo = maximo
+        self._tarefas: Dict[Hashable, TarefaConversao] = {}
+        self._lock = threading.Lock()
+    
+    def obter(self, chave: Hashable) -> Optional[TarefaConversao]:
+        return self._tarefas.get(chave)
+    
+    def _ativa(self, chave: Hashable) -> Optional[TarefaConversao]:
+        tarefa = self._tarefas.get(chave)
+        return tarefa if tarefa is not None and tarefa.estado in ('em_curso', 'concluida') else None
+    
+    def iniciar(self, chave: Hashable, criar: Callable[[], TarefaConversao]) -> TarefaConversao:
+        """
+        Tarefa em curso ou concluída da chave; sem ela (ou após cancelamento/erro), cria e inicia
+        uma nova. `criar` corre fora do lock (o registo é partilhado por todas as sessões): se
+        outra sessão registar a mesma chave entretanto, fica a dela e a nova é descartada
+        """
+        with self._lock:
+            tarefa = self._ativa(chave)
+        if tarefa is not None:
+            return tarefa
+        
+        nova = criar()
+        with self._lock:
+            tarefa = self._ativa(chave)
+            if tarefa is not None:
+                return tarefa
+            self._tarefas.pop(chave, None)
+            
+            terminadas = [c for c, t in self._tarefas.items() if t.estado != 'em_curso']
+            for antiga in terminadas[:max(0, len(self._tarefas) + 1 - self.maximo)]:
+                del self._tarefas[antiga]
+            
+            self._tarefas[chave] = nova
+        return nova.iniciar()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3.11
+# -*- coding: utf-8 -*-
+"""
+Módulo Conversor Poliron - Serviço HTTP
+Serviço local de conversão para o ERP e outras ferramentas: mantém os conversores
+carregados (e um pool de processos aquecido) e responde a lotes JSON ou a planilhas
+"""
+
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from io import BytesIO
+from pathlib import Path
+from collections import deque, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+# Adicionar diretório de scripts ao path
+sys.path.insert(0, str(Path(__file__).parent / "scripts"))
+
+from conversor_poliron import ConversorPoliron, criar_pool, motivo_falha
+from cache_conversao import CacheConversao
+from formatos_tabela import FORMATOS, TIPOS_MIME, formato_arquivo, ler_tabela, gravar_tabela
+
+COLUNA_PADRAO = 'Descrição'
+
+# Amostras de latência guardadas para os percentis de /metricas
+AMOSTRAS_LATENCIA = 2000
+
+# A partir deste número de descrições por lote, o serviço converte no pool de processos
+# (MIN_DESCRICOES_PARALELO serve a linha de comando, em que criar o pool custa segundos;
+# aqui o pool já está aquecido e um lote de 64 custa o mesmo no pool ou neste processo)
+MIN_DESCRICOES_POOL = 64
+
+
+class AgrupadorPedidos:
+    """
+    Junta as descrições de pedidos simultâneos numa única conversão.
+    O primeiro pedido de um lote espera no máximo `janela` segundos por outros (ou até o
+    lote chegar a `tamanho_maximo` descrições); as descrições repetidas entre pedidos
+    são então convertidas uma só vez e cada pedido recebe a sua parte dos resultados.
+    Até `conversoes` lotes são convertidos ao mesmo tempo, cada um na sua thread:
+    um lote grande não atrasa os lotes que chegam depois dele.
+    """
+    
+    def __init__(self, converter: Callable[[List[str]], List[Dict]], janela: float, tamanho_maximo: int,
+                 conversoes: int = 1):
+        self._converter = converter
+        self.janela = janela
+        self.tamanho_maximo = tamanho_maximo
+        
+        self.lotes = 0
+        self.pedidos_agrupados = 0
+        
+        self._conversoes = ThreadPoolExecutor(max_workers=conversoes, thread_name_prefix="conversao")
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._executar, name="agrupador", daemon=True)
+        self._thread.start()
+    
+    def converter(self, descricoes: List[str]) -> List[Dict]:
+        """Converte as descrições de um pedido (bloqueia até o lote dele ser convertido)"""
+        futuro = Future()
+        self._fila.put((descricoes, futuro))
+        return futuro.result()
+    
+    def _executar(self):
+        while True:
+            primeiro = self._fila.get()
+            if primeiro is None:
+                return
+            pedidos = [primeiro]
+            total = len(primeiro[0])
+            
+            # Recolher os pedidos que chegarem durante a janela
+            limite = time.monotonic() + self.janela
+            while total < self.tamanho_maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    pedido = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if pedido is None:
+                    self._fila.put(None)
+                    break
+                pedidos.append(pedido)
+                total += len(pedido[0])
+            
+            self.lotes += 1
+            self.pedidos_agrupados += len(pedidos)
+            self._conversoes.submit(self._converter_lote, pedidos)
+    
+    def _converter_lote(self, pedidos):
+        """Converte um lote (numa thread de conversão) e entrega a cada pedido a sua parte"""
+        try:
+            resultados = self._converter([d for descricoes, _ in pedidos for d in descricoes])
+        except Exception as erro:
+            for _, futuro in pedidos:
+                futuro.set_exception(erro)
+            return
+        
+        inicio = 0
+        for descricoes, futuro in pedidos:
+            futuro.set_result(resultados[inicio:inicio + len(descricoes)])
+            inicio += len(descricoes)
+    
+    def encerrar(self):
+        self._fila.put(None)
+        self._thread.join()
+        self._conversoes.shutdown()
+
+
+class MetricasServico:
+    """Contadores e latências do serviço, expostos em /metricas"""
+    
+    def __init__(self):
+        self.inicio = time.time()
+        self._lock = threading.Lock()
+        self.pedidos = defaultdict(int)          # rota -> pedidos atendidos
+        self.descricoes = 0
+        self.convertidas = 0
+        self.erros = 0
+        self.rejeitados = 0                      # recusados pelo limite de concorrência
+        self.em_curso = 0
+        self._latencias = deque(maxlen=AMOSTRAS_LATENCIA)
+    
+    def registrar(self, rota: str, segundos: float, descricoes: int = 0, convertidas: int = 0):
+        with self._lock:
+            self.pedidos[rota] += 1
+            self.descricoes += descricoes
+            self.convertidas += convertidas
+            self._latencias.append(segundos)
+    
+    def contar(self, contador: str, valor: int = 1):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + valor)
+    
+    def para_dict(self) -> Dict:
+        with self._lock:
+            latencias = sorted(self._latencias)
+            dados = {
+                'segundos_ativo': round(time.time() - self.inicio, 1),
+                'pedidos': dict(self.pedidos),
+                'descricoes': self.descricoes,
+                'convertidas': self.convertidas,
+                'erros': self.erros,
+                'rejeitados': self.rejeitados,
+                'em_curso': self.em_curso,
+            }
+        if latencias:
+            dados['latencia_ms'] = {
+                f'p{p}': round(latencias[min(len(latencias) - 1, len(latencias) * p // 100)] * 1e3, 2)
+                for p in (50, 90, 99)
+            }
+            dados['latencia_ms']['max'] = round(latencias[-1] * 1e3, 2)
+        return dados
+
+
+class ServicoConversor:
+    """
+    Estado partilhado pelos pedidos: conversor carregado, pool de processos aquecido,
+    cache opcional, agrupador de pedidos e limite de pedidos em curso
+    Com workers > 1, cada lote com pelo menos `min_pool` descrições é convertido no pool,
+    dividido em partes; os lotes são convertidos em paralelo (um por worker, no mínimo dois:
+    sem pool, um lote pequeno alterna com um grande em vez de esperar que ele termine).
+    """
+    
+    def __init__(self, workers: int = 1, max_pedidos: int = 8, espera_maxima: float = 10.0,
+                 janela: float = 0.005, tamanho_lote: int = 50_000, arquivo_cache: Optional[str] = None,
+                 config_dir: Optional[str] = None, min_pool: int = MIN_DESCRICOES_POOL):
+        self.conversor = ConversorPoliron(config_dir)
+        self.workers = workers
+        self.min_pool = min_pool
+        self.espera_maxima = espera_maxima
+        self.cache = CacheConversao(arquivo_cache, self.conversor.versao_regras) if arquivo_cache else None
+        
+        # Pool criado uma vez e aquecido: cada processo já tem o seu conversor carregado
+        self.pool = None
+        if workers > 1:
+            self.pool = criar_pool(workers, config_dir)
+            for futuro in [self.pool.submit(time.sleep, 0.05) for _ in range(workers)]:
+                futuro.result()
+        
+        self.limite = threading.BoundedSemaphore(max_pedidos)
+        self.max_pedidos = max_pedidos
+        self.metricas = MetricasServico()
+        self.agrupador = AgrupadorPedidos(self.converter_descricoes, janela, tamanho_lote, conversoes=max(workers, 2))
+    
+    def processar(self, df: pd.DataFrame, coluna: str) -> pd.DataFrame:
+        """processar_planilha com o pool e o cache do serviço"""
+        return self.conversor.processar_planilha(df, coluna, workers=self.workers, cache=self.cache,
+                                                 detalhes=True, executor=self.pool, min_paralelo=self.min_pool)
+    
+    def converter_descricoes(self, descricoes: List[str]) -> List[Dict]:
+        """Converte uma lista de descrições: código, tipo de cabo e estado de cada uma"""
+        df = self.processar(pd.DataFrame({COLUNA_PADRAO: pd.Series(descricoes, dtype=object)}), COLUNA_PADRAO)
+        resultados = []
+        for descricao, codigo, tipo in zip(descricoes, df['Referência YOFC'].tolist(), df['Tipo de Cabo'].tolist()):
+            motivo = motivo_falha(codigo)
+            resultados.append({
+                'descricao': descricao,
+                'codigo': codigo,
+                'tipo': tipo,
+                'convertido': motivo is None,
+                'motivo': motivo,
+            })
+        return resultados
+    
+    def saude(self) -> Dict:
+        return {
+            'estado': 'ok',
+            'versao_regras': self.conversor.versao_regras,
+            'workers': self.workers,
+            'max_pedidos': self.max_pedidos,
+            'em_curso': self.metricas.em_curso,
+        }
+    
+    def estatisticas(self) -> Dict:
+        dados = self.metricas.para_dict()
+        dados['agrupamento'] = {
+            'lotes': self.agrupador.lotes,
+            'pedidos_agrupados': self.agrupador.pedidos_agrupados,
+            'pedidos_por_lote': round(self.agrupador.pedidos_agrupados / self.agrupador.lotes, 2)
+                                if self.agrupador.lotes else 0.0,
+        }
+        if self.cache is not None:
+            dados['cache'] = self.cache.estatisticas()
+        return dados
+    
+    def encerrar(self):
+        self.agrupador.encerrar()
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.cache is not None:
+            self.cache.fechar()
+
+
+class ErroPedido(Exception):
+    """Erro do cliente (corpo inválido, formato ou coluna inexistente), respondido com o código dado"""
+    
+    def __init__(self, mensagem: str, codigo_http: int = 400):
+        super().__init__(mensagem)
+        self.codigo_http = codigo_http
+
+
+class ManipuladorPedidos(BaseHTTPRequestHandler):
+    """
+    Rotas:
+    - POST /converter            {"descricoes": [...]} -> {"resultados": [{descricao, codigo, tipo, convertido, motivo}]}
+    - POST /converter/planilha   corpo = ficheiro (?formato=csv ou ?nome=dados.xlsx; ?coluna=Descrição)
+                                 -> a mesma tabela, no mesmo formato, com o código e as colunas de detalhe
+    - GET  /saude                estado e versão das regras
+    - GET  /metricas             contadores, latências, agrupamento e cache
+    """
+    
+    protocol_version = "HTTP/1.1"
+    server_version = "ConversorPoliron/1.0"
+    
+    @property
+    def servico(self) -> ServicoConversor:
+        return self.server.servico
+    
+    def log_message(self, formato, *args):
+        if self.server.registar_pedidos:
+            super().log_message(formato, *args)
+    
+    def do_GET(self):
+        rota = urlparse(self.path).path.rstrip('/')
+        if rota == '/saude':
+            self._responder_json(200, self.servico.saude())
+        elif rota == '/metricas':
+            self._responder_json(200, self.servico.estatisticas())
+        else:
+            self._responder_json(404, {'erro': f"Rota não encontrada: {rota}"})
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        rota = url.path.rstrip('/')
+        if rota not in ('/converter', '/converter/planilha'):
+            self._descartar_corpo()
+            self._responder_json(404, {'erro': f"Rota não encontrada: {rota}"})
+            return
+        
+        # Limite de pedidos em curso: espera até espera_maxima e depois recusa com 503
+        metricas = self.servico.metricas
+        if not self.servico.limite.acquire(timeout=self.servico.espera_maxima):
+            metricas.contar('rejeitados')
+            self._descartar_corpo()
+            self._responder_json(503, {'erro': "Serviço ocupado, tente novamente"}, {'Retry-After': '1'})
+            return
+        
+        metricas.contar('em_curso')
+        inicio = time.perf_counter()
+        try:
+            if rota == '/converter':
+                self._converter_json(inicio)
+            else:
+                self._converter_planilha(parse_qs(url.query), inicio)
+        except ErroPedido as erro:
+            metricas.contar('erros')
+            self._responder_json(erro.codigo_http, {'erro': str(erro)})
+        except Exception as erro:
+            metricas.contar('erros')
+            self._responder_json(500, {'erro': f"{type(erro).__name__}: {erro}"})
+        finally:
+            metricas.contar('em_curso', -1)
+            self.servico.limite.release()
+    
+    def _converter_json(self, inicio: float):
+        try:
+            corpo = json.loads(self._ler_corpo() or b'null')
+        except ValueError as erro:
+            raise ErroPedido(f"JSON inválido: {erro}")
+        descricoes = corpo.get('descricoes') if isinstance(corpo, dict) else corpo
+        if not isinstance(descricoes, list):
+            raise ErroPedido('Envie {"descricoes": ["...", ...]} ou uma lista de descrições')
+        descricoes = ['' if d is None else str(d) for d in descricoes]
+        
+        resultados = self.servico.agrupador.converter(descricoes) if descricoes else []
+        segundos = time.perf_counter() - inicio
+        convertidas = sum(r['convertido'] for r in resultados)
+        self.servico.metricas.registrar('/converter', segundos, len(resultados), convertidas)
+        self._responder_json(200, {
+            'resultados': resultados,
+            'convertidas': convertidas,
+            'falhas': len(resultados) - convertidas,
+            'versao_regras': self.servico.conversor.versao_regras,
+            'segundos': round(segundos, 4),
+        })
+    
+    def _converter_planilha(self, parametros: Dict[str, List[str]], inicio: float):
+        formato = self._formato_planilha(parametros)
+        coluna = parametros.get('coluna', [COLUNA_PADRAO])[0]
+        conteudo = self._ler_corpo()
+        if not conteudo:
+            raise ErroPedido("Corpo vazio: envie o conteúdo da planilha")
+        try:
+            df = ler_tabela(conteudo, formato)
+        except Exception as erro:
+            raise ErroPedido(f"Não foi possível ler a planilha ({formato}): {erro}")
+        if coluna not in df.columns:
+            raise ErroPedido(f"Coluna '{coluna}' não encontrada (colunas: {', '.join(map(str, df.columns))})")
+        
+        df_resultado = self.servico.processar(df, coluna)
+        saida = BytesIO()
+        gravar_tabela(df_resultado, saida, formato)
+        
+        segundos = time.perf_counter() - inicio
+        convertidas = int(df_resultado['Convertido'].sum())
+        self.servico.metricas.registrar('/converter/planilha', segundos, len(df_resultado), convertidas)
+        self._responder(200, saida.getbuffer(), TIPOS_MIME[formato], {
+            'X-Linhas': str(len(df_resultado)),
+            'X-Convertidas': str(convertidas),
+            'X-Versao-Regras': self.servico.conversor.versao_regras,
+        })
+    
+    def _formato_planilha(self, parametros: Dict[str, List[str]]) -> str:
+        """Formato pelo parâmetro 'formato' (ou extensão), pela extensão do parâmetro 'nome' ou pelo Content-Type"""
+        if 'formato' in parametros:
+            formato = parametros['formato'][0].lower()
+            formato = FORMATOS.get(f'.{formato}', formato)  # aceita também a extensão (xlsx, feather...)
+            if formato not in TIPOS_MIME:
+                raise ErroPedido(f"Formato não suportado: '{formato}' (use {', '.join(TIPOS_MIME)})")
+            return formato
+        if 'nome' in parametros:
+            try:
+                return formato_arquivo(parametros['nome'][0])
+            except ValueError as erro:
+                raise ErroPedido(str(erro))
+        tipo = (self.headers.get('Content-Type') or '').split(';')[0].strip()
+        for formato, mime in TIPOS_MIME.items():
+            if tipo == mime:
+                return formato
+        raise ErroPedido("Indique o formato da planilha (?formato=csv ou ?nome=dados.xlsx)")
+    
+    def _ler_corpo(self) -> bytes:
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if tamanho > self.server.tamanho_maximo:
+            self.close_connection = True
+            raise ErroPedido(f"Corpo com {tamanho:,} bytes acima do limite de "
+                             f"{self.server.tamanho_maximo:,}", 413)
+        return self.rfile.read(tamanho)
+    
+    def _descartar_corpo(self):
+        """Consome o corpo não lido, para a ligação (keep-alive) continuar utilizável"""
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if tamanho > self.server.tamanho_maximo:
+            self.close_connection = True
+        elif tamanho:
+            self.rfile.read(tamanho)
+    
+    def _responder_json(self, codigo: int, dados: Dict, cabecalhos: Optional[Dict[str, str]] = None):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self._responder(codigo, corpo, "application/json; charset=utf-8", cabecalhos)
+    
+    def _responder(self, codigo: int, corpo, tipo: str, cabecalhos: Optional[Dict[str, str]] = None):
+        self.send_response(codigo)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+class ServidorConversor(ThreadingHTTPServer):
+    """Servidor HTTP com uma thread por ligação e o ServicoConversor partilhado"""
+    
+    daemon_threads = True
+    request_queue_size = 128
+    
+    def __init__(self, endereco, servico: ServicoConversor, tamanho_maximo: int, registar_pedidos: bool = False):
+        super().__init__(endereco, ManipuladorPedidos)
+        self.servico = servico
+        self.tamanho_maximo = tamanho_maximo
+        self.registar_pedidos = registar_pedidos
+
+
+def main():
+    """Inicia o serviço HTTP"""
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de conversão de especificações de cabos")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Endereço de escuta (padrão: 127.0.0.1, só a própria máquina)")
+    parser.add_argument("--porta", type=int, default=8502,
+                        help="Porta de escuta (padrão: 8502)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos do pool de conversão, criados e aquecidos no arranque (padrão: 1)")
+    parser.add_argument("--max-pedidos", type=int, default=8,
+                        help="Pedidos de conversão em curso ao mesmo tempo; os restantes esperam (padrão: 8)")
+    parser.add_argument("--espera-maxima", type=float, default=10.0,
+                        help="Segundos que um pedido espera por vaga antes de receber 503 (padrão: 10)")
+    parser.add_argument("--janela-ms", type=float, default=5.0,
+                        help="Milissegundos que um pedido JSON espera por outros para serem convertidos "
+                             "juntos (padrão: 5; 0 desliga o agrupamento)")
+    parser.add_argument("--tamanho-lote", type=int, default=50_000,
+                        help="Descrições por lote agrupado (padrão: 50000)")
+    parser.add_argument("--tamanho-maximo-mb", type=float, default=200.0,
+                        help="Tamanho máximo do corpo de um pedido, em MB (padrão: 200)")
+    parser.add_argument("--cache", metavar="ARQUIVO",
+                        help="Cache SQLite de conversões, partilhado por todos os pedidos")
+    parser.add_argument("--registar-pedidos", action="store_true",
+                        help="Mostra cada pedido no terminal")
+    args = parser.parse_args()
+    
+    inicio = time.perf_counter()
+    servico = ServicoConversor(workers=args.workers, max_pedidos=args.max_pedidos,
+                               espera_maxima=args.espera_maxima, janela=args.janela_ms / 1000,
+                               tamanho_lote=args.tamanho_lote, arquivo_cache=args.cache)
+    servidor = ServidorConversor((args.host, args.porta), servico, int(args.tamanho_maximo_mb * 1024 * 1024),
+                                 args.registar_pedidos)
+    print(f"⚡ Serviço pronto em {time.perf_counter() - inicio:.2f}s: http://{args.host}:{args.porta} "
+          f"({args.workers} worker(s), até {args.max_pedidos} pedidos em curso, "
+          f"regras {servico.conversor.versao_regras})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 A encerrar...")
+    finally:
+        servidor.server_close()
+        servico.encerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do Módulo Conversor Poliron
+Os scripts são importados como na interface web e no serviço (pasta scripts no sys.path)
+"""
+
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).parent.parent
+sys.path.insert(0, str(RAIZ / "scripts"))
+sys.path.insert(0, str(RAIZ))
+
+from conversor_poliron import ConversorPoliron
+
+DADOS = Path(__file__).parent / "dados"
+
+
+@pytest.fixture(scope="session")
+def conversor() -> ConversorPoliron:
+    return ConversorPoliron()
+
+
+@pytest.fixture(scope="session")
+def referencia():
+    """
+    Pares [descrição, código] gerados pelo conversor original, uma chamada por descrição
+    (descrições do gerador do benchmark e casos limite): todos os modos devem reproduzi-los
+    """
+    with open(DADOS / "referencia_conversao.json", encoding='utf-8') as f:
+        return [tuple(par) for par in json.load(f)]
+
+
+@pytest.fixture(scope="session")
+def descricoes(referencia):
+    return [descricao for descricao, _ in referencia]
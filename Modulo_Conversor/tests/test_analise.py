@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""analisar: a descrição analisada uma única vez e partilhada pelos conversores"""
+
+import pytest
+
+
+@pytest.mark.parametrize("descricao, esperado", [
+    ("CABO VFD - 3Cx4mm2+3Cx4mm2", ('3Cx4mm2+3Cx4mm2', 'vfd', 3, None, '4', 3, '4')),
+    ("CABO VFD 3Cx 4mm2 + 1cx 4MM2", ('3Cx 4mm2 + 1cx 4MM2', 'vfd', 3, None, '4', 1, '4')),
+    ("INSTRUMENTACAO - 12Px1,5mm2", ('12Px1,5mm2', 'pares', 12, 'P', '1.5', None, None)),
+    ("instrumentacao - 4tx0,5mm2", ('4tx0,5mm2', 'ternas', 4, 'T', '0.5', None, None)),
+    ("INSTRUMENTACAO 2Qx1mm2", ('2Qx1mm2', 'quadras', 2, 'Q', '1', None, None)),
+    ("CONTROLE 7Cx2,5MM2", ('7Cx2,5MM2', 'condutores', 7, None, '2.5', None, None)),
+    ("INSTRUMENTACAO - 4x2x1,5mm2", ('4x2x1,5mm2', 'multipares', None, None, None, None, None)),
+    ("CABO DE BAIXA TENSAO - 70mm2", (None, None, None, None, None, None, None)),
+])
+def test_grupos_da_formacao(conversor, descricao, esperado):
+    analise = conversor.analisar(descricao)
+    assert (analise.formacao, analise.padrao_formacao, analise.qtd, analise.elemento,
+            analise.secao, analise.qtd2, analise.secao2) == esperado
+    assert analise.texto_upper == descricao.upper()
+
+
+def test_formacao_e_palavras_iguais_as_funcoes_separadas(conversor, descricoes):
+    for descricao in descricoes:
+        analise = conversor.analisar(descricao)
+        assert analise.formacao == conversor.extrair_formacao(descricao)
+        assert analise.palavras == conversor.detectar_palavras(descricao)
+
+
+def test_mesma_analise_para_dois_conversores(conversor, referencia):
+    # converter_analise não altera a análise: a mesma serve a várias conversões
+    for descricao, codigo in referencia[:300]:
+        analise = conversor.analisar(descricao)
+        assert conversor.converter_analise(analise).codigo == codigo
+        assert conversor.converter_analise(analise).codigo == codigo
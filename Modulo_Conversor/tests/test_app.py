@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Interface web (app.py) com o AppTest do Streamlit: o ficheiro carregado vem de um caminho"""
+
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+APP = Path(__file__).parent.parent / "app.py"
+
+
+def _script(caminho, app):
+    """Corre o app.py com o file_uploader a devolver o ficheiro indicado"""
+    import io
+    import os
+    import runpy
+    import streamlit as st
+    
+    def carregar(rotulo, *args, **kwargs):
+        if 'Catálogo' in rotulo:
+            return None
+        arquivo = io.BytesIO(open(caminho, 'rb').read())
+        arquivo.name = os.path.basename(caminho)
+        return arquivo
+    
+    st.file_uploader = carregar
+    runpy.run_path(app, run_name='__main__')
+
+
+def abrir(caminho) -> AppTest:
+    at = AppTest.from_function(_script, args=(str(caminho), str(APP)), default_timeout=60).run()
+    # O cache em disco da interface fica fora dos testes
+    [c for c in at.checkbox if 'cache' in c.label][0].uncheck().run()
+    return at
+
+
+def converter(at: AppTest, limite: float = 60.0) -> AppTest:
+    [b for b in at.button if 'Converter' in b.label][0].click().run()
+    fim = time.monotonic() + limite
+    while at.get('progress') and time.monotonic() < fim:
+        time.sleep(0.1)
+        at.run()
+    assert not at.exception, [e.value for e in at.exception]
+    return at
+
+
+def resultado(at: AppTest) -> pd.DataFrame:
+    return next(d.value for d in at.dataframe if 'Referência YOFC' in d.value.columns)
+
+
+@pytest.fixture
+def planilha(tmp_path, referencia):
+    caminho = tmp_path / "especificacoes.csv"
+    pd.DataFrame({'Item': range(len(referencia)), 'Descrição': [d for d, _ in referencia]}).to_csv(
+        caminho, index=False)
+    return caminho
+
+
+def test_conversao_e_reruns_reaproveitam_o_resultado(planilha, referencia):
+    at = converter(abrir(planilha))
+    assert resultado(at)['Referência YOFC'].astype(str).tolist() == [c for _, c in referencia]
+    concluida = [s.value for s in at.success if 'Conversão concluída' in s.value]
+    assert concluida
+    
+    # Mudar uma opção provoca um rerun que mostra o resultado memorizado, sem nova conversão
+    [c for c in at.checkbox if 'detalhes' in c.label][0].check().run()
+    assert not at.get('progress')
+    assert [s.value for s in at.success if 'Conversão concluída' in s.value] == concluida
+
+
+
+
+def test_coluna_sugerida_pela_previa(tmp_path, referencia):
+    caminho = tmp_path / "sem_cabecalho_conhecido.csv"
+    pd.DataFrame({'Item': range(50), 'Texto': [d for d, _ in referencia[:50]]}).to_csv(caminho, index=False)
+    at = abrir(caminho)
+    assert at.selectbox[0].value == 'Texto'
+    
+    # A conversão lê a planilha inteira na tarefa, com a coluna escolhida
+    at = converter(at)
+    assert resultado(at)['Referência YOFC'].astype(str).tolist() == [c for _, c in referencia[:50]]
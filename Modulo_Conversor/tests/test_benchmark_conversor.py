@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Gerador de descrições e medições do benchmark"""
+
+from collections import Counter
+
+import pytest
+
+from benchmark_conversor import (RAMOS, gerar_descricoes, medir_converter_especificacao,
+                                 medir_processar_planilha)
+from conversor_poliron import motivo_falha
+
+
+def test_gerador_deterministico():
+    assert gerar_descricoes(300, semente=1) == gerar_descricoes(300, semente=1)
+    assert gerar_descricoes(300, semente=1) != gerar_descricoes(300, semente=2)
+
+
+@pytest.mark.parametrize("taxa", [0.0, 0.5, 0.9])
+def test_taxa_de_duplicadas(taxa):
+    amostra = gerar_descricoes(1000, taxa_duplicadas=taxa, semente=3)
+    assert len(amostra) == 1000
+    assert len({descricao for _, descricao in amostra}) == round(1000 * (1.0 - taxa))
+
+
+def test_ramos_distribuidos_igualmente():
+    contagem = Counter(ramo for ramo, _ in gerar_descricoes(1000, taxa_duplicadas=0.0))
+    assert set(contagem) == set(RAMOS)
+    assert max(contagem.values()) - min(contagem.values()) <= 1
+
+
+def test_cada_ramo_chega_ao_conversor_esperado(conversor):
+    # Todos os ramos convertem, exceto o das descrições não reconhecidas
+    for ramo, descricao in gerar_descricoes(500, taxa_duplicadas=0.0, semente=5):
+        convertida = motivo_falha(conversor.converter_especificacao(descricao)) is None
+        assert convertida == (ramo != 'nao_reconhecida'), descricao
+
+
+def test_medicoes(conversor):
+    amostra = gerar_descricoes(200, taxa_duplicadas=0.5)
+    especificacao = medir_converter_especificacao(conversor, amostra, repeticoes=1)
+    assert especificacao['latencia']['n'] == 200
+    assert set(especificacao['latencia_por_ramo']) == set(RAMOS)
+    assert especificacao['latencia_por_ramo']['nao_reconhecida']['taxa_convertidas'] == 0.0
+    
+    planilha = medir_processar_planilha(conversor, amostra, repeticoes=1, workers=1)
+    assert planilha['descricoes_unicas'] == 100
+    assert planilha['linhas_por_segundo'] > 0
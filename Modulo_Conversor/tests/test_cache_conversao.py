@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""CacheConversao: cache SQLite por descrição normalizada e versão das regras"""
+
+import sqlite3
+import threading
+
+import pandas as pd
+
+from cache_conversao import CacheConversao
+
+
+def _contar(cache):
+    return cache._conexao.execute("SELECT COUNT(*) FROM conversoes").fetchone()[0]
+
+
+def test_paridade_com_e_sem_cache(tmp_path, conversor, referencia):
+    df = lambda: pd.DataFrame({'Descrição': [d for d, _ in referencia]})
+    esperado = [codigo for _, codigo in referencia]
+    
+    cache = CacheConversao(tmp_path / "cache.sqlite", conversor.versao_regras)
+    primeira = conversor.processar_planilha(df(), cache=cache)
+    assert cache.acertos == 0
+    segunda = conversor.processar_planilha(df(), cache=cache)
+    assert cache.acertos == conversor.estatisticas_dedup['descricoes_unicas']
+    cache.fechar()
+    
+    assert primeira['Referência YOFC'].astype(str).tolist() == esperado
+    assert segunda['Referência YOFC'].astype(str).tolist() == esperado
+
+
+def test_outra_versao_das_regras_nao_ve_as_entradas(tmp_path):
+    CacheConversao(tmp_path / "c.sqlite", "v1").gravar_lote([("A", "COD", "ENERGIA")])
+    assert CacheConversao(tmp_path / "c.sqlite", "v2").buscar_lote(["A"]) == {}
+    assert CacheConversao(tmp_path / "c.sqlite", "v1").buscar_lote(["A"]) == {"A": ("COD", "ENERGIA")}
+
+
+def test_regravar_atualiza_sem_contar_de_novo(tmp_path):
+    cache = CacheConversao(tmp_path / "c.sqlite", "v1", tamanho_maximo=10)
+    cache.gravar_lote([("A", "1", "ENERGIA"), ("B", "2", "ENERGIA")])
+    cache.gravar_lote([("A", "3", "CONTROLE"), ("C", "4", "ENERGIA")])
+    assert cache.buscar_lote(["A", "B", "C"]) == {"A": ("3", "CONTROLE"), "B": ("2", "ENERGIA"), "C": ("4", "ENERGIA")}
+    assert cache._entradas == _contar(cache) == 3
+
+
+def test_remove_as_menos_usadas(tmp_path):
+    cache = CacheConversao(tmp_path / "c.sqlite", "v1", tamanho_maximo=3)
+    cache.gravar_lote([("A", "1", "T"), ("B", "2", "T"), ("C", "3", "T")])
+    cache.buscar_lote(["A"])
+    cache.gravar_lote([("D", "4", "T"), ("E", "5", "T")])
+    assert set(cache.buscar_lote(["A", "B", "C", "D", "E"])) == {"A", "D", "E"}
+    assert cache.estatisticas()['entradas'] == 3
+
+
+def test_limite_com_outro_processo_a_gravar(tmp_path):
+    caminho = tmp_path / "c.sqlite"
+    cache = CacheConversao(caminho, "v1", tamanho_maximo=4)
+    outro = CacheConversao(caminho, "v1", tamanho_maximo=100)
+    outro.gravar_lote([(str(i), "x", "T") for i in range(4)])
+    cache.gravar_lote([("A", "1", "T"), ("B", "2", "T")])
+    cache.gravar_lote([("C", "3", "T"), ("D", "4", "T"), ("E", "5", "T")])
+    assert _contar(cache) == 4
+    assert set(cache.buscar_lote(["C", "D", "E"])) == {"C", "D", "E"}
+
+
+def test_contadores_com_varias_threads(tmp_path):
+    cache = CacheConversao(tmp_path / "c.sqlite", "v1")
+    cache.gravar_lote([(f"D{i}", "x", "T") for i in range(50)])
+    consultas = [f"D{i}" for i in range(100)]
+    
+    def consultar():
+        for _ in range(20):
+            cache.buscar_lote(consultas)
+    
+    threads = [threading.Thread(target=consultar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['acertos'], estatisticas['falhas']) == (8 * 20 * 50, 8 * 20 * 50)
+    assert estatisticas['taxa_acertos'] == 0.5
+
+
+def test_ficheiro_antigo_sem_tipo(tmp_path):
+    caminho = tmp_path / "c.sqlite"
+    conexao = sqlite3.connect(caminho)
+    conexao.execute("CREATE TABLE conversoes (versao TEXT NOT NULL, descricao TEXT NOT NULL, codigo TEXT NOT NULL, "
+                    "ultimo_uso INTEGER NOT NULL, PRIMARY KEY (versao, descricao))")
+    conexao.execute("INSERT INTO conversoes VALUES ('v1', 'A', 'COD', 7)")
+    conexao.commit()
+    conexao.close()
+    
+    cache = CacheConversao(caminho, "v1")
+    assert cache.buscar_lote(["A"]) == {}
+    cache.gravar_lote([("A", "COD", "ENERGIA")])
+    assert cache.buscar_lote(["A"]) == {"A": ("COD", "ENERGIA")}
+    assert cache._relogio > 7
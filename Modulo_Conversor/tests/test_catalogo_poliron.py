@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Catálogo Poliron: índice em disco, pesquisa exata, sugestões e reconstrução do índice"""
+
+import bisect
+import os
+
+import pandas as pd
+import pytest
+
+import catalogo_poliron
+from catalogo_poliron import VIZINHOS_SUGESTAO, CatalogoPoliron, _semelhanca, normalizar_codigo
+from conversor_poliron import PREFIXO_FALHA
+
+
+@pytest.fixture(scope="module")
+def codigos_validos(referencia):
+    return sorted({c for _, c in referencia if not c.startswith(PREFIXO_FALHA)})
+
+
+@pytest.fixture
+def arquivo_catalogo(tmp_path, codigos_validos):
+    # Metade dos códigos gerados: a outra metade fica fora do catálogo
+    caminho = tmp_path / "catalogo.csv"
+    pd.DataFrame({'Descrição': 'x', 'Código': codigos_validos[::2]}).to_csv(caminho, index=False)
+    return caminho
+
+
+def test_pesquisa_exata_igual_a_um_conjunto(arquivo_catalogo, codigos_validos):
+    catalogo = CatalogoPoliron.carregar(arquivo_catalogo)
+    no_catalogo = set(codigos_validos[::2])
+    assert len(catalogo) == len(no_catalogo)
+    for codigo in codigos_validos:
+        assert catalogo.contem(codigo) == (codigo in no_catalogo)
+    # A pesquisa ignora maiúsculas e espaços repetidos
+    assert catalogo.contem("  " + codigos_validos[0].lower().replace(" ", "   "))
+
+
+def test_sugestao_da_mesma_familia(arquivo_catalogo, codigos_validos):
+    catalogo = CatalogoPoliron.carregar(arquivo_catalogo)
+    for codigo in codigos_validos[1::2][:100]:
+        sugestao = catalogo.sugerir(codigo)
+        assert sugestao is not None and catalogo.contem(sugestao)
+        assert sugestao.split(' ')[1] == codigo.split(' ')[1]
+    # Sem nenhum código da família, não há sugestão
+    assert catalogo.sugerir("999 ZZ NADA") is None
+
+
+def test_sugestao_sem_o_prefixo(monkeypatch, tmp_path):
+    codigos = [f"{secao} CE {letra}" for secao in range(10, 100, 10) for letra in "ABCDEFGHIJKLMNOPQRST"]
+    codigos += ["10 ITA A", "20 ITA B"]
+    catalogo = CatalogoPoliron.construir(codigos, tmp_path / "indice.arrow")
+    # Família pequena: comparada por inteiro
+    assert catalogo.sugerir("75 CE K") == "70 CE K"
+    
+    # Família grande: só os vizinhos na ordem alfabética da família
+    monkeypatch.setattr(catalogo_poliron, 'FAMILIA_COMPARADA_INTEIRA', 10)
+    familia = sorted(c for c in codigos if " CE " in c)
+    posicao = bisect.bisect_left(familia, "75 CE K")
+    vizinhos = familia[posicao - VIZINHOS_SUGESTAO:posicao + VIZINHOS_SUGESTAO]
+    esperada = max(vizinhos, key=lambda c: _semelhanca({"75", "CE", "K"}, "75 CE K", c))
+    assert catalogo.sugerir("75 CE K") == esperada
+    assert catalogo.sugerir("30 ITA B") == "20 ITA B"
+
+
+def test_marcar_colunas(conversor, arquivo_catalogo, referencia, codigos_validos):
+    catalogo = CatalogoPoliron.carregar(arquivo_catalogo)
+    df = conversor.processar_planilha(pd.DataFrame({'Descrição': [d for d, _ in referencia]}))
+    catalogo.marcar_colunas(df)
+    
+    no_catalogo = set(codigos_validos[::2])
+    esperados = ['NAO_CONVERTIDO' if c.startswith(PREFIXO_FALHA) else 'EXATO' if c in no_catalogo
+                 else 'FORA_DO_CATALOGO' for _, c in referencia]
+    assert df['Catálogo'].astype(str).tolist() == esperados
+    assert df['Sugestão do Catálogo'][df['Catálogo'] != 'FORA_DO_CATALOGO'].isna().all()
+    assert sum(catalogo.estatisticas(df).values()) == len(referencia)
+
+
+def test_indice_reaproveitado_e_reconstruido(arquivo_catalogo, codigos_validos):
+    indice = arquivo_catalogo.with_name("catalogo.csv.indice.arrow")
+    CatalogoPoliron.carregar(arquivo_catalogo)
+    construido = indice.stat().st_mtime_ns
+    
+    # Catálogo igual: o índice é só aberto
+    assert len(CatalogoPoliron.carregar(arquivo_catalogo)) == len(codigos_validos[::2])
+    assert indice.stat().st_mtime_ns == construido
+    
+    # Catálogo alterado: o índice é reconstruído
+    pd.DataFrame({'Código': codigos_validos[:3]}).to_csv(arquivo_catalogo, index=False)
+    os.utime(arquivo_catalogo, ns=(construido + 10**9, construido + 10**9))
+    assert len(CatalogoPoliron.carregar(arquivo_catalogo)) == 3
+    
+    # Índice corrompido: também
+    indice.write_bytes(b"lixo")
+    assert len(CatalogoPoliron.carregar(arquivo_catalogo)) == 3
+
+
+def test_primeira_coluna_sem_coluna_codigo(tmp_path):
+    caminho = tmp_path / "catalogo.csv"
+    caminho.write_text("Ref\n125 ce xlpe/st1 04 cl5 fr pt\n\n", encoding='utf-8')
+    catalogo = CatalogoPoliron.carregar(caminho)
+    assert catalogo.codigos.to_pylist() == [normalizar_codigo("125 CE XLPE/ST1 04 CL5 FR PT")]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""--comparar: duas configurações numa passagem, iguais a dois conversores independentes"""
+
+import json
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import comparacao_regras
+from comparacao_regras import COLUNAS_COMPARACAO, ComparacaoRegras, contar_por_tipo
+from conversor_poliron import ConversorPoliron, PREFIXO_FALHA
+
+CONFIG = Path(__file__).parent.parent / "config"
+
+
+def config_alterada(destino: Path, alterar) -> str:
+    shutil.copytree(CONFIG, destino)
+    for nome in ('regras_conversao.json', 'padroes_especiais.json'):
+        caminho = destino / nome
+        dados = json.loads(caminho.read_text(encoding='utf-8'))
+        alterar(nome, dados)
+        caminho.write_text(json.dumps(dados, ensure_ascii=False), encoding='utf-8')
+    return str(destino)
+
+
+def secao_70_diferente(nome, dados):
+    if nome == 'regras_conversao.json':
+        dados['secao_energia_controle']['70'] = '999'
+
+
+def palavra_nova(nome, dados):
+    if nome == 'padroes_especiais.json':
+        dados['palavras_chave_tipo']['energia'].append('FORCA')
+
+
+def test_mesma_configuracao_sem_diferencas(descricoes):
+    comparacao = ComparacaoRegras()
+    diferencas = comparacao.comparar(pd.Series(descricoes))
+    assert diferencas.empty
+    assert comparacao.estatisticas['analise_partilhada']
+    assert comparacao.estatisticas['linhas'] == len(descricoes)
+
+
+@pytest.mark.parametrize("alterar, partilhada", [(secao_70_diferente, True), (palavra_nova, False)])
+def test_igual_a_dois_conversores(tmp_path, descricoes, alterar, partilhada):
+    config_b = config_alterada(tmp_path / "config_b", alterar)
+    comparacao = ComparacaoRegras(None, config_b)
+    assert comparacao.analise_partilhada == partilhada
+    
+    entrada = pd.Series(descricoes + ["CABO DE FORCA - 3Cx70mm2", "CABO DE BAIXA TENSAO - 1Cx70mm2"])
+    diferencas = comparacao.comparar(entrada)
+    
+    a, b = ConversorPoliron(), ConversorPoliron(config_b)
+    esperadas = [(i + 1, d, a.converter_especificacao(d), b.converter_especificacao(d)) for i, d in enumerate(entrada)]
+    esperadas = [e for e in esperadas if e[2] != e[3]]
+    assert esperadas
+    assert list(zip(diferencas['Linha'], diferencas['Descrição'], diferencas['Código A'],
+                    diferencas['Código B'])) == esperadas
+    for _, linha in diferencas.iterrows():
+        falha_a = linha['Código A'].startswith(PREFIXO_FALHA)
+        falha_b = linha['Código B'].startswith(PREFIXO_FALHA)
+        esperada = 'NOVA_CONVERSAO' if falha_a and not falha_b else \
+            'DEIXOU_DE_CONVERTER' if falha_b and not falha_a else 'CODIGO_ALTERADO'
+        assert linha['Mudança'] == esperada
+    assert contar_por_tipo(diferencas)['Linhas'].sum() == len(diferencas)
+
+
+def test_pool_de_processos(monkeypatch, tmp_path, descricoes):
+    monkeypatch.setattr(comparacao_regras, 'MIN_DESCRICOES_PARALELO', 1)
+    comparacao = ComparacaoRegras(None, config_alterada(tmp_path / "config_b", secao_70_diferente))
+    serie = pd.Series(descricoes)
+    pd.testing.assert_frame_equal(comparacao.comparar(serie, workers=2), comparacao.comparar(serie))
+
+
+def test_varios_ficheiros(tmp_path):
+    comparacao = ComparacaoRegras(None, config_alterada(tmp_path / "config_b", secao_70_diferente))
+    a, b = tmp_path / "a.csv", tmp_path / "b.csv"
+    pd.DataFrame({'Descrição': ["CABO DE CONTROLE - 4Cx1,5mm2", "CABO DE BAIXA TENSAO - 1Cx70mm2"]}).to_csv(a, index=False)
+    # Sem a coluna pedida: a coluna de descrições é detetada
+    pd.DataFrame({'Especificação': ["CABO DE BAIXA TENSAO - 3Cx70mm2"]}).to_csv(b, index=False)
+    
+    diferencas = comparacao.comparar_arquivos([a, b])
+    assert list(diferencas.columns) == COLUNAS_COMPARACAO
+    assert list(zip(diferencas['Ficheiro'], diferencas['Linha'])) == [(str(a), 2), (str(b), 1)]
+    assert comparacao.estatisticas['ficheiros'] == 2
+    
+    pd.DataFrame({'Qtd': [1]}).to_csv(b, index=False)
+    with pytest.raises(ValueError):
+        comparacao.comparar_arquivos([a, b])
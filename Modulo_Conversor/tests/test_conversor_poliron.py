@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Conversão de uma descrição: paridade com o conversor original e ramos de falha"""
+
+import re
+
+import pytest
+
+from conversor_poliron import ConversorPoliron, ResultadoConversao, compilar_flags
+
+
+def test_paridade_com_referencia(conversor, referencia):
+    diferentes = [(d, esperado, conversor.converter_especificacao(d)) for d, esperado in referencia
+                  if conversor.converter_especificacao(d) != esperado]
+    assert diferentes == []
+
+
+def test_formacao_de_maior_prioridade(conversor):
+    # '3Cx4mm2+1Cx4mm2' também casa o padrão de condutores: o VFD tem prioridade
+    analise = conversor.analisar("CABO VFD - 3Cx4mm2+1Cx4mm2")
+    assert analise.padrao_formacao == 'vfd'
+    assert (analise.qtd, analise.secao, analise.qtd2, analise.secao2) == (3, '4', 1, '4')
+
+
+def test_formacao_nao_encontrada(conversor):
+    resultado = conversor.converter_detalhado("CABO DE BAIXA TENSAO - 70mm2")
+    assert resultado == ResultadoConversao(
+        "Não consegui identificar a codificação (Formação não encontrada)", 'DESCONHECIDO')
+
+
+def test_tipo_desconhecido_passa_pelo_mesmo_despacho(conversor):
+    analise = conversor.analisar("CABO - 3Cx4mm2")
+    assert conversor._converter_por_tipo(analise, 'OUTRO') == \
+        "Não consegui identificar a codificação (Tipo de cabo desconhecido)"
+    tipo = conversor.identificar_tipo_cabo(analise)
+    assert conversor.converter_analise(analise) == ResultadoConversao(conversor._converter_por_tipo(analise, tipo), tipo)
+
+
+def test_compilar_flags():
+    assert compilar_flags("IGNORECASE|DOTALL") == re.IGNORECASE | re.DOTALL
+    assert compilar_flags(" ignorecase ") == re.IGNORECASE
+    assert compilar_flags("") == 0
+    with pytest.raises(AttributeError):
+        compilar_flags("NAO_EXISTE")
+
+
+def test_config_dir_indicada(tmp_path):
+    origem = ConversorPoliron().config_dir
+    for nome in ("regras_conversao.json", "padroes_especiais.json"):
+        (tmp_path / nome).write_text((origem / nome).read_text(encoding='utf-8'), encoding='utf-8')
+    conversor = ConversorPoliron(str(tmp_path))
+    assert conversor.converter_especificacao("CABO DE BAIXA TENSAO - 1Cx70mm2") == \
+        ConversorPoliron().converter_especificacao("CABO DE BAIXA TENSAO - 1Cx70mm2")
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""processar_excel_streaming: planilha convertida linha a linha, com memória limitada"""
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+
+def _livro(caminho, linhas):
+    livro = Workbook()
+    folha = livro.active
+    for linha in linhas:
+        folha.append(linha)
+    livro.save(caminho)
+
+
+def test_paridade_com_referencia(tmp_path, conversor, referencia):
+    entrada, saida = tmp_path / "entrada.xlsx", tmp_path / "saida.xlsx"
+    pd.DataFrame({'Item': range(len(referencia)), 'Descrição': [d for d, _ in referencia]}).to_excel(
+        entrada, index=False)
+    
+    estatisticas = conversor.processar_excel_streaming(str(entrada), str(saida), tamanho_cache=100)
+    
+    df = pd.read_excel(saida, keep_default_na=False)
+    assert df['Referência YOFC'].tolist() == [codigo for _, codigo in referencia]
+    assert df['Item'].tolist() == list(range(len(referencia)))
+    assert estatisticas['linhas'] == len(referencia)
+    assert estatisticas['falhas'] == sum(codigo.startswith("Não consegui") for _, codigo in referencia)
+
+
+def test_linhas_curtas_e_coluna_de_codigo_existente(tmp_path, conversor):
+    entrada, saida = tmp_path / "entrada.xlsx", tmp_path / "saida.xlsx"
+    descricao = "CABO DE BAIXA TENSAO - 1Cx70mm2"
+    _livro(entrada, [["Descrição", "Referência YOFC", "Obs"], [descricao, "antigo"], [descricao.lower()]])
+    
+    estatisticas = conversor.processar_excel_streaming(str(entrada), str(saida))
+    
+    linhas = list(load_workbook(saida).active.iter_rows(values_only=True))
+    codigo = conversor.converter_especificacao(descricao)
+    assert linhas == [("Descrição", "Referência YOFC", "Obs"), (descricao, codigo, None),
+                      (descricao.lower(), codigo, None)]
+    assert (estatisticas['descricoes_convertidas'], estatisticas['acertos_cache']) == (1, 1)
+
+
+def test_coluna_inexistente(tmp_path, conversor):
+    entrada = tmp_path / "entrada.xlsx"
+    _livro(entrada, [["Item", "Texto"], [1, "CABO VFD - 3Cx4mm2+1Cx4mm2"]])
+    with pytest.raises(ValueError, match="Descrição"):
+        conversor.processar_excel_streaming(str(entrada), str(tmp_path / "saida.xlsx"))
+    assert not (tmp_path / "saida.xlsx").exists()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""explicar: trajeto de decisão de uma descrição, com o mesmo resultado da conversão"""
+
+import re
+
+from conversor_poliron import ConversorPoliron, PalavrasRastreadas, formatar_explicacao
+
+
+def test_mesmo_codigo_e_tipo_da_conversao(conversor, referencia):
+    for descricao, codigo in referencia[::3]:
+        explicacao = conversor.explicar(descricao)
+        assert explicacao['codigo'] == codigo
+        assert explicacao['tipo'] == conversor.converter_detalhado(descricao.strip().upper()).tipo
+
+
+def test_palavra_chave_atributos_mapas_e_cil(conversor):
+    explicacao = conversor.explicar(" cabo de controle - 4Cx1,5mm2, cobertura st2, acabamento cilindrico ")
+    assert explicacao['descricao'] == "CABO DE CONTROLE - 4CX1,5MM2, COBERTURA ST2, ACABAMENTO CILINDRICO"
+    assert explicacao['formacao']['trecho'] == "4CX1,5MM2" and explicacao['formacao']['secao'] == '1.5'
+    assert explicacao['regra_tipo']['regra'] == 'palavra_chave'
+    assert explicacao['regra_tipo']['palavra'] == 'CONTROLE'
+    assert explicacao['atributos']['cobertura']['encontradas'] == ['ST2']
+    assert explicacao['mapas'] == [{'mapa': 'secao_energia_controle', 'chave': '1.5', 'valor': '115',
+                                    'no_mapa': True}]
+    assert explicacao['cil']['cil'] and explicacao['codigo'].endswith(" CIL")
+
+
+def test_regras_sem_palavra_chave(conversor):
+    instrumentacao = conversor.explicar("CABO - 2Px1,5mm2")
+    assert instrumentacao['tipo'] == 'INSTRUMENTACAO'
+    assert instrumentacao['regra_tipo']['regra'] == 'formacao_instrumentacao'
+    assert [m['mapa'] for m in instrumentacao['mapas']] == ['elementos_instrumentacao', 'secao_instrumentacao']
+    
+    # Sem palavra-chave nem formação de instrumentação o tipo fica por decidir
+    desconhecido = conversor.explicar("CABO - 3Cx2,5mm2")
+    assert desconhecido['tipo'] == 'DESCONHECIDO' and desconhecido['regra_tipo']['regra'] == 'nenhuma'
+    assert 'CONTROLE' in desconhecido['regra_tipo']['palavras_testadas']
+    assert desconhecido['motivo_falha'] == 'TIPO_DESCONHECIDO'
+
+
+def test_energia_e_controle_sem_palavra_chave(monkeypatch):
+    # O padrão da quantidade de condutores não encontra a formação em maiúsculas ('3CX'):
+    # com ele a aceitá-la, o tipo sai da quantidade e a explicação mostra essa regra
+    conversor = ConversorPoliron()
+    conversor.re_qtd_condutores = re.compile(r'(\d+)[Cc][Xx]')
+    for descricao, tipo, condutores in [("CABO - 3Cx2,5mm2", 'ENERGIA', 3), ("CABO - 12Cx1,5mm2", 'CONTROLE', 12)]:
+        explicacao = conversor.explicar(descricao)
+        assert explicacao['tipo'] == tipo
+        assert explicacao['regra_tipo']['regra'] == 'quantidade_condutores'
+        assert explicacao['regra_tipo']['condutores'] == condutores
+    
+    # Tipo sem palavra-chave nem quantidade na formação: sem regra, em vez de um erro
+    monkeypatch.setattr(ConversorPoliron, 'identificar_tipo_cabo', lambda self, analise: 'ENERGIA')
+    explicacao = ConversorPoliron().explicar("CABO - 3Cx2,5mm2")
+    assert explicacao['tipo'] == 'ENERGIA' and explicacao['regra_tipo']['regra'] == 'nenhuma'
+
+
+def test_falha_e_texto(conversor):
+    explicacao = conversor.explicar("texto sem formacao")
+    assert explicacao['formacao'] is None and explicacao['motivo_falha'] == 'FORMACAO_NAO_ENCONTRADA'
+    assert formatar_explicacao(explicacao).splitlines() == [
+        "Descrição: TEXTO SEM FORMACAO",
+        "Formação: não encontrada",
+        f"Código: {explicacao['codigo']} [FORMACAO_NAO_ENCONTRADA]",
+    ]
+    
+    texto = formatar_explicacao(conversor.explicar("CABO DE CONTROLE - 4Cx1,5mm2"))
+    assert "Tipo de cabo: CONTROLE" in texto
+    assert "secao_energia_controle['1.5'] -> '115' (no mapa)" in texto
+
+
+def test_conversao_normal_nao_regista_nada(conversor):
+    conversor.explicar("CABO DE CONTROLE - 4Cx1,5mm2")
+    analise = conversor.analisar("CABO DE CONTROLE - 4CX1,5MM2")
+    assert not isinstance(analise.palavras, PalavrasRastreadas)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""--pipe: respostas JSON-lines pela ordem da entrada, iguais às da conversão de cada descrição"""
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from conversor_poliron import criar_pool, motivo_falha
+from fluxo_conversao import MIN_DESCRICOES_POOL, ConversorFluxo, ler_pedido, processar_fluxo
+
+SCRIPTS = Path(__file__).parent.parent / "scripts"
+
+
+class PoolEspiao:
+    """Conta os lotes enviados ao pool do fluxo"""
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.lotes = 0
+    
+    def map(self, funcao, lotes):
+        lotes = list(lotes)
+        self.lotes += len(lotes)
+        return self.pool.map(funcao, lotes)
+
+
+def respostas(fluxo, linhas, **opcoes):
+    saida = io.StringIO()
+    estatisticas = processar_fluxo(fluxo, io.StringIO(''.join(linhas)), saida, **opcoes)
+    return [json.loads(linha) for linha in saida.getvalue().splitlines()], estatisticas
+
+
+def test_paridade_com_a_referencia(conversor, referencia):
+    pares = [(d, c) for d, c in referencia if '\n' not in d and '\r' not in d]
+    linhas = [json.dumps({'id': f"r{i}", 'descricao': d}, ensure_ascii=False) + '\n' for i, (d, _) in enumerate(pares)]
+    resultado, estatisticas = respostas(ConversorFluxo(conversor), linhas, tamanho_lote=500)
+    
+    assert [r['id'] for r in resultado] == [f"r{i}" for i in range(len(pares))]
+    assert [r['codigo'] for r in resultado] == [c for _, c in pares]
+    for resposta in resultado:
+        assert resposta['motivo'] == motivo_falha(resposta['codigo'])
+        assert resposta['convertido'] == (resposta['motivo'] is None)
+    assert estatisticas['linhas'] == len(pares) and estatisticas['erros'] == 0
+    assert estatisticas['convertidas'] == sum(r['convertido'] for r in resultado)
+    assert estatisticas['lotes'] >= len(pares) // 500
+
+
+def test_ids_e_linhas_invalidas(conversor):
+    linhas = [
+        "CABO DE CONTROLE - 4Cx1,5mm2\n",
+        '{"id": "a-1", "descricao": "CABO DE CONTROLE - 4Cx1,5mm2"}\n',
+        '{"descricao": "cabo de controle - 4cx1,5mm2"}\n',
+        '{"id": 7, "descricao": "CABO DE BAIXA TENSAO - 1Cx70mm2"\n',
+        '{"id": [1, 2]}\n',
+        "texto sem formacao",
+    ]
+    resultado, estatisticas = respostas(ConversorFluxo(conversor), linhas)
+    
+    # Sem id, o id é o número da linha; o JSON inválido também é respondido pelo número da linha
+    assert [r['id'] for r in resultado] == [1, "a-1", 3, 4, [1, 2], 6]
+    codigo = conversor.converter_especificacao("CABO DE CONTROLE - 4Cx1,5mm2")
+    assert [r.get('codigo') for r in resultado[:3]] == [codigo] * 3
+    assert resultado[3]['erro'].startswith("JSON inválido") and 'codigo' not in resultado[3]
+    assert resultado[4] == {'id': [1, 2], 'erro': "Falta o campo 'descricao'"}
+    assert resultado[5]['motivo'] == 'FORMACAO_NAO_ENCONTRADA' and not resultado[5]['convertido']
+    assert estatisticas['erros'] == 2 and estatisticas['linhas'] == 4
+    assert ler_pedido('{"descricao": 12}\r\n', 1) == (1, "12", None)
+
+
+def test_linhas_vazias_sem_resposta(conversor):
+    linhas = ["CABO DE CONTROLE - 4Cx1,5mm2\n", "\n", "   \t\n", "\r\n", "texto sem formacao\n", "  "]
+    resultado, estatisticas = respostas(ConversorFluxo(conversor), linhas)
+    # Os ids continuam a ser os números das linhas da entrada
+    assert [r['id'] for r in resultado] == [1, 5]
+    assert estatisticas['linhas'] == 2 and estatisticas['erros'] == 0
+    assert ler_pedido(" \r\n", 1) is None
+    assert ler_pedido('{"descricao": ""}', 1) == (1, "", None)
+
+
+def test_pool_usado_a_partir_do_minimo(conversor, referencia):
+    pool = criar_pool(2)
+    try:
+        espiao = PoolEspiao(pool)
+        fluxo = ConversorFluxo(conversor, workers=2, executor=espiao)
+        amostra = list(dict(referencia[:MIN_DESCRICOES_POOL * 2]).items())
+        assert [r.codigo for r in fluxo.converter_lote([d for d, _ in amostra])] == [c for _, c in amostra]
+        assert espiao.lotes > 0
+        
+        # Poucas descrições novas: convertidas neste processo
+        lotes = espiao.lotes
+        fluxo.converter_lote([d for d, _ in amostra] + ["CABO DE BAIXA TENSAO - 1Cx70mm2"])
+        assert espiao.lotes == lotes
+    finally:
+        pool.shutdown()
+
+
+def test_memoria_entre_lotes(conversor, descricoes):
+    fluxo = ConversorFluxo(conversor, tamanho_memoria=3)
+    unicas = list(dict.fromkeys(d.strip().upper() for d in descricoes[:5]))
+    
+    fluxo.converter_lote(unicas[:3] + [unicas[0].lower()])
+    assert fluxo.descricoes_convertidas == 3 and fluxo.acertos_memoria == 0
+    # A repetida dentro do mesmo lote é convertida uma vez e não conta como acerto
+    fluxo.converter_lote([unicas[0], unicas[3]])
+    assert fluxo.descricoes_convertidas == 4 and fluxo.acertos_memoria == 1
+    # unicas[1] era a menos usada e saiu da memória
+    assert list(fluxo._memoria) == [unicas[2], unicas[0], unicas[3]]
+    resultados = fluxo.converter_lote([unicas[1], unicas[2]])
+    assert fluxo.descricoes_convertidas == 5 and fluxo.acertos_memoria == 2
+    assert [r.codigo for r in resultados] == [conversor.converter_especificacao(d) for d in unicas[1:3]]
+
+
+def test_lotes_limitados(conversor, descricoes):
+    linhas = [d + '\n' for d in descricoes[:7] if '\n' not in d]
+    resultado, estatisticas = respostas(ConversorFluxo(conversor), linhas, tamanho_lote=3, janela=1)
+    assert [r['codigo'] for r in resultado] == [conversor.converter_especificacao(l.rstrip('\n')) for l in linhas]
+    assert estatisticas['lotes'] >= -(-len(linhas) // 3)
+
+
+def test_modo_pipe_na_linha_de_comando(conversor):
+    entrada = "CABO DE CONTROLE - 4Cx1,5mm2\n" '{"id": "x", "descricao": "Cabo com ç"}\n' "{"
+    processo = subprocess.run([sys.executable, "conversor_poliron.py", "--pipe", "--tamanho-lote", "2"],
+                              cwd=SCRIPTS, input=entrada.encode('utf-8'), capture_output=True, check=True)
+    resultado = [json.loads(linha) for linha in processo.stdout.decode('utf-8').splitlines()]
+    
+    assert [r['id'] for r in resultado] == [1, "x", 3]
+    assert resultado[0]['codigo'] == conversor.converter_especificacao("CABO DE CONTROLE - 4Cx1,5mm2")
+    assert resultado[1]['codigo'] == conversor.converter_especificacao("Cabo com ç")
+    assert 'erro' in resultado[2]
+    # O resumo vai para a saída de erros
+    assert "3 linhas" in processo.stderr.decode('utf-8') and "1 linhas inválidas" in processo.stderr.decode('utf-8')
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Leitura e gravação de Excel, CSV, Parquet e Arrow: codificações, separador, motores Excel e paridade"""
+
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import formatos_tabela
+from formatos_tabela import (BLOCO_CABECALHO_CSV, gravar_excel, gravar_folhas, gravar_tabela, ler_previa,
+                             ler_tabela)
+
+CABECALHO = "Item;Descricao\n"
+
+
+def latin1_depois_de(linhas_ascii: int) -> bytes:
+    """CSV em Latin-1 com cabeçalho e primeiras linhas só em ASCII"""
+    linhas = [f"{i};CABO DE CONTROLE - 4Cx1,5mm2\n" for i in range(linhas_ascii)]
+    linhas.append(f"{linhas_ascii};CABO NÃO HALOGENADO - 3Cx2,5mm2\n")
+    return (CABECALHO + "".join(linhas)).encode('latin-1')
+
+
+@pytest.mark.parametrize("linhas_ascii", [1, BLOCO_CABECALHO_CSV // 20])
+@pytest.mark.parametrize("formato", ['csv', 'csv_gz'])
+def test_latin1_com_cabecalho_ascii(tmp_path, formato, linhas_ascii):
+    # Com muitas linhas em ASCII, o Latin-1 só aparece depois do bloco analisado
+    conteudo = latin1_depois_de(linhas_ascii)
+    if formato == 'csv_gz':
+        conteudo = gzip.compress(conteudo)
+    caminho = tmp_path / ("dados.csv.gz" if formato == 'csv_gz' else "dados.csv")
+    caminho.write_bytes(conteudo)
+    
+    for origem in (caminho, conteudo):
+        df = ler_tabela(origem, formato)
+        assert list(df.columns) == ['Item', 'Descricao']
+        assert df['Descricao'].iloc[-1] == "CABO NÃO HALOGENADO - 3Cx2,5mm2"
+        assert len(df) == linhas_ascii + 1
+
+
+def test_previa_latin1_com_cabecalho_ascii():
+    df = ler_previa(latin1_depois_de(3), 'csv')
+    assert df['Descricao'].tolist()[-1] == "CABO NÃO HALOGENADO - 3Cx2,5mm2"
+
+
+def test_utf8_com_bom_e_caracter_no_limite_do_bloco():
+    # O 'Ã' (2 bytes em UTF-8) fica partido entre o bloco analisado e o resto do ficheiro
+    cabecalho = "\ufeffItem,Descrição\n".encode('utf-8')
+    enchimento = b"1," + b"X" * (BLOCO_CABECALHO_CSV - len(cabecalho) - 7) + b"\n"
+    conteudo = cabecalho + enchimento + "2,NÃO\n".encode('utf-8')
+    assert conteudo[BLOCO_CABECALHO_CSV - 1:BLOCO_CABECALHO_CSV + 1] == "Ã".encode('utf-8')
+    
+    df = ler_tabela(conteudo, 'csv')
+    assert list(df.columns) == ['Item', 'Descrição']
+    assert df['Descrição'].iloc[-1] == "NÃO"
+
+
+def test_csv_preserva_texto_e_separador(tmp_path):
+    destino = tmp_path / "saida.csv"
+    df = ler_tabela(b"Codigo;Descricao\n0012;A\n", 'csv')
+    assert df['Codigo'].tolist() == ['0012']
+    gravar_tabela(df, destino)
+    assert destino.read_text(encoding='utf-8').splitlines()[1] == '"0012";"A"'
+
+
+@pytest.mark.parametrize("extensao", [".csv", ".csv.gz", ".parquet", ".arrow"])
+def test_paridade_por_formato(tmp_path, conversor, referencia, extensao):
+    entrada = tmp_path / f"entrada{extensao}"
+    saida = tmp_path / f"saida{extensao}"
+    pd.DataFrame({'Item': [str(i) for i in range(len(referencia))],
+                  'Descrição': [d for d, _ in referencia]}).pipe(gravar_tabela, entrada)
+    
+    formato = {'.csv': 'csv', '.csv.gz': 'csv_gz', '.parquet': 'parquet', '.arrow': 'arrow'}[extensao]
+    df = conversor.processar_planilha(ler_tabela(entrada, formato))
+    gravar_tabela(df, saida)
+    
+    relida = ler_tabela(saida, formato)
+    assert relida['Referência YOFC'].astype(str).tolist() == [c for _, c in referencia]
+    assert relida['Item'].astype(str).tolist() == [str(i) for i in range(len(referencia))]
+
+
+def tabela_mista(linhas: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Item': np.arange(linhas),
+        'Código': ['0012'] * linhas,
+        'Quantidade': [1.5, np.nan] * (linhas // 2),
+        'Referência YOFC': pd.Categorical(['A', 'B'] * (linhas // 2)),
+        'Convertido': [True, False] * (linhas // 2),
+        'Motivo da Falha': pd.Categorical([None, 'TIPO_DESCONHECIDO'] * (linhas // 2)),
+    })
+
+
+@pytest.mark.parametrize("motor", ['xlsxwriter', 'openpyxl'])
+def test_motores_excel_gravam_o_mesmo_que_o_pandas(monkeypatch, motor):
+    # Vários blocos de conversão para valores Python
+    monkeypatch.setattr(formatos_tabela, 'LINHAS_POR_BLOCO_EXCEL', 3)
+    df = tabela_mista(10)
+    referencia, gravado = io.BytesIO(), io.BytesIO()
+    df.to_excel(referencia, index=False)
+    gravar_excel(df, gravado, motor=motor)
+    
+    esperado = pd.read_excel(referencia, dtype={'Código': str})
+    obtido = pd.read_excel(gravado, dtype={'Código': str})
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+@pytest.mark.parametrize("motor", ['xlsxwriter', 'openpyxl'])
+def test_gravar_folhas_pela_ordem(motor):
+    folhas = {'Resumo': tabela_mista(2), 'Cabos': tabela_mista(4), 'Vazia': pd.DataFrame({'A': []})}
+    destino = io.BytesIO()
+    gravar_folhas(folhas, destino, motor=motor)
+    
+    lidas = pd.read_excel(destino, sheet_name=None)
+    assert list(lidas) == ['Resumo', 'Cabos', 'Vazia']
+    assert [len(df) for df in lidas.values()] == [2, 4, 0]
+
+
+def test_csv_gz_num_buffer():
+    df = ler_tabela(b"Item;Descricao\n1;A\n", 'csv')
+    destino = io.BytesIO()
+    gravar_tabela(df, destino, 'csv_gz')
+    # O buffer continua aberto para ser lido (ex: o botão de download)
+    assert ler_tabela(destino.getvalue(), 'csv_gz')['Descricao'].tolist() == ['A']
+
+
+@pytest.mark.parametrize("extensao", [".csv", ".csv.gz", ".parquet", ".arrow", ".xlsx"])
+def test_previa_igual_ao_inicio_da_tabela(tmp_path, extensao):
+    caminho = tmp_path / f"dados{extensao}"
+    gravar_tabela(pd.DataFrame({'Item': [f"{i:04d}" for i in range(500)], 'Descrição': ["CABO"] * 500}), caminho)
+    formato = formatos_tabela.formato_arquivo(caminho)
+    
+    previa = ler_previa(caminho, formato, linhas=20)
+    inicio = ler_tabela(caminho, formato).head(20)
+    pd.testing.assert_frame_equal(previa, inicio, check_dtype=formato != 'excel')
+    assert len(ler_previa(caminho.read_bytes(), formato, linhas=1000)) == 500
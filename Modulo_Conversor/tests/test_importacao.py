@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Arranque a frio: o módulo não carrega pandas e os padrões de cada conversor são compilados no primeiro uso"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from conversor_poliron import ConversorPoliron
+
+SCRIPTS = Path(__file__).parent.parent / "scripts"
+
+PADROES_POR_CONVERSOR = ['re_vfd', 're_instrumentacao', 're_energia_controle', 're_cil', 're_cores_condutores']
+
+
+def test_importar_sem_pandas():
+    codigo = (
+        "import sys\n"
+        "from conversor_poliron import ConversorPoliron\n"
+        "c = ConversorPoliron()\n"
+        "c.converter_especificacao('CABO DE BAIXA TENSAO - 1Cx70mm2')\n"
+        "print(sorted(m for m in ('pandas', 'numpy', 'concurrent.futures') if m in sys.modules))\n"
+    )
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=SCRIPTS, capture_output=True,
+                           text=True, check=True).stdout
+    assert saida.strip() == "[]"
+
+
+def test_padroes_compilados_no_primeiro_uso(referencia):
+    conversor = ConversorPoliron()
+    assert not any(nome in vars(conversor) for nome in PADROES_POR_CONVERSOR)
+    
+    conversor.converter_especificacao("CABO DE BAIXA TENSAO - 1Cx70mm2")
+    assert 're_energia_controle' in vars(conversor) and 're_vfd' not in vars(conversor)
+    
+    # Compilados a pedido, os resultados são os mesmos
+    for descricao, codigo in referencia:
+        assert conversor.converter_especificacao(descricao) == codigo
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Conversão em lote: manifesto, ficheiros saltados e caminhos de saída"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from lote_conversao import NOME_MANIFESTO, processar_lote, raiz_entradas
+
+
+def escrever_csv(caminho, descricoes):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({'Item': range(len(descricoes)), 'Descrição': descricoes}).to_csv(caminho, index=False)
+
+
+@pytest.fixture
+def projetos(tmp_path, referencia):
+    escrever_csv(tmp_path / "projetos" / "A" / "a.csv", [d for d, _ in referencia[:50]])
+    return tmp_path / "projetos"
+
+
+def estados(resumo):
+    return {r['arquivo']: r['estado'] for r in resumo}
+
+
+def test_paridade(projetos, tmp_path, referencia):
+    resumo = processar_lote([str(projetos)], str(tmp_path / "out"))
+    assert estados(resumo) == {'A/a.csv': 'convertido'}
+    df = pd.read_csv(tmp_path / "out" / "A" / "a_convertido.csv")
+    assert df['Referência YOFC'].tolist() == [c for _, c in referencia[:50]]
+
+
+def test_salta_inalterados_e_forcar(projetos, tmp_path):
+    saida = str(tmp_path / "out")
+    processar_lote([str(projetos)], saida)
+    assert estados(processar_lote([str(projetos)], saida)) == {'A/a.csv': 'inalterado'}
+    assert estados(processar_lote([str(projetos)], saida, forcar=True)) == {'A/a.csv': 'convertido'}
+    
+    # Outras opções invalidam o registo
+    assert estados(processar_lote([str(projetos)], saida, detalhes=True)) == {'A/a.csv': 'convertido'}
+
+
+@pytest.mark.parametrize("entrada", ["{projetos}", "{projetos}/**/*.csv"])
+def test_chaves_estaveis_com_um_ficheiro_novo(projetos, tmp_path, referencia, entrada):
+    saida = tmp_path / "out"
+    entrada = entrada.format(projetos=projetos)
+    processar_lote([entrada], str(saida))
+    
+    escrever_csv(projetos / "B" / "b.csv", [d for d, _ in referencia[50:60]])
+    resumo = processar_lote([entrada], str(saida))
+    assert estados(resumo) == {'A/a.csv': 'inalterado', 'B/b.csv': 'convertido'}
+    
+    manifesto = json.loads((saida / NOME_MANIFESTO).read_text(encoding='utf-8'))
+    assert set(manifesto['arquivos']) == {'A/a.csv', 'B/b.csv'}
+    assert sorted(p.relative_to(saida).as_posix() for p in saida.rglob('*.csv')) == \
+        ['A/a_convertido.csv', 'B/b_convertido.csv']
+
+
+def test_raiz_entradas(projetos, tmp_path):
+    ficheiro = projetos / "A" / "a.csv"
+    assert raiz_entradas([str(projetos)]) == projetos.resolve()
+    assert raiz_entradas([str(ficheiro)]) == (projetos / "A").resolve()
+    assert raiz_entradas([f"{projetos}/*/*.csv"]) == projetos.resolve()
+    assert raiz_entradas([str(ficheiro), str(tmp_path / "outro")]) == tmp_path.resolve()
+
+
+def test_erro_num_ficheiro_nao_interrompe_o_lote(projetos, tmp_path):
+    (projetos / "A" / "sem_coluna.csv").write_text("Item,Texto\n1,abc\n", encoding='utf-8')
+    resumo = processar_lote([str(projetos)], str(tmp_path / "out"))
+    assert estados(resumo) == {'A/a.csv': 'convertido', 'A/sem_coluna.csv': 'erro'}
+    assert 'sem_coluna.csv' not in json.loads((tmp_path / "out" / NOME_MANIFESTO).read_text())['arquivos']
+
+
+def test_ligacao_simbolica_para_fora_da_pasta(projetos, tmp_path, referencia):
+    escrever_csv(tmp_path / "fora" / "f.csv", [d for d, _ in referencia[60:70]])
+    (projetos / "A" / "ligado.csv").symlink_to(tmp_path / "fora" / "f.csv")
+    resumo = processar_lote([str(projetos)], str(tmp_path / "out"))
+    assert estados(resumo) == {'A/a.csv': 'convertido', 'A/ligado.csv': 'convertido'}
+    df = pd.read_csv(tmp_path / "out" / "A" / "ligado_convertido.csv")
+    assert df['Referência YOFC'].tolist() == [c for _, c in referencia[60:70]]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_entradas_com_a_mesma_saida(projetos, tmp_path, referencia, workers):
+    escrever_csv(projetos / "A" / "a.CSV", [d for d, _ in referencia[60:70]])
+    escrever_csv(projetos / "A" / "a_CSV.csv", [d for d, _ in referencia[70:75]])
+    saida = tmp_path / "out"
+    resumo = {r['arquivo']: r for r in processar_lote([str(projetos)], str(saida), workers=workers)}
+    
+    # a.csv mantém o nome; a.CSV fica com a extensão no nome, que a_CSV.csv já usa
+    assert {chave: r['estado'] for chave, r in resumo.items()} == \
+        {'A/a.csv': 'convertido', 'A/a.CSV': 'erro', 'A/a_CSV.csv': 'convertido'}
+    assert resumo['A/a.CSV']['erro'].startswith("Saída repetida")
+    assert pd.read_csv(saida / "A" / "a_convertido.csv")['Referência YOFC'].tolist() == \
+        [c for _, c in referencia[:50]]
+    assert pd.read_csv(saida / "A" / "a_CSV_convertido.csv")['Referência YOFC'].tolist() == \
+        [c for _, c in referencia[70:75]]
+    
+    (projetos / "A" / "a_CSV.csv").unlink()
+    resumo = processar_lote([str(projetos)], str(saida), workers=workers)
+    assert estados(resumo) == {'A/a.csv': 'inalterado', 'A/a.CSV': 'convertido'}
+    assert pd.read_csv(saida / "A" / "a_CSV_convertido.csv")['Referência YOFC'].tolist() == \
+        [c for _, c in referencia[60:70]]
+
+
+def test_pool_de_processos(projetos, tmp_path, referencia):
+    escrever_csv(projetos / "B" / "b.csv", [d for d, _ in referencia[50:60]])
+    resumo = processar_lote([str(projetos)], str(tmp_path / "out"), workers=2)
+    assert estados(resumo) == {'A/a.csv': 'convertido', 'B/b.csv': 'convertido'}
+    df = pd.read_csv(tmp_path / "out" / "B" / "b_convertido.csv")
+    assert df['Referência YOFC'].tolist() == [c for _, c in referencia[50:60]]
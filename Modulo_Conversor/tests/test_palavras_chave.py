@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Varredura das palavras-chave: autômato Aho-Corasick e buscas de substring"""
+
+import conversor_poliron
+from conversor_poliron import ScannerPalavrasChave
+
+
+def test_encontra_o_mesmo_que_buscas_de_substring(conversor, descricoes):
+    scanner = conversor.scanner
+    for descricao in descricoes:
+        texto = descricao.upper()
+        assert scanner.encontrar(texto) == {p for p in scanner.palavras if p in texto}
+
+
+def test_sem_ahocorasick(monkeypatch, conversor, descricoes):
+    monkeypatch.setattr(conversor_poliron, 'ahocorasick', None)
+    sem_automato = ScannerPalavrasChave(conversor.scanner.palavras)
+    assert sem_automato._automato is None
+    for descricao in descricoes:
+        texto = descricao.upper()
+        assert sem_automato.encontrar(texto) == conversor.scanner.encontrar(texto)
+
+
+def test_palavras_sobrepostas_e_vazias():
+    scanner = ScannerPalavrasChave(["FITA", "FITA DE COBRE", "COBRE", ""])
+    assert scanner.palavras == ("COBRE", "FITA", "FITA DE COBRE")
+    assert scanner.encontrar("BLINDAGEM FITA DE COBRE") == {"FITA", "FITA DE COBRE", "COBRE"}
+    assert scanner.encontrar("") == set()
+
+
+def test_detectar_palavras_ignora_maiusculas(conversor):
+    assert conversor.detectar_palavras("cabo vfd hepr") == conversor.detectar_palavras("CABO VFD HEPR")
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Conversão num pool de processos: mesma ordem e mesmos códigos que a conversão em série"""
+
+import pandas as pd
+
+import conversor_poliron
+from conversor_poliron import criar_pool
+
+
+def test_paridade_com_referencia(monkeypatch, conversor, referencia):
+    monkeypatch.setattr(conversor_poliron, 'MIN_DESCRICOES_PARALELO', 1)
+    df = pd.DataFrame({'Descrição': [d for d, _ in referencia]})
+    conversor.processar_planilha(df, workers=2)
+    assert df['Referência YOFC'].astype(str).tolist() == [codigo for _, codigo in referencia]
+
+
+def test_pool_reaproveitado_entre_chamadas(monkeypatch, conversor, referencia):
+    monkeypatch.setattr(conversor_poliron, 'MIN_DESCRICOES_PARALELO', 1)
+    with criar_pool(2) as pool:
+        for parte in (referencia[:700], referencia[700:]):
+            df = pd.DataFrame({'Descrição': [d for d, _ in parte]})
+            conversor.processar_planilha(df, workers=2, executor=pool)
+            assert df['Referência YOFC'].astype(str).tolist() == [codigo for _, codigo in parte]
+
+
+class ExecutorProibido:
+    def map(self, *args, **kwargs):
+        raise AssertionError("entradas pequenas não devem ir para o pool")
+
+
+def test_entradas_pequenas_ficam_em_serie(conversor, referencia):
+    df = pd.DataFrame({'Descrição': [d for d, _ in referencia[:50]]})
+    conversor.processar_planilha(df, workers=4, executor=ExecutorProibido())
+    assert df['Referência YOFC'].astype(str).tolist() == [codigo for _, codigo in referencia[:50]]
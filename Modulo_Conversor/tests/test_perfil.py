@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Perfil da conversão (ativar_perfil): mesmos resultados, com tempos e contadores"""
+
+import json
+
+import pandas as pd
+import pytest
+
+import conversor_poliron
+from conversor_poliron import PADROES_FORMACAO, ConversorPoliron, motivo_falha
+
+
+@pytest.fixture
+def com_perfil():
+    conversor = ConversorPoliron()
+    conversor.ativar_perfil()
+    return conversor
+
+
+def test_paridade_com_perfil_ativo(com_perfil, referencia):
+    for descricao, codigo in referencia:
+        assert com_perfil.converter_especificacao(descricao) == codigo
+    
+    perfil = com_perfil.perfil
+    assert sum(qtd for qtd, _ in perfil.por_tipo.values()) == len(referencia)
+    assert sum(perfil.padroes_formacao.values()) == len(referencia)
+    falhas = sum(motivo_falha(codigo) is not None for _, codigo in referencia)
+    assert sum(perfil.motivos_falha.values()) == falhas
+    assert perfil.etapas_descricao['palavras_chave'][0] == len(referencia)
+
+
+def test_etapas_da_planilha(com_perfil, referencia):
+    df = pd.DataFrame({'Descrição': [d for d, _ in referencia] * 2})
+    com_perfil.processar_planilha(df, detalhes=True)
+    
+    etapas = com_perfil.perfil.etapas
+    assert {'fatoracao', 'cache_consulta', 'conversao', 'montagem_colunas'} <= set(etapas)
+    # Cada descrição distinta é convertida (e contada) uma única vez
+    unicas = com_perfil.estatisticas_dedup['descricoes_unicas']
+    assert sum(qtd for qtd, _ in com_perfil.perfil.por_tipo.values()) == unicas
+
+
+def test_contagens_no_modo_paralelo(monkeypatch, com_perfil, referencia):
+    monkeypatch.setattr(conversor_poliron, 'MIN_DESCRICOES_PARALELO', 1)
+    df = pd.DataFrame({'Descrição': [d for d, _ in referencia]})
+    com_perfil.processar_planilha(df, workers=2)
+    
+    assert df['Referência YOFC'].astype(str).tolist() == [c for _, c in referencia]
+    por_tipo = com_perfil.perfil.para_dict()['por_tipo']
+    assert sum(t['descricoes'] for t in por_tipo.values()) == com_perfil.estatisticas_dedup['descricoes_unicas']
+
+
+def test_para_dict_e_resumo(com_perfil):
+    com_perfil.converter_especificacao("CABO DE BAIXA TENSAO - 1Cx70mm2")
+    com_perfil.converter_especificacao("TEXTO SEM FORMACAO")
+    
+    dados = json.loads(com_perfil.perfil.para_json())
+    assert dados['formacao']['por_padrao']['nenhum'] == 1
+    # Sem formação, todos os padrões são testados
+    assert dados['formacao']['padroes_testados'] >= len(PADROES_FORMACAO)
+    assert dados['motivos_falha'] == {'FORMACAO_NAO_ENCONTRADA': 1}
+    
+    resumo = com_perfil.perfil.resumo()
+    assert "Etapas por descrição:" in resumo
+    assert "FORMACAO_NAO_ENCONTRADA" in resumo
+
+
+def test_perfil_desligado_por_omissao(conversor):
+    assert conversor.perfil is None
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""processar_folhas: livro inteiro numa passagem, com a coluna de descrições detetada em cada folha"""
+
+import pandas as pd
+
+
+def livro(referencia):
+    return {
+        'Capa': pd.DataFrame({'Projeto': ['Obra 1'], 'Data': ['2024-01-01']}),
+        'Energia': pd.DataFrame({'Item': range(100), 'Descrição do Material': [d for d, _ in referencia[:100]]}),
+        # Sem cabeçalho reconhecido: a coluna é detetada pelo conteúdo
+        'Outros': pd.DataFrame({'Qtd': range(60), 'Texto': [d for d, _ in referencia[50:110]]}),
+    }
+
+
+def test_paridade_com_processar_planilha_por_folha(conversor, referencia):
+    folhas = conversor.processar_folhas(livro(referencia), detalhes=True)
+    dedup = conversor.estatisticas_dedup
+    
+    assert conversor.estatisticas_folhas == {
+        'Capa': {'coluna': None, 'linhas': 1},
+        'Energia': {'coluna': 'Descrição do Material', 'linhas': 100},
+        'Outros': {'coluna': 'Texto', 'linhas': 60},
+    }
+    assert 'Referência YOFC' not in folhas['Capa'].columns
+    for nome, coluna in [('Energia', 'Descrição do Material'), ('Outros', 'Texto')]:
+        esperado = conversor.processar_planilha(livro(referencia)[nome], coluna, detalhes=True)
+        for resultado in ('Referência YOFC', 'Tipo de Cabo', 'Convertido'):
+            assert folhas[nome][resultado].astype(str).tolist() == esperado[resultado].astype(str).tolist()
+    
+    # As descrições repetidas entre folhas são convertidas uma única vez
+    assert dedup['linhas'] == 160 and dedup['descricoes_unicas'] <= 110
+
+
+def test_coluna_preferida_e_livro_sem_descricoes(conversor, referencia):
+    folhas = livro(referencia)
+    folhas['Energia']['Observações'] = "x"
+    conversor.processar_folhas(folhas, coluna_descricao='Observações')
+    # A coluna pedida só é usada nas folhas que a têm
+    assert conversor.estatisticas_folhas['Energia']['coluna'] == 'Observações'
+    assert conversor.estatisticas_folhas['Outros']['coluna'] == 'Texto'
+    
+    vazio = {'Capa': pd.DataFrame({'Projeto': ['Obra 1']})}
+    assert conversor.processar_folhas(vazio)['Capa'].columns.tolist() == ['Projeto']
+    assert conversor.estatisticas_dedup['linhas'] == 0
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""processar_planilha: uma conversão por descrição distinta, colunas de resultado e detalhes"""
+
+import numpy as np
+import pandas as pd
+
+from conversor_poliron import TIPOS_CABO, motivo_falha
+
+
+def test_paridade_com_referencia(conversor, referencia):
+    df = pd.DataFrame({'Descrição': [d for d, _ in referencia]})
+    conversor.processar_planilha(df)
+    assert df['Referência YOFC'].astype(str).tolist() == [codigo for _, codigo in referencia]
+
+
+def test_variantes_de_grafia_convertidas_uma_vez(conversor, referencia):
+    descricoes = [d for d, _ in referencia[:200]]
+    variantes = descricoes + [f"  {d.lower()} " for d in descricoes] + descricoes
+    df = pd.DataFrame({'Item': range(len(variantes)), 'Descrição': variantes})
+    conversor.processar_planilha(df)
+    
+    assert df['Referência YOFC'].astype(str).tolist() == [c for _, c in referencia[:200]] * 3
+    assert df['Item'].tolist() == list(range(len(variantes)))
+    assert conversor.estatisticas_dedup['linhas'] == 600
+    assert conversor.estatisticas_dedup['descricoes_unicas'] <= 200
+
+
+def test_celulas_vazias_e_numeros(conversor):
+    df = pd.DataFrame({'Descrição': [None, np.nan, 70, "", "CABO DE BAIXA TENSAO - 1Cx70mm2"]})
+    conversor.processar_planilha(df)
+    codigos = df['Referência YOFC'].astype(str).tolist()
+    assert all(c == "Não consegui identificar a codificação (Formação não encontrada)" for c in codigos[:4])
+    assert codigos[4] == conversor.converter_especificacao("CABO DE BAIXA TENSAO - 1Cx70mm2")
+
+
+def test_planilha_vazia(conversor):
+    df = pd.DataFrame({'Descrição': pd.Series([], dtype=object)})
+    conversor.processar_planilha(df)
+    assert len(df) == 0 and 'Referência YOFC' in df.columns
+    assert conversor.estatisticas_dedup['taxa_unicas'] == 0.0
+
+
+def test_colunas_de_detalhe(conversor, referencia):
+    df = pd.DataFrame({'Descrição': [d for d, _ in referencia]})
+    conversor.processar_planilha(df, detalhes=True)
+    
+    esperados = [conversor.converter_detalhado(d) for d, _ in referencia]
+    assert df['Tipo de Cabo'].astype(str).tolist() == [r.tipo for r in esperados]
+    assert list(df['Tipo de Cabo'].cat.categories) == TIPOS_CABO
+    assert df['Convertido'].tolist() == [not r.codigo.startswith("Não consegui") for r in esperados]
+    assert df['Motivo da Falha'].isna().tolist() == df['Convertido'].tolist()
+
+
+def test_motivo_falha():
+    assert motivo_falha("125 CE XLPE/ST1 04 CL5 FR PT") is None
+    assert motivo_falha("Não consegui identificar a codificação (Formação VFD não padrão)") == 'FORMACAO_VFD_NAO_PADRAO'
+    # Uma mensagem de falha sem motivo conhecido (ex: exceção num conversor)
+    assert motivo_falha("Não consegui identificar a codificação (Erro VFD: boom)") == 'ERRO_INTERNO'
+
+
+def test_detalhes_de_uma_falha(conversor):
+    df = pd.DataFrame({'Descrição': ["CABO VFD - 4Cx10mm2", "CABO DE CONTROLE - 7Cx2,5mm2"]})
+    conversor.processar_planilha(df, detalhes=True)
+    assert df['Tipo de Cabo'].astype(str).tolist() == ['VFD', 'CONTROLE']
+    assert df['Convertido'].tolist() == [False, True]
+    assert df['Motivo da Falha'].tolist()[0] == 'FORMACAO_VFD_INVALIDA'
+    assert df['Motivo da Falha'].isna().tolist() == [False, True]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Índice de trigramas: semelhança igual à de Jaccard calculada diretamente e sugestões nas falhas"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import semelhanca_poliron
+from conversor_poliron import PREFIXO_FALHA
+from semelhanca_poliron import (SEMELHANCA_MINIMA, IndiceSemelhanca, colunas_semelhanca, ler_corpus,
+                                normalizar_descricao)
+
+
+def trigramas(texto):
+    texto = f" {normalizar_descricao(texto)} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def jaccard(a, b):
+    ta, tb = trigramas(a), trigramas(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+@pytest.fixture(scope="module")
+def convertidas(referencia):
+    return [(d, c) for d, c in referencia if not c.startswith(PREFIXO_FALHA)][:400]
+
+
+def test_igual_a_jaccard_direto(convertidas, referencia):
+    indice = IndiceSemelhanca.construir(convertidas)
+    consultas = [d for d, c in referencia if c.startswith(PREFIXO_FALHA)][:30] + ["CABO DE CONTROLE 4CX1,5"]
+    
+    for consulta, sugestoes in zip(consultas, indice.procurar(consultas, k=3)):
+        esperadas = sorted((jaccard(consulta, d) for d in indice.descricoes), reverse=True)[:3]
+        esperadas = [s for s in esperadas if s >= SEMELHANCA_MINIMA]
+        assert [s for _, _, s in sugestoes] == pytest.approx(esperadas)
+        for descricao, codigo, semelhanca in sugestoes:
+            assert jaccard(consulta, descricao) == pytest.approx(semelhanca)
+            assert indice.codigos[indice.descricoes.index(descricao)] == codigo
+
+
+def test_construcao_por_blocos(monkeypatch, convertidas):
+    inteiro = IndiceSemelhanca.construir(convertidas)
+    monkeypatch.setattr(semelhanca_poliron, 'DESCRICOES_POR_BLOCO', 37)
+    por_blocos = IndiceSemelhanca.construir(convertidas)
+    for nome in ('vocabulario', 'inicios', 'documentos', 'inicios_descricao', 'trigramas'):
+        np.testing.assert_array_equal(getattr(por_blocos, nome), getattr(inteiro, nome))
+
+
+def test_falhas_e_repetidas_nao_indexadas():
+    indice = IndiceSemelhanca.construir([
+        ("cabo  a", "1"), ("CABO A", "2"), ("CABO B", PREFIXO_FALHA + " (x)"), (None, "3"), ("", "4"),
+    ])
+    assert indice.descricoes == ["CABO A"] and indice.codigos == ["1"]
+    assert indice.procurar(["XYZ"]) == [[]]
+    assert IndiceSemelhanca.construir([]).procurar(["CABO A"]) == [[]]
+
+
+def test_marcar_colunas_so_nas_falhas(conversor, convertidas, referencia):
+    indice = IndiceSemelhanca.construir(convertidas)
+    df = conversor.processar_planilha(pd.DataFrame({'Descrição': [d for d, _ in referencia[:300]]}))
+    indice.marcar_colunas(df, 'Descrição', k=2)
+    
+    assert set(colunas_semelhanca(2)) <= set(df.columns)
+    falhas = df['Referência YOFC'].astype(str).str.startswith(PREFIXO_FALHA)
+    assert df.loc[~falhas, 'Semelhança 1'].isna().all()
+    assert (df.loc[falhas, 'Semelhança 1'].dropna() >= SEMELHANCA_MINIMA).all()
+    for descricao, semelhante in zip(df.loc[falhas, 'Descrição'], df.loc[falhas, 'Semelhante 1']):
+        esperada = indice.procurar([descricao], k=1)[0]
+        assert semelhante == esperada[0][0] if esperada else pd.isna(semelhante)
+
+
+def test_ler_corpus(tmp_path):
+    caminho = tmp_path / "anterior.csv"
+    pd.DataFrame({'Especificação': ["CABO A", "CABO B"],
+                  'Referência YOFC': ["1", PREFIXO_FALHA + " (x)"]}).to_csv(caminho, index=False)
+    assert ler_corpus(caminho) == [("CABO A", "1")]
+    
+    pd.DataFrame({'Texto': ["CABO A"]}).to_csv(caminho, index=False)
+    with pytest.raises(ValueError):
+        ler_corpus(caminho)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Serviço HTTP: agrupamento de pedidos, pool de processos e rotas"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from servico_conversor import AgrupadorPedidos, ServicoConversor, ServidorConversor
+
+
+class PoolEspiao:
+    """Conta os lotes enviados ao pool do serviço"""
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.lotes = 0
+    
+    def map(self, funcao, lotes):
+        lotes = list(lotes)
+        self.lotes += len(lotes)
+        return self.pool.map(funcao, lotes)
+
+
+@pytest.fixture(scope="module")
+def servico():
+    servico = ServicoConversor(workers=2)
+    yield servico
+    servico.encerrar()
+
+
+@pytest.fixture(scope="module")
+def url(servico):
+    servidor = ServidorConversor(('127.0.0.1', 0), servico, tamanho_maximo=1 << 20)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def pedir(url, rota, corpo: bytes):
+    pedido = urllib.request.Request(url + rota, data=corpo, method='POST')
+    try:
+        with urllib.request.urlopen(pedido, timeout=30) as resposta:
+            return resposta.status, resposta.read()
+    except urllib.error.HTTPError as erro:
+        return erro.code, erro.read()
+
+
+def test_lote_pequeno_vai_ao_pool(servico, referencia):
+    amostra = referencia[:100]
+    espiao = servico.pool = PoolEspiao(servico.pool)
+    try:
+        resultados = servico.converter_descricoes([d for d, _ in amostra])
+    finally:
+        servico.pool = espiao.pool
+    assert espiao.lotes > 0
+    assert [r['codigo'] for r in resultados] == [c for _, c in amostra]
+
+
+def test_lote_abaixo_do_minimo_fica_no_processo(servico):
+    espiao = servico.pool = PoolEspiao(servico.pool)
+    try:
+        servico.converter_descricoes(["CABO DE BAIXA TENSAO - 1Cx70mm2"])
+    finally:
+        servico.pool = espiao.pool
+    assert espiao.lotes == 0
+
+
+def test_lote_grande_nao_atrasa_os_seguintes():
+    libertar = threading.Event()
+    
+    def converter(descricoes):
+        if len(descricoes) > 1:
+            libertar.wait(10)
+        return [{'descricao': d} for d in descricoes]
+    
+    agrupador = AgrupadorPedidos(converter, janela=0.0, tamanho_maximo=1, conversoes=2)
+    with ThreadPoolExecutor(max_workers=1) as pedidos:
+        grande = pedidos.submit(agrupador.converter, ["A", "B", "C"])
+        time.sleep(0.05)
+        assert agrupador.converter(["D"]) == [{'descricao': "D"}]
+        assert not grande.done()
+        libertar.set()
+        assert len(grande.result(timeout=10)) == 3
+    agrupador.encerrar()
+
+
+def test_agrupa_pedidos_simultaneos_e_propaga_erros():
+    chamadas = []
+    
+    def converter(descricoes):
+        chamadas.append(list(descricoes))
+        if "ERRO" in descricoes:
+            raise RuntimeError("falhou")
+        return [d.lower() for d in descricoes]
+    
+    agrupador = AgrupadorPedidos(converter, janela=0.2, tamanho_maximo=1000)
+    with ThreadPoolExecutor(max_workers=3) as pedidos:
+        futuros = [pedidos.submit(agrupador.converter, lote) for lote in (["A"], ["B", "C"], ["D"])]
+        assert sorted(r for f in futuros for r in f.result(timeout=10)) == ["a", "b", "c", "d"]
+    assert len(chamadas) == 1 and agrupador.pedidos_agrupados == 3
+    
+    with pytest.raises(RuntimeError):
+        agrupador.converter(["ERRO"])
+    agrupador.encerrar()
+
+
+def test_rota_json(url, referencia):
+    amostra = referencia[:50]
+    estado, corpo = pedir(url, "/converter", json.dumps({'descricoes': [d for d, _ in amostra]}).encode())
+    assert estado == 200
+    dados = json.loads(corpo)
+    assert [r['codigo'] for r in dados['resultados']] == [c for _, c in amostra]
+    assert dados['convertidas'] + dados['falhas'] == 50
+
+
+def test_rota_planilha_latin1(url):
+    conteudo = "Item;Descricao\n1;CABO NÃO HALOGENADO - 1Cx70mm2\n".encode('latin-1')
+    estado, corpo = pedir(url, "/converter/planilha?formato=csv&coluna=Descricao", conteudo)
+    assert estado == 200
+    assert corpo.decode('utf-8').splitlines()[0].startswith('"Item";"Descricao";"Referência YOFC"')
+
+
+@pytest.mark.parametrize("rota, corpo, codigo", [
+    ("/converter", b"{", 400),
+    ("/converter", b'{"descricoes": "texto"}', 400),
+    ("/converter/planilha?formato=csv&coluna=Outra", b"Descricao\nA\n", 400),
+    ("/converter/planilha?formato=docx", b"A", 400),
+    ("/outra", b"", 404),
+])
+def test_erros_do_cliente(url, rota, corpo, codigo):
+    estado, resposta = pedir(url, rota, corpo)
+    assert estado == codigo
+    assert 'erro' in json.loads(resposta)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""TarefaConversao e RegistoTarefas: conversão em segundo plano, cancelamento e resultados parciais"""
+
+import threading
+import time
+
+import pandas as pd
+
+from tarefa_conversao import TarefaConversao, RegistoTarefas
+
+
+def _esperar(tarefa, limite=30.0):
+    fim = time.monotonic() + limite
+    while tarefa.estado == 'em_curso' and time.monotonic() < fim:
+        time.sleep(0.01)
+    return tarefa.estado
+
+
+def _tabela(referencia):
+    return pd.DataFrame({'Item': range(len(referencia)), 'Descrição': [d for d, _ in referencia]})
+
+
+def test_leitura_na_thread_da_tarefa(conversor, referencia):
+    liberar = threading.Event()
+    
+    def ler():
+        liberar.wait(10)
+        return _tabela(referencia), 1.5
+    
+    registo = RegistoTarefas()
+    inicio = time.perf_counter()
+    tarefa = registo.iniciar('a', lambda: TarefaConversao(conversor, None, 'Descrição', ler=ler,
+                                                          medir_perfil=True, etapa_leitura='leitura_csv'))
+    assert time.perf_counter() - inicio < 1.0
+    assert (tarefa.estado, tarefa.fase, tarefa.fracao) == ('em_curso', 'leitura', 0.0)
+    
+    # Enquanto a leitura decorre, o registo continua a servir as outras chaves
+    outra = registo.iniciar('b', lambda: TarefaConversao(conversor, _tabela(referencia[:10]), 'Descrição'))
+    assert _esperar(outra) == 'concluida'
+    assert registo.obter('a') is tarefa
+    
+    liberar.set()
+    assert _esperar(tarefa) == 'concluida'
+    assert tarefa.fase == 'conversao' and tarefa.total == len(referencia)
+    assert tarefa.resultado()['Referência YOFC'].astype(str).tolist() == [c for _, c in referencia]
+    assert tarefa.estatisticas_perfil['etapas']['leitura_csv']['segundos'] == 1.5
+
+
+def test_erro_na_leitura(conversor):
+    def ler():
+        raise ValueError("ficheiro inválido")
+    
+    tarefa = TarefaConversao(conversor, None, 'Descrição', ler=ler).iniciar()
+    assert _esperar(tarefa) == 'erro'
+    assert isinstance(tarefa.erro, ValueError)
+
+
+def test_mesma_chave_criada_ao_mesmo_tempo(conversor, referencia):
+    registo = RegistoTarefas()
+    barreira = threading.Barrier(4)
+    criadas, obtidas = [], []
+    
+    def criar():
+        tarefa = TarefaConversao(conversor, _tabela(referencia[:50]), 'Descrição')
+        criadas.append(tarefa)
+        return tarefa
+    
+    def pedir():
+        barreira.wait()
+        obtidas.append(registo.iniciar('x', criar))
+    
+    threads = [threading.Thread(target=pedir) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len({id(tarefa) for tarefa in obtidas}) == 1
+    assert registo.obter('x') is obtidas[0]
+    assert _esperar(obtidas[0]) == 'concluida'
+    # As tarefas descartadas nunca chegaram a arrancar
+    assert all(not t._thread.is_alive() and t.fim is None for t in criadas if t is not obtidas[0])
+
+
+def test_paridade_com_processar_planilha(conversor, referencia):
+    df = _tabela(referencia + referencia[:300])
+    tarefa = TarefaConversao(conversor, df.copy(), 'Descrição', tamanho_bloco=128).iniciar()
+    assert _esperar(tarefa) == 'concluida'
+    
+    esperado = conversor.processar_planilha(df.copy(), detalhes=True)
+    resultado = tarefa.resultado()
+    for coluna in ('Referência YOFC', 'Tipo de Cabo', 'Convertido', 'Motivo da Falha'):
+        assert resultado[coluna].astype(str).tolist() == esperado[coluna].astype(str).tolist()
+    assert tarefa.fracao == 1.0 and tarefa.linhas_feitas == len(df)
+    assert tarefa.estatisticas_dedup == conversor.estatisticas_dedup
+
+
+def test_cancelar_guarda_o_parcial(conversor, referencia):
+    tarefa = TarefaConversao(conversor, _tabela(referencia), 'Descrição', tamanho_bloco=100)
+    converter = tarefa.conversor.converter_descricoes_unicas
+    blocos = []
+    
+    def converter_e_cancelar(bloco, **kwargs):
+        blocos.append(len(bloco))
+        if len(blocos) == 3:
+            tarefa.cancelar()
+        return converter(bloco, **kwargs)
+    
+    tarefa.conversor.converter_descricoes_unicas = converter_e_cancelar
+    assert _esperar(tarefa.iniciar()) == 'cancelada'
+    assert len(blocos) == 3 and tarefa.resultado() is None
+    
+    parcial = tarefa.parcial()
+    assert len(parcial) == tarefa.linhas_feitas > 0
+    assert parcial['Referência YOFC'].astype(str).tolist() == [c for _, c in referencia[:len(parcial)]]
+    assert parcial['Item'].tolist() == list(range(len(parcial)))
+    assert len(tarefa.parcial(ultimas=5)) == 5
+
+
+def test_registo_substitui_canceladas_e_descarta_antigas(conversor, referencia):
+    registo = RegistoTarefas(maximo=2)
+    
+    def criar():
+        return TarefaConversao(conversor, _tabela(referencia[:20]), 'Descrição')
+    
+    primeira = registo.iniciar('a', criar)
+    assert _esperar(primeira) == 'concluida'
+    assert registo.iniciar('a', criar) is primeira
+    
+    primeira.estado = 'cancelada'
+    segunda = registo.iniciar('a', criar)
+    assert segunda is not primeira and _esperar(segunda) == 'concluida'
+    
+    for chave in ('b', 'c'):
+        assert _esperar(registo.iniciar(chave, criar)) == 'concluida'
+    assert registo.obter('a') is None and registo.obter('c') is not None